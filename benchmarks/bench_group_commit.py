@@ -0,0 +1,99 @@
+"""
+Benchmark de group commit en BookRepository.
+
+Lanza N hilos que crean libros concurrentemente contra una base de datos
+SQLite temporal, primero con un COMMIT por operación y después con group
+commit, e imprime el throughput de cada modo.
+
+Uso:
+    python benchmarks/bench_group_commit.py --threads 16 --ops 200
+
+Resultados de referencia (SQLite en disco local, 1 CPU, Python 3.11,
+valores por defecto: lote máximo 64, espera máxima 5 ms; dos ejecuciones):
+    --threads 16 --ops 200   commit por operación: 190-205 altas/s
+                             group commit:         384-425 altas/s (~2x)
+    --threads 1 --ops 1000   commit por operación: 195 altas/s
+                             group commit:          83 altas/s
+Sin concurrencia cada alta espera la ventana de agrupación completa y no
+hay nada que agrupar: el modo solo compensa con escrituras concurrentes.
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import logging
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from flask import Flask
+from models.db import db
+from models.change_sequence_model import BOOKS_SEQUENCE
+from repositories.change_sequence_repository import ChangeSequenceRepository
+from repositories.book_group_commit import book_group_committer
+from services.book_service import BookService
+
+
+def create_app(path: str, group_commit: bool, max_batch: int, max_wait_ms: float):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f'sqlite:///{path}'
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'connect_args': {'timeout': 30}}
+    app.config['BOOK_GROUP_COMMIT'] = group_commit
+    app.config['BOOK_GROUP_COMMIT_MAX_BATCH'] = max_batch
+    app.config['BOOK_GROUP_COMMIT_MAX_WAIT_MS'] = max_wait_ms
+    db.init_app(app)
+    book_group_committer.init_app(app)
+    with app.app_context():
+        db.create_all()
+        ChangeSequenceRepository(db.session).ensure(BOOKS_SEQUENCE)
+    return app
+
+
+def run(group_commit: bool, threads: int, ops: int, max_batch: int, max_wait_ms: float):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app(os.path.join(tmp, 'bench.db'), group_commit, max_batch, max_wait_ms)
+        errors = []
+
+        def worker(n):
+            with app.app_context():
+                service = BookService(db.session)
+                for i in range(ops):
+                    try:
+                        service.create_book({'title': f'Libro {n}-{i}', 'author': 'Autor', 'genre': 'Novela', 'pages': 100})
+                    except Exception as e:
+                        errors.append(e)
+                        db.session.rollback()
+                db.session.remove()
+
+        pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in pool:
+            thread.start()
+        for thread in pool:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        with app.app_context():
+            total = BookService(db.session).count_books(exact=True)
+            db.engine.dispose()
+        return total, elapsed, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--ops', type=int, default=200, help='Altas por hilo')
+    parser.add_argument('--max-batch', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for group_commit in (False, True):
+        total, elapsed, errors = run(group_commit, args.threads, args.ops, args.max_batch, args.max_wait_ms)
+        mode = 'group commit' if group_commit else 'commit por operación'
+        print(f'{mode:>22}: {total} libros en {elapsed:.2f} s -> {total / elapsed:,.0f} altas/s ({errors} errores)')
+
+
+if __name__ == '__main__':
+    main()
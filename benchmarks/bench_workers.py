@@ -0,0 +1,153 @@
+"""
+Benchmark de modelos de worker de gunicorn.
+
+Arranca gunicorn (con gunicorn.conf.py) contra una base de datos SQLite
+temporal para cada modelo de worker y mide dos cargas con clientes HTTP
+concurrentes (un proceso por cliente, conexiones keep-alive):
+
+    read:  GET /app/books/<id> y GET /app/books?limit=20 con un token JWT
+    login: POST /auth/login (dominado por la verificación del hash)
+
+Uso:
+    python benchmarks/bench_workers.py --clients 32 --duration 10
+    python benchmarks/bench_workers.py --models sync gthread --workers 4
+"""
+
+import argparse
+import http.client
+import json
+import multiprocessing
+import os
+import random
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PORT = 5099
+SEED_BOOKS = 500
+
+
+def request(conn, method, path, body=None, token=None):
+    headers = {'Content-Type': 'application/json'}
+    if token:
+        headers['Authorization'] = f'Bearer {token}'
+    conn.request(method, path, body=json.dumps(body) if body is not None else None, headers=headers)
+    response = conn.getresponse()
+    data = response.read()
+    return response.status, data
+
+
+def wait_ready(timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=2)
+            request(conn, 'GET', '/')
+            return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def seed():
+    """Crea el usuario del benchmark y el catálogo inicial; devuelve un token"""
+    conn = http.client.HTTPConnection('127.0.0.1', PORT)
+    request(conn, 'POST', '/auth/register', {'username': 'bench', 'email': 'bench@example.com', 'password': 'bench-password'})
+    _, data = request(conn, 'POST', '/auth/login', {'login': 'bench', 'password': 'bench-password'})
+    token = json.loads(data)['access_token']
+    for i in range(SEED_BOOKS):
+        request(conn, 'POST', '/app/books', {'title': f'Libro {i}', 'author': 'Autor', 'genre': 'Novela', 'pages': 100 + i}, token)
+    return token
+
+
+def client(args):
+    """Bucle de un cliente: peticiones hasta el fin del plazo; devuelve latencias y errores"""
+    workload, token, deadline = args
+    conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+    latencies, errors = [], 0
+    while time.time() < deadline:
+        if workload == 'login':
+            method, path, body, auth = 'POST', '/auth/login', {'login': 'bench', 'password': 'bench-password'}, None
+        elif random.random() < 0.8:
+            method, path, body, auth = 'GET', f'/app/books/{random.randint(1, SEED_BOOKS)}', None, token
+        else:
+            method, path, body, auth = 'GET', f'/app/books?limit=20&after={random.randint(0, SEED_BOOKS - 20)}', None, token
+        start = time.perf_counter()
+        try:
+            status, _ = request(conn, method, path, body, auth)
+            if status >= 400:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            conn.close()
+            conn = http.client.HTTPConnection('127.0.0.1', PORT, timeout=30)
+            continue
+        latencies.append(time.perf_counter() - start)
+    return latencies, errors
+
+
+def run_workload(workload: str, token: str, clients: int, duration: float):
+    deadline = time.time() + duration
+    with multiprocessing.get_context('fork').Pool(clients) as pool:
+        results = pool.map(client, [(workload, token, deadline)] * clients)
+    latencies = sorted(latency for result in results for latency in result[0])
+    errors = sum(result[1] for result in results)
+    if not latencies:
+        return 0, 0, 0, errors
+    p50 = latencies[len(latencies) // 2] * 1000
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))] * 1000
+    return len(latencies) / duration, p50, p99, errors
+
+
+def benchmark_model(model: str, args):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(os.environ)
+        env.update({
+            'MYSQL_URI': f'sqlite:///{os.path.join(tmp, "bench.db")}',
+            'RATELIMIT_ENABLED': 'false',
+            'GUNICORN_WORKER_CLASS': model,
+            'GUNICORN_BIND': f'127.0.0.1:{PORT}',
+            'GUNICORN_ACCESSLOG': '',
+            'GUNICORN_LOGLEVEL': 'warning',
+        })
+        if args.workers:
+            env['GUNICORN_WORKERS'] = str(args.workers)
+        server = subprocess.Popen(['gunicorn'], cwd=ROOT, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            if not wait_ready():
+                print(f'{model:>8}: gunicorn no arrancó')
+                return
+            token = seed()
+            for workload in args.workloads:
+                rps, p50, p99, errors = run_workload(workload, token, args.clients, args.duration)
+                print(f'{model:>8} {workload:>6}: {rps:8,.0f} req/s  p50 {p50:7.1f} ms  p99 {p99:7.1f} ms  ({errors} errores)')
+        finally:
+            server.send_signal(signal.SIGTERM)
+            server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--models', nargs='+', default=['sync', 'gthread', 'gevent'])
+    parser.add_argument('--workloads', nargs='+', default=['read', 'login'], choices=['read', 'login'])
+    parser.add_argument('--clients', type=int, default=32, help='Clientes concurrentes')
+    parser.add_argument('--duration', type=float, default=10, help='Segundos por carga')
+    parser.add_argument('--workers', type=int, help='Workers de gunicorn (por defecto, los de gunicorn.conf.py)')
+    args = parser.parse_args()
+
+    for model in args.models:
+        if model == 'gevent':
+            try:
+                import gevent  # noqa: F401
+            except ImportError:
+                print('  gevent: omitido (pip install gevent)')
+                continue
+        benchmark_model(model, args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
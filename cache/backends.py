@@ -0,0 +1,215 @@
+"""
+Backends de caché intercambiables.
+Todos guardan cadenas con el mismo contrato (get, set, add, delete, incr) y
+se eligen con CACHE_BACKEND:
+
+    memory: LRU en memoria del proceso (solo para un único worker)
+    file:   fichero SQLite compartido por todos los workers del host (por defecto),
+            en el directorio de instancia de la aplicación y legible solo por su usuario
+    redis:  servidor compatible con el protocolo de Redis, compartido entre hosts
+"""
+
+from cache.redis_client import RedisClient
+from collections import OrderedDict
+import threading
+import hashlib
+import sqlite3
+import time
+import os
+
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_BACKEND = 'file'
+# Cada cuántas escrituras se purgan las entradas caducadas del fichero
+FILE_PURGE_INTERVAL = 1000
+
+
+class MemoryBackend:
+    """LRU acotado en memoria del proceso, con caducidad por entrada"""
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _live(self, key: str, now: float):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= now:
+            del self._entries[key]
+            return None
+        return value
+
+    def _store(self, key: str, value: str, ttl):
+        self._entries[key] = (value, time.monotonic() + ttl if ttl else None)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str):
+        with self._lock:
+            value = self._live(key, time.monotonic())
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: str, ttl: int = None):
+        with self._lock:
+            self._store(key, value, ttl)
+
+    def add(self, key: str, value: str, ttl: int = None) -> bool:
+        """Guarda el valor solo si la clave no existe"""
+        with self._lock:
+            if self._live(key, time.monotonic()) is not None:
+                return False
+            self._store(key, value, ttl)
+            return True
+
+    def delete(self, key: str):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def incr(self, key: str, ttl: int = None) -> int:
+        with self._lock:
+            value = int(self._live(key, time.monotonic()) or 0) + 1
+            self._store(key, str(value), ttl)
+            return value
+
+
+class FileBackend:
+    """
+    Caché compartida por los procesos de un mismo host en un fichero SQLite
+    (modo WAL, una conexión por hilo y proceso). Las lecturas no bloquean a
+    las escrituras y INCR es atómico dentro de SQLite.
+
+    El directorio se crea con permisos 0700 y el fichero con 0600 (SQLite da
+    los mismos a -wal y -shm): las entradas incluyen perfiles de usuario y un
+    fichero legible o sustituible por otros usuarios del host los expondría.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        os.close(os.open(path, os.O_RDWR | os.O_CREAT, 0o600))
+        self._local = threading.local()
+        self._writes = 0
+        self._connection().execute(
+            'CREATE TABLE IF NOT EXISTS cache_entries '
+            '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL)'
+        )
+
+    def _connection(self):
+        # Las conexiones heredadas de otro proceso (fork de gunicorn) no se reutilizan
+        if getattr(self._local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return self._local.connection
+
+    def get(self, key: str):
+        row = self._connection().execute(
+            'SELECT value FROM cache_entries WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)',
+            (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key: str, value: str, ttl: int = None):
+        self._connection().execute(
+            'INSERT OR REPLACE INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?)',
+            (key, value, time.time() + ttl if ttl else None)
+        )
+        self._maybe_purge()
+
+    def add(self, key: str, value: str, ttl: int = None) -> bool:
+        """Guarda el valor solo si la clave no existe (o ha caducado)"""
+        now = time.time()
+        cursor = self._connection().execute(
+            'INSERT INTO cache_entries (key, value, expires_at) VALUES (?, ?, ?) '
+            'ON CONFLICT(key) DO UPDATE SET value = excluded.value, expires_at = excluded.expires_at '
+            'WHERE cache_entries.expires_at IS NOT NULL AND cache_entries.expires_at <= ?',
+            (key, value, now + ttl if ttl else None, now)
+        )
+        return cursor.rowcount > 0
+
+    def delete(self, key: str):
+        self._connection().execute('DELETE FROM cache_entries WHERE key = ?', (key,))
+
+    def incr(self, key: str, ttl: int = None) -> int:
+        expires_at = time.time() + ttl if ttl else None
+        row = self._connection().execute(
+            "INSERT INTO cache_entries (key, value, expires_at) VALUES (?, '1', ?) "
+            'ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1, expires_at = excluded.expires_at '
+            'RETURNING value',
+            (key, expires_at)
+        ).fetchone()
+        return int(row[0])
+
+    def _maybe_purge(self):
+        self._writes += 1
+        if self._writes % FILE_PURGE_INTERVAL == 0:
+            self._connection().execute(
+                'DELETE FROM cache_entries WHERE expires_at IS NOT NULL AND expires_at <= ?', (time.time(),)
+            )
+
+
+class RedisBackend:
+    """Caché compartida en un servidor que hable el protocolo de Redis"""
+
+    def __init__(self, url: str, prefix: str = 'cache:'):
+        self.client = RedisClient(url)
+        self.prefix = prefix
+
+    def get(self, key: str):
+        value = self.client.get(self.prefix + key)
+        return value.decode('utf-8') if value is not None else None
+
+    def set(self, key: str, value: str, ttl: int = None):
+        self.client.set(self.prefix + key, value, ttl)
+
+    def add(self, key: str, value: str, ttl: int = None) -> bool:
+        return self.client.set(self.prefix + key, value, ttl, nx=True) is not None
+
+    def delete(self, key: str):
+        self.client.delete(self.prefix + key)
+
+    def incr(self, key: str, ttl: int = None) -> int:
+        return self.client.incr(self.prefix + key, ttl)
+
+
+def default_file_path(directory: str, database_uri: str = None):
+    """
+    Fichero de caché propio de cada base de datos dentro de `directory` (el
+    directorio de instancia de la aplicación): dos aplicaciones del mismo
+    host no comparten entradas
+    """
+    if not database_uri:
+        return os.path.join(directory, 'book_api_cache.sqlite3')
+    suffix = hashlib.sha1(database_uri.encode()).hexdigest()[:12]
+    return os.path.join(directory, f'book_api_cache-{suffix}.sqlite3')
+
+
+def create_cache_backend(config: dict):
+    """
+    Crea el backend de caché según la configuración
+
+    CACHE_BACKEND: 'file' (por defecto), 'memory' o 'redis'
+    CACHE_MAX_ENTRIES: entradas máximas del backend 'memory'
+    CACHE_FILE_PATH: fichero SQLite del backend 'file' (por defecto uno por base de datos en CACHE_DIR)
+    CACHE_DIR: directorio de la caché 'file' (el directorio de instancia de la aplicación)
+    CACHE_REDIS_URL: URL del servidor para el backend 'redis'
+
+    'memory' no se comparte entre workers: una invalidación en un worker no
+    llega a los demás, así que solo sirve con un único proceso.
+    """
+    kind = config.get('CACHE_BACKEND', DEFAULT_BACKEND)
+    if kind == 'file':
+        return FileBackend(config.get('CACHE_FILE_PATH') or default_file_path(
+            config.get('CACHE_DIR', 'instance'), config.get('SQLALCHEMY_DATABASE_URI')
+        ))
+    if kind == 'redis':
+        return RedisBackend(config.get('CACHE_REDIS_URL', 'redis://localhost:6379/0'))
+    return MemoryBackend(config.get('CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES))
@@ -0,0 +1,196 @@
+"""
+Cliente mínimo del protocolo de Redis (RESP2) sin dependencias externas.
+Implementa solo los comandos que usan la caché y el rate limit (GET, SET,
+DEL, INCR, EXPIRE, PING, PUBLISH/SUBSCRIBE y scripts Lua con EVALSHA/EVAL)
+con una conexión por hilo y reconexión automática ante errores de red.
+Funciona con cualquier servidor compatible (Redis, Valkey, KeyDB o un
+sustituto local para pruebas).
+"""
+
+from urllib.parse import urlparse
+import threading
+import socket
+import os
+
+
+class RedisError(Exception):
+    """Error devuelto por el servidor"""
+
+
+class RedisClient:
+    """Cliente RESP2 con una conexión por hilo"""
+
+    def __init__(self, url: str = 'redis://localhost:6379/0', timeout: float = 2.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.password = parsed.password
+        self.db = int((parsed.path or '/0').lstrip('/') or 0)
+        self.timeout = timeout
+        self._local = threading.local()
+
+    # --- Conexión ---
+
+    def _connected(self):
+        # Un socket heredado de otro proceso (fork de gunicorn) no se reutiliza
+        return getattr(self._local, 'sock', None) is not None and self._local.pid == os.getpid()
+
+    def _connect(self):
+        sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self._local.sock = sock
+        self._local.reader = sock.makefile('rb')
+        self._local.pid = os.getpid()
+        if self.password:
+            self._command('AUTH', self.password)
+        if self.db:
+            self._command('SELECT', self.db)
+
+    def _disconnect(self):
+        sock = getattr(self._local, 'sock', None)
+        if sock is not None:
+            try:
+                self._local.reader.close()
+                sock.close()
+            except OSError:
+                pass
+        self._local.sock = None
+
+    def execute(self, *args):
+        """Envía un comando; reintenta una vez si la conexión se había cerrado"""
+        for attempt in (1, 2):
+            if not self._connected():
+                self._connect()
+            try:
+                return self._command(*args)
+            except (OSError, ConnectionError):
+                self._disconnect()
+                if attempt == 2:
+                    raise
+
+    def _command(self, *args):
+        self._local.sock.sendall(encode_command(args))
+        return read_reply(self._local.reader)
+
+    # --- Comandos ---
+
+    def ping(self):
+        return self.execute('PING') == 'PONG'
+
+    def get(self, key: str):
+        return self.execute('GET', key)
+
+    def set(self, key: str, value, ttl: int = None, nx: bool = False):
+        """SET con caducidad opcional; con nx=True devuelve None si la clave ya existía"""
+        args = ['SET', key, value]
+        if ttl:
+            args += ['EX', int(ttl)]
+        if nx:
+            args.append('NX')
+        return self.execute(*args)
+
+    def delete(self, *keys):
+        return self.execute('DEL', *keys)
+
+    def incr(self, key: str, ttl: int = None):
+        """INCR y, con ttl, renueva la caducidad de la clave"""
+        value = self.execute('INCR', key)
+        if ttl:
+            self.execute('EXPIRE', key, int(ttl))
+        return value
+
+    def publish(self, channel: str, message):
+        return self.execute('PUBLISH', channel, message)
+
+    def subscribe(self, *channels):
+        """Conexión dedicada suscrita a los canales (ver RedisSubscription)"""
+        return RedisSubscription(self, channels)
+
+    def evalsha(self, sha: str, script: str, keys=(), args=()):
+        """Ejecuta un script Lua por su SHA1; si el servidor aún no lo tiene, lo envía con EVAL"""
+        try:
+            return self.execute('EVALSHA', sha, len(keys), *keys, *args)
+        except RedisError as e:
+            if not str(e).startswith('NOSCRIPT'):
+                raise
+            return self.execute('EVAL', script, len(keys), *keys, *args)
+
+
+class RedisSubscription:
+    """
+    Conexión propia en modo SUBSCRIBE: messages() bloquea hasta que llega
+    cada mensaje publicado en los canales; close() desde otro hilo corta la
+    espera
+    """
+
+    def __init__(self, client: RedisClient, channels):
+        self.client = client
+        self.channels = channels
+        self._sock = None
+        self._closed = False
+
+    def messages(self):
+        """Genera (canal, datos) de los mensajes recibidos hasta que se cierra o se pierde la conexión"""
+        sock = socket.create_connection((self.client.host, self.client.port), timeout=self.client.timeout)
+        self._sock = sock
+        reader = sock.makefile('rb')
+        try:
+            if self.client.password:
+                sock.sendall(encode_command(('AUTH', self.client.password)))
+                read_reply(reader)
+            sock.sendall(encode_command(('SUBSCRIBE',) + tuple(self.channels)))
+            # Sin timeout de lectura: la conexión queda inactiva hasta el siguiente mensaje
+            sock.settimeout(None)
+            while not self._closed:
+                reply = read_reply(reader)
+                if isinstance(reply, list) and len(reply) == 3 and reply[0] == b'message':
+                    yield reply[1].decode('utf-8'), reply[2]
+        finally:
+            reader.close()
+            sock.close()
+
+    def close(self):
+        self._closed = True
+        if self._sock is not None:
+            try:
+                self._sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+def encode_command(args) -> bytes:
+    """Serializa un comando como array RESP de bulk strings"""
+    parts = [b'*%d\r\n' % len(args)]
+    for arg in args:
+        if isinstance(arg, bytes):
+            data = arg
+        else:
+            data = str(arg).encode('utf-8')
+        parts.append(b'$%d\r\n%s\r\n' % (len(data), data))
+    return b''.join(parts)
+
+
+def read_reply(reader):
+    """Lee una respuesta RESP2 completa del flujo"""
+    line = reader.readline()
+    if not line:
+        raise ConnectionError('Conexión cerrada por el servidor')
+    prefix, payload = line[:1], line[1:-2]
+    if prefix == b'+':
+        return payload.decode('utf-8')
+    if prefix == b'-':
+        raise RedisError(payload.decode('utf-8'))
+    if prefix == b':':
+        return int(payload)
+    if prefix == b'$':
+        length = int(payload)
+        if length == -1:
+            return None
+        data = reader.read(length + 2)
+        return data[:-2]
+    if prefix == b'*':
+        length = int(payload)
+        if length == -1:
+            return None
+        return [read_reply(reader) for _ in range(length)]
+    raise RedisError(f'Respuesta RESP desconocida: {line!r}')
@@ -0,0 +1,122 @@
+"""
+Caché compartida de la capa de servicios.
+Serializa los valores en JSON sobre el backend configurado y ofrece espacios
+de nombres con versión por clave: cada entrada se guarda bajo la versión
+vigente de su clave e invalidarla incrementa esa versión en el backend, de
+modo que una escritura en cualquier worker deja inaccesibles las copias de
+todos los demás (y una lectura de BD que termine después de la
+invalidación no puede volver a cachear un valor obsoleto). Las versiones
+caducan como las entradas, pero más tarde: una versión que desaparece solo
+deja huérfanas las entradas que ya no se pueden leer.
+"""
+
+from cache.backends import MemoryBackend
+import json
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 300
+# Vida mínima de las claves de versión (y al menos el doble que la de las entradas)
+VERSION_TTL = 24 * 3600
+
+
+class SharedCache:
+    """Caché JSON sobre un backend intercambiable; los errores del backend no llegan al llamador"""
+
+    def __init__(self, backend=None, default_ttl: int = DEFAULT_TTL):
+        self.backend = backend or MemoryBackend()
+        self.default_ttl = default_ttl
+
+    def configure(self, backend, default_ttl: int = None):
+        """Sustituye el backend (y opcionalmente la caducidad por defecto)"""
+        self.backend = backend
+        if default_ttl:
+            self.default_ttl = default_ttl
+
+    def get(self, key: str):
+        try:
+            raw = self.backend.get(key)
+        except Exception as e:
+            logger.error(f'Error al leer la caché ({key}): {str(e)}')
+            return None
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value, ttl: int = None):
+        try:
+            self.backend.set(key, json.dumps(value), ttl or self.default_ttl)
+        except Exception as e:
+            logger.error(f'Error al escribir en la caché ({key}): {str(e)}')
+
+    def delete(self, key: str):
+        try:
+            self.backend.delete(key)
+        except Exception as e:
+            logger.error(f'Error al borrar de la caché ({key}): {str(e)}')
+
+    def namespace(self, name: str, ttl: int = None):
+        return CacheNamespace(self, name, ttl)
+
+
+class CacheNamespace:
+    """Claves versionadas bajo un prefijo común"""
+
+    def __init__(self, cache: SharedCache, name: str, ttl: int = None):
+        self.cache = cache
+        self.name = name
+        self.ttl = ttl
+
+    @property
+    def version_ttl(self):
+        """Caducidad de las claves de versión, siempre mayor que la de sus entradas"""
+        return max(VERSION_TTL, 2 * (self.ttl or self.cache.default_ttl))
+
+    def _version(self, key):
+        """
+        Versión vigente de la clave. Si no existe (primer uso o expulsada por
+        el backend) se siembra con la hora actual en microsegundos, para no
+        volver nunca a una versión que pudiera tener entradas antiguas.
+        """
+        version_key = f'{self.name}:version:{key}'
+        backend = self.cache.backend
+        try:
+            version = backend.get(version_key)
+            if version is None:
+                backend.add(version_key, _version_seed(), self.version_ttl)
+                version = backend.get(version_key)
+            return version
+        except Exception as e:
+            logger.error(f'Error al leer la versión de caché {version_key}: {str(e)}')
+            return None
+
+    def get_or_load(self, key, loader):
+        """
+        Valor cacheado de la clave o, si no está, el resultado de loader()
+        (que se cachea salvo que sea None)
+        """
+        version = self._version(key)
+        if version is not None:
+            value = self.cache.get(f'{self.name}:{key}:{version}')
+            if value is not None:
+                return value
+        value = loader()
+        if value is not None and version is not None:
+            self.cache.set(f'{self.name}:{key}:{version}', value, self.ttl)
+        return value
+
+    def invalidate(self, key):
+        """Incrementa la versión de la clave en el backend compartido"""
+        version_key = f'{self.name}:version:{key}'
+        try:
+            self.cache.backend.add(version_key, _version_seed(), self.version_ttl)
+            self.cache.backend.incr(version_key, self.version_ttl)
+        except Exception as e:
+            logger.error(f'Error al invalidar la caché {version_key}: {str(e)}')
+
+
+def _version_seed():
+    return str(time.time_ns() // 1000)
+
+
+shared_cache = SharedCache()
@@ -1,9 +1,30 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from services.book_service import BookService
+from flask import Blueprint, Response, request, jsonify, current_app, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt, verify_jwt_in_request
+from services.book_service import (
+    BookService, BATCH_OPERATIONS, BATCH_OK, BATCH_CREATED, BATCH_NOT_FOUND, BATCH_CONFLICT,
+    DUPLICATE_MODES, DUPLICATES_FLAG, DEFAULT_DUPLICATE_THRESHOLD
+)
+from services.book_events import (
+    book_events, BookEvent, sse_enabled, issue_stream_ticket, read_stream_ticket, DEFAULT_TICKET_SECONDS
+)
+from services.book_analytics import GROUP_FIELDS, HISTOGRAM_FIELDS, MAX_BINS
+from services.book_import_service import (
+    ImportJob, detect_format, start_import_job, RUNNER_THREAD,
+    DEFAULT_BATCH_SIZE, IMPORT_FIELDS
+)
+from middleware.idempotency import idempotent
+from repositories.book_group_commit import GroupCommitTimeout
+from repositories.book_import_job_repository import ImportJobRepository
 from models.db import db
 from models.book_model import Book
 from datetime import datetime
+import csv
+import io
+import json
+import tempfile
+import shutil
+import os
+import time
 import logging
 
 logger = logging.getLogger(__name__)
@@ -11,6 +32,47 @@ logger = logging.getLogger(__name__)
 # Crear un Blueprint para las rutas de libros
 book_bp = Blueprint('book_bp', __name__)
 
+# Tamaño máximo de página para los listados paginados
+MAX_PAGE_SIZE = 1000
+# Segundos entre comentarios keep-alive en las conexiones SSE
+SSE_HEARTBEAT_SECONDS = 15
+# Máximo de ISBN por búsqueda en lote
+MAX_ISBN_LOOKUP = 1000
+# Máximo de operaciones por petición a /batch
+MAX_BATCH_OPERATIONS = 100
+# Código HTTP de cada resultado de un lote
+BATCH_STATUS = {BATCH_OK: 200, BATCH_CREATED: 201, BATCH_NOT_FOUND: 404, BATCH_CONFLICT: 409}
+
+# Libros devueltos como máximo por /books/<id>/similar
+MAX_SIMILAR_BOOKS = 100
+
+def resolve_duplicate_mode(value: str = None):
+    """Modo de casi duplicados pedido o, si no se indica, el configurado (None si no es válido)"""
+    mode = value or current_app.config.get('BOOK_DUPLICATE_MODE', DUPLICATES_FLAG)
+    return mode if mode in DUPLICATE_MODES else None
+
+def group_commit_timeout_response(error: GroupCommitTimeout):
+    """503 con Retry-After para una escritura retirada de la cola del group commit (no se aplicó)"""
+    logger.warning(str(error))
+    response = jsonify({
+        'error': 'Servicio saturado',
+        'message': 'La operación no se ha aplicado. Reintenta más tarde.'
+    })
+    response.status_code = 503
+    response.headers['Retry-After'] = '1'
+    return response
+
+def validate_update_data(data: dict):
+    """Valida los tipos de los campos presentes en una actualización parcial (mensaje de error o None)"""
+    if "published_year" in data and data["published_year"] is not None:
+        if not isinstance(data["published_year"], int):
+            return "Published year must be an integer."
+        if data["published_year"] < 1000 or data["published_year"] > datetime.now().year + 10:
+            return f"Published year must be between 1000 and {datetime.now().year + 10}."
+    if data.get("isbn") is not None and not isinstance(data["isbn"], str):
+        return "ISBN must be a string."
+    return None
+
 # Definir las rutas para las operaciones CRUD de libros
 @book_bp.route('/books', methods=['GET'])
 @jwt_required()
@@ -21,8 +83,14 @@ def get_books():
     Headers:
         Authorization: Bearer <jwt_token>
     
+    Query params:
+        limit: tamaño de página (opcional, activa la paginación por cursor)
+        after: cursor devuelto en next_cursor por la página anterior (opcional)
+        exact: true para calcular el total con COUNT(*) en lugar del contador mantenido
+    
     Returns:
         200: Lista de libros
+        400: Parámetros de paginación inválidos
         401: Token inválido o faltante
         500: Error interno
     """
@@ -30,15 +98,32 @@ def get_books():
         current_user_id = get_jwt_identity()
         logger.info(f'Consultando libros (usuario ID: {current_user_id})')
         
+        limit = request.args.get('limit', type=int)
+        after_id = request.args.get('after', type=int)
+        exact = request.args.get('exact', 'false').lower() in ('1', 'true', 'yes')
+        if limit is not None and (limit < 1 or limit > MAX_PAGE_SIZE):
+            return jsonify({"error": f"limit debe estar entre 1 y {MAX_PAGE_SIZE}"}), 400
+        
         # Crear servicio con la sesión de Flask-SQLAlchemy
         service = BookService(db.session)
-        books = service.get_all_books()
+        # El cursor se lee antes que los libros: los cambios concurrentes aparecerán en /books/changes
+        cursor = service.get_change_cursor()
+        if limit is None:
+            books = service.get_all_books()
+        else:
+            books = service.get_books_page(limit, after_id)
+        # El total sale del contador mantenido (o de COUNT(*) si se pide exacto), sin materializar la tabla
+        total = service.count_books(exact=exact)
         
         logger.info(f'{len(books)} libros encontrados')
-        return jsonify({
+        response = {
             'books': [book.to_dict() for book in books],
-            'total': len(books)
-        }), 200
+            'total': total,
+            'cursor': cursor
+        }
+        if limit is not None:
+            response['next_cursor'] = books[-1].id if len(books) == limit else None
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f'Error al consultar libros: {str(e)}')
@@ -87,14 +172,64 @@ def get_book(book_id):
             'detail': str(e)
         }), 500
 
+@book_bp.route('/books/<int:book_id>/similar', methods=['GET'])
+@jwt_required()
+def get_similar_books(book_id):
+    """
+    Obtener los libros con título y autor parecidos a uno dado (requiere autenticación JWT)
+
+    Los candidatos salen del índice MinHash de casi duplicados y se ordenan
+    por similitud de Jaccard (0 a 1) de los trigramas de título y autor.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Query params:
+        min_similarity: similitud mínima (0.5 por defecto)
+        limit: máximo de libros a devolver (10 por defecto)
+
+    Returns:
+        200: Libros parecidos
+        400: Parámetros inválidos
+        401: Token inválido o faltante
+        404: Libro no encontrado
+        500: Error interno
+    """
+    try:
+        min_similarity = request.args.get('min_similarity', 0.5, type=float)
+        limit = request.args.get('limit', 10, type=int)
+        if min_similarity is None or not 0 < min_similarity <= 1:
+            return jsonify({"error": "min_similarity debe estar entre 0 y 1"}), 400
+        if limit is None or limit < 1 or limit > MAX_SIMILAR_BOOKS:
+            return jsonify({"error": f"limit debe estar entre 1 y {MAX_SIMILAR_BOOKS}"}), 400
+
+        service = BookService(db.session)
+        similar = service.get_similar_books(book_id, min_similarity, limit)
+        if similar is None:
+            return jsonify({"error": "Libro no encontrado"}), 404
+        return jsonify({
+            'book_id': book_id,
+            'similar': similar,
+            'count': len(similar)
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Error al buscar libros parecidos: {str(e)}')
+        return jsonify({
+            'error': 'Error al buscar libros parecidos',
+            'detail': str(e)
+        }), 500
+
 @book_bp.route('/books', methods=['POST'])
 @jwt_required()
+@idempotent()
 def create_book():
     """
     Crear un nuevo libro (requiere autenticación JWT)
     
     Headers:
         Authorization: Bearer <jwt_token>
+        Idempotency-Key: clave única de la operación (opcional; los reintentos reciben la respuesta original)
     
     Expected JSON:
     {
@@ -108,15 +243,25 @@ def create_book():
         "isbn": "978-84-376-0675-0"
     }
     
+    Query params:
+        duplicates: off | flag | reject (por defecto BOOK_DUPLICATE_MODE). Con flag,
+            los casi duplicados (título y autor parecidos) se devuelven en
+            "possible_duplicates"; con reject, impiden el alta
+
     Returns:
         201: Libro creado exitosamente
         400: Datos inválidos
         401: Token inválido o faltante
+        409: Ya existe un libro con el mismo ISBN (o casi duplicados con duplicates=reject)
         500: Error interno
+        503: Escritura no aplicada por saturación del group commit (con Retry-After)
     """
     try:
         current_user_id = get_jwt_identity()
         data = request.get_json() or {}
+        duplicate_mode = resolve_duplicate_mode(request.args.get('duplicates'))
+        if duplicate_mode is None:
+            return jsonify({"error": f"duplicates debe ser uno de: {', '.join(DUPLICATE_MODES)}"}), 400
         
         logger.info(f'Creando libro (usuario ID: {current_user_id})')
         logger.info(f'Datos recibidos: {data}')
@@ -129,14 +274,27 @@ def create_book():
         
         # Crear servicio con la sesión de Flask-SQLAlchemy
         service = BookService(db.session)
-        new_book = service.create_book(data)
+        new_book = service.create_book(
+            data, duplicate_mode, current_app.config.get('BOOK_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD)
+        )
+        if isinstance(new_book, dict) and 'duplicates' in new_book:
+            logger.warning(f"Alta rechazada por casi duplicados: {[match['id'] for match in new_book['duplicates']]}")
+            return jsonify(new_book), 409
+        if isinstance(new_book, dict) and 'error' in new_book:
+            logger.warning(f"Intento de crear libro con ISBN existente: {new_book['isbn']}")
+            return jsonify({'error': new_book['error'], 'isbn': new_book['isbn']}), 409
         
         logger.info(f'Libro creado exitosamente: {new_book.title} (ID: {new_book.id})')
-        return jsonify({
+        response = {
             'message': 'Libro creado exitosamente',
             'book': new_book.to_dict()
-        }), 201
+        }
+        if new_book.possible_duplicates:
+            response['possible_duplicates'] = new_book.possible_duplicates
+        return jsonify(response), 201
         
+    except GroupCommitTimeout as e:
+        return group_commit_timeout_response(e)
     except Exception as e:
         logger.error(f'Error al crear libro: {str(e)}')
         return jsonify({
@@ -146,12 +304,14 @@ def create_book():
 
 @book_bp.route('/books/<int:book_id>', methods=['PUT'])
 @jwt_required()
+@idempotent()
 def update_book(book_id):
     """
     Actualizar un libro existente (requiere autenticación JWT)
     
     Headers:
         Authorization: Bearer <jwt_token>
+        Idempotency-Key: clave única de la operación (opcional; los reintentos reciben la respuesta original)
     
     Expected JSON:
     {
@@ -170,7 +330,9 @@ def update_book(book_id):
         400: Datos inválidos
         401: Token inválido o faltante
         404: Libro no encontrado
+        409: Ya existe otro libro con el mismo ISBN
         500: Error interno
+        503: Escritura no aplicada por saturación del group commit (con Retry-After)
     """
     try:
         current_user_id = get_jwt_identity()
@@ -179,16 +341,16 @@ def update_book(book_id):
         logger.info(f'Actualizando libro ID {book_id} (usuario ID: {current_user_id})')
         
         # Para actualización, no validamos campos requeridos (actualización parcial)
-        # Solo validamos tipos de datos si están presentes
-        if "published_year" in data and data["published_year"] is not None:
-            if not isinstance(data["published_year"], int):
-                return jsonify({"error": "Published year must be an integer."}), 400
-            if data["published_year"] < 1000 or data["published_year"] > datetime.now().year + 10:
-                return jsonify({"error": f"Published year must be between 1000 and {datetime.now().year + 10}."}), 400
+        error = validate_update_data(data)
+        if error:
+            return jsonify({"error": error}), 400
         
         # Crear servicio con la sesión de Flask-SQLAlchemy
         service = BookService(db.session)
         updated_book = service.update_book(book_id, data)
+        if isinstance(updated_book, dict) and 'error' in updated_book:
+            logger.warning(f"Intento de asignar un ISBN existente al libro {book_id}: {updated_book['isbn']}")
+            return jsonify({'error': updated_book['error'], 'isbn': updated_book['isbn']}), 409
         
         if updated_book:
             logger.info(f'Libro actualizado exitosamente: {updated_book.title}')
@@ -200,6 +362,8 @@ def update_book(book_id):
             logger.warning(f'Libro no encontrado para actualizar con ID: {book_id}')
             return jsonify({"error": "Libro no encontrado"}), 404
             
+    except GroupCommitTimeout as e:
+        return group_commit_timeout_response(e)
     except Exception as e:
         logger.error(f'Error al actualizar libro: {str(e)}')
         return jsonify({
@@ -209,18 +373,21 @@ def update_book(book_id):
 
 @book_bp.route('/books/<int:book_id>', methods=['DELETE'])
 @jwt_required()
+@idempotent()
 def delete_book(book_id):
     """
     Eliminar un libro (requiere autenticación JWT)
     
     Headers:
         Authorization: Bearer <jwt_token>
+        Idempotency-Key: clave única de la operación (opcional; los reintentos reciben la respuesta original)
     
     Returns:
         200: Libro eliminado exitosamente
         401: Token inválido o faltante
         404: Libro no encontrado
         500: Error interno
+        503: Escritura no aplicada por saturación del group commit (con Retry-After)
     """
     try:
         current_user_id = get_jwt_identity()
@@ -240,10 +407,662 @@ def delete_book(book_id):
             logger.warning(f'Libro no encontrado para eliminar con ID: {book_id}')
             return jsonify({"error": "Libro no encontrado"}), 404
             
+    except GroupCommitTimeout as e:
+        return group_commit_timeout_response(e)
     except Exception as e:
         logger.error(f'Error al eliminar libro: {str(e)}')
         return jsonify({
             'error': 'Error al eliminar libro', 
             'detail': str(e)
-        }), 500    
+        }), 500
+
+@book_bp.route('/batch', methods=['POST'])
+@jwt_required()
+@idempotent()
+def execute_batch():
+    """
+    Ejecutar varias operaciones de libros en una sola petición (requiere autenticación JWT)
+
+    Las operaciones se ejecutan en orden, con una sola verificación del
+    token y un único COMMIT. Por defecto cada operación es independiente
+    (un error solo afecta a la suya); con "atomic": true el lote es todo o
+    nada y la primera operación fallida revierte las demás.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+        Idempotency-Key: clave única de la operación (opcional; los reintentos reciben la respuesta original)
+
+    Expected JSON ("duplicates" como en POST /books, opcional):
+    {
+        "atomic": false,
+        "duplicates": "flag",
+        "operations": [
+            {"op": "create", "data": {"title": "...", "author": "..."}},
+            {"op": "update", "id": 1, "data": {"pages": 300}},
+            {"op": "delete", "id": 2},
+            {"op": "get", "id": 3}
+        ]
+    }
+
+    Returns:
+        200: Lote ejecutado; "results" tiene el código y el libro o error de cada operación
+        400: Petición mal formada (o, con atomic, alguna operación inválida)
+        401: Token inválido o faltante
+        409: Lote atómico revertido por una operación fallida
+        500: Error interno
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        data = request.get_json(silent=True) or {}
+        operations = data.get('operations')
+        atomic = data.get('atomic', False)
+        if not isinstance(operations, list) or not operations:
+            return jsonify({"error": "operations debe ser una lista no vacía"}), 400
+        if len(operations) > MAX_BATCH_OPERATIONS:
+            return jsonify({"error": f"Máximo {MAX_BATCH_OPERATIONS} operaciones por lote"}), 400
+        if not isinstance(atomic, bool):
+            return jsonify({"error": "atomic debe ser booleano"}), 400
+        duplicate_mode = resolve_duplicate_mode(data.get('duplicates'))
+        if duplicate_mode is None:
+            return jsonify({"error": f"duplicates debe ser uno de: {', '.join(DUPLICATE_MODES)}"}), 400
+
+        logger.info(f'Lote de {len(operations)} operaciones (usuario ID: {current_user_id}, atómico: {atomic})')
+
+        # Validar todas las operaciones antes de tocar la base de datos
+        results = [None] * len(operations)
+        valid = []
+        for index, operation in enumerate(operations):
+            error = _validate_batch_operation(operation)
+            if error:
+                results[index] = {'index': index, 'status': 400, 'error': error}
+            else:
+                valid.append((index, {
+                    'op': operation['op'],
+                    'id': operation.get('id'),
+                    'data': operation.get('data') or {}
+                }))
+        if atomic and len(valid) < len(operations):
+            return jsonify({
+                'atomic': True,
+                'committed': False,
+                'results': [result or {'index': index, 'status': 424, 'error': 'No ejecutada: el lote tiene operaciones inválidas'}
+                            for index, result in enumerate(results)]
+            }), 400
+
+        service = BookService(db.session)
+        threshold = current_app.config.get('BOOK_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD)
+        outcomes, committed = service.execute_batch(
+            [operation for _, operation in valid], atomic, duplicate_mode, threshold
+        ) if valid else ([], True)
+        for (index, operation), (outcome, value) in zip(valid, outcomes):
+            result = {'index': index, 'op': operation['op']}
+            if outcome in (BATCH_OK, BATCH_CREATED):
+                result.update(status=BATCH_STATUS[outcome], book=value.to_dict())
+                if getattr(value, 'possible_duplicates', None):
+                    result['possible_duplicates'] = value.possible_duplicates
+            elif outcome in BATCH_STATUS:
+                result.update(status=BATCH_STATUS[outcome], **value)
+            else:
+                result.update(status=424, error='No aplicada: el lote se revirtió')
+            results[index] = result
+
+        return jsonify({
+            'atomic': atomic,
+            'committed': committed,
+            'results': results
+        }), 200 if committed else 409
+
+    except Exception as e:
+        logger.error(f'Error al ejecutar el lote: {str(e)}')
+        return jsonify({
+            'error': 'Error al ejecutar el lote',
+            'detail': str(e)
+        }), 500
+
+def _validate_batch_operation(operation):
+    """Valida una operación de /batch con las mismas reglas que su endpoint individual"""
+    if not isinstance(operation, dict) or operation.get('op') not in BATCH_OPERATIONS:
+        return f"op debe ser uno de: {', '.join(BATCH_OPERATIONS)}"
+    op = operation['op']
+    if op != 'create':
+        book_id = operation.get('id')
+        if not isinstance(book_id, int) or isinstance(book_id, bool) or book_id < 1:
+            return "id debe ser un entero positivo"
+    if op in ('create', 'update'):
+        data = operation.get('data')
+        if not isinstance(data, dict):
+            return "data debe ser un objeto"
+        return Book.validate_book_data(data) if op == 'create' else validate_update_data(data)
+    return None
+
+@book_bp.route('/books/isbn/<isbn>', methods=['GET'])
+@jwt_required()
+def get_book_by_isbn(isbn):
+    """
+    Obtener un libro por ISBN (requiere autenticación JWT)
+    
+    Acepta ISBN-10 o ISBN-13, con o sin guiones; la búsqueda usa el índice
+    único del ISBN normalizado
+    
+    Returns:
+        200: Libro encontrado
+        400: ISBN inválido
+        401: Token inválido o faltante
+        404: Libro no encontrado
+        500: Error interno
+    """
+    try:
+        isbn_normalized = Book.normalize_isbn(isbn)
+        if isbn_normalized is None:
+            return jsonify({"error": "ISBN inválido", "isbn": isbn}), 400
+        
+        service = BookService(db.session)
+        book = service.get_book_by_isbn(isbn_normalized)
+        if book:
+            return jsonify({
+                'message': 'Libro encontrado',
+                'book': book.to_dict()
+            }), 200
+        logger.info(f'Libro no encontrado con ISBN: {isbn}')
+        return jsonify({"error": "Libro no encontrado"}), 404
+        
+    except Exception as e:
+        logger.error(f'Error al consultar libro por ISBN: {str(e)}')
+        return jsonify({
+            'error': 'Error al obtener libro',
+            'detail': str(e)
+        }), 500
+
+@book_bp.route('/books/isbn/lookup', methods=['POST'])
+@jwt_required()
+def lookup_books_by_isbn():
+    """
+    Buscar varios libros por ISBN con una sola consulta (requiere autenticación JWT)
+    
+    Expected JSON:
+    {
+        "isbns": ["978-84-376-0494-7", "0-306-40615-2"]
+    }
+    
+    Returns:
+        200: {"books": {isbn: libro o null}, "found": n, "invalid": [isbn, ...]}
+        400: Petición inválida o con más de MAX_ISBN_LOOKUP ISBN
+        401: Token inválido o faltante
+        500: Error interno
+    """
+    try:
+        data = request.get_json(silent=True) or {}
+        isbns = data.get('isbns')
+        if not isinstance(isbns, list) or not all(isinstance(isbn, str) for isbn in isbns):
+            return jsonify({"error": "Se requiere 'isbns': una lista de ISBN"}), 400
+        if len(isbns) > MAX_ISBN_LOOKUP:
+            return jsonify({"error": f"Máximo {MAX_ISBN_LOOKUP} ISBN por petición"}), 400
+        
+        service = BookService(db.session)
+        results, invalid = service.lookup_isbns(isbns)
+        return jsonify({
+            'books': {isbn: book.to_dict() if book else None for isbn, book in results.items()},
+            'found': sum(1 for book in results.values() if book),
+            'invalid': invalid
+        }), 200
+        
+    except Exception as e:
+        logger.error(f'Error al buscar libros por ISBN: {str(e)}')
+        return jsonify({
+            'error': 'Error al buscar libros por ISBN',
+            'detail': str(e)
+        }), 500
+
+@book_bp.route('/books/changes', methods=['GET'])
+@jwt_required()
+def get_book_changes():
+    """
+    Obtener los cambios del catálogo posteriores a un cursor (requiere autenticación JWT)
+
+    Devuelve, en orden de secuencia, los libros creados o modificados
+    (op "upsert") y las lápidas de los eliminados (op "delete"). El cliente
+    guarda el "cursor" devuelto y lo envía como "since" en la siguiente
+    llamada. Si "reset" es true, el cursor es demasiado antiguo y el cliente
+    debe recargar el catálogo completo con GET /app/books.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Query params:
+        since: cursor de la última sincronización (0 por defecto)
+        limit: máximo de cambios a devolver (500 por defecto)
+
+    Returns:
+        200: Lista de cambios
+        400: Parámetros inválidos
+        401: Token inválido o faltante
+        500: Error interno
+    """
+    try:
+        since = request.args.get('since', 0, type=int)
+        limit = request.args.get('limit', 500, type=int)
+        if since is None or since < 0:
+            return jsonify({"error": "since debe ser un entero no negativo"}), 400
+        if limit is None or limit < 1 or limit > MAX_PAGE_SIZE:
+            return jsonify({"error": f"limit debe estar entre 1 y {MAX_PAGE_SIZE}"}), 400
+
+        service = BookService(db.session)
+        changes, reset = service.get_changes(since, limit)
+        return jsonify({
+            'changes': [book.to_change_dict() for book in changes],
+            'cursor': changes[-1].change_seq if changes else since,
+            'has_more': len(changes) == limit,
+            'reset': reset
+        }), 200
+
+    except Exception as e:
+        logger.error(f'Error al consultar cambios: {str(e)}')
+        return jsonify({
+            'error': 'Error al obtener cambios',
+            'detail': str(e)
+        }), 500
+
+@book_bp.route('/books/events/ticket', methods=['POST'])
+@jwt_required()
+def book_events_ticket():
+    """
+    Emitir un ticket para abrir el stream de eventos (requiere autenticación JWT)
+
+    EventSource no permite headers propios, así que el navegador abre el
+    stream con ?ticket=<ticket>. El ticket caduca a los pocos segundos
+    (BOOK_EVENTS_TICKET_SECONDS) y solo sirve para /books/events, de modo
+    que el JWT no viaja en la URL ni queda en los logs de acceso.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Returns:
+        200: Ticket y segundos de validez
+        401: Token inválido o faltante
+    """
+    ticket = issue_stream_ticket(current_app.config['JWT_SECRET_KEY'], get_jwt_identity(), get_jwt().get('exp'))
+    return jsonify({
+        'ticket': ticket,
+        'expires_in': current_app.config.get('BOOK_EVENTS_TICKET_SECONDS', DEFAULT_TICKET_SECONDS)
+    }), 200
+
+@book_bp.route('/books/events', methods=['GET'])
+def book_events_stream():
+    """
+    Stream Server-Sent Events con los cambios del catálogo (requiere autenticación JWT)
+
+    Cada evento tiene como ID el change_seq del cambio y como tipo "upsert",
+    "delete", "import" (lote importado, consultar /books/changes) o "reset"
+    (el cliente debe recargar el catálogo). Al reconectar, el navegador
+    envía Last-Event-ID y se reenvían los eventos perdidos.
+
+    Como EventSource no permite headers propios, el stream también se abre
+    con ?ticket=<ticket> (POST /books/events/ticket). La conexión se cierra
+    con un evento "expired" cuando caduca el JWT con el que se abrió.
+
+    Cada conexión abierta espera eventos indefinidamente, así que solo se
+    sirve con workers gevent (ver BOOK_EVENTS_SSE): con workers de hilos,
+    unas pocas pestañas ocuparían todos los hilos del worker.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+        Last-Event-ID: último ID recibido (opcional)
+
+    Query params:
+        ticket: ticket de conexión, en lugar del header Authorization
+        last_event_id: como Last-Event-ID (para reconexiones con un ticket nuevo)
+
+    Returns:
+        200: Stream text/event-stream
+        400: Last-Event-ID inválido
+        401: Token o ticket inválido, caducado o faltante
+        503: SSE no disponible con este modelo de worker (usar /books/changes)
+    """
+    ticket = request.args.get('ticket')
+    if ticket is not None:
+        grant = read_stream_ticket(current_app.config['JWT_SECRET_KEY'], ticket,
+                                   current_app.config.get('BOOK_EVENTS_TICKET_SECONDS', DEFAULT_TICKET_SECONDS))
+        if grant is None:
+            return jsonify({
+                'error': 'Ticket inválido',
+                'message': 'El ticket del stream es inválido o ha caducado. Pide otro con POST /app/books/events/ticket.'
+            }), 401
+        current_user_id, expires_at = grant
+    else:
+        verify_jwt_in_request()
+        current_user_id, expires_at = get_jwt_identity(), get_jwt().get('exp')
+
+    if not sse_enabled(current_app.config):
+        return jsonify({
+            "error": "SSE no disponible",
+            "message": "El stream de eventos requiere workers gevent (GUNICORN_WORKER_CLASS=gevent). "
+                       "Usa GET /app/books/changes para sincronizar."
+        }), 503
+
+    last_event_id = request.headers.get('Last-Event-ID', request.args.get('last_event_id'))
+    if last_event_id is not None and not str(last_event_id).isdigit():
+        return jsonify({"error": "Last-Event-ID debe ser un entero"}), 400
+
+    # Suscribirse antes de calcular los eventos perdidos para no perder cambios intermedios
+    subscription = book_events.subscribe()
+    try:
+        backlog = []
+        if last_event_id is not None:
+            last_id = int(last_event_id)
+            service = BookService(db.session)
+            cursor = service.get_change_cursor()
+            if cursor > last_id:
+                backlog = book_events.replay(last_id)
+                if backlog is None or (backlog[-1].id if backlog else last_id) < cursor:
+                    changes, reset = service.get_changes(last_id, MAX_PAGE_SIZE)
+                    if reset or len(changes) == MAX_PAGE_SIZE:
+                        backlog = [BookEvent(cursor, 'reset', {'cursor': cursor})]
+                    else:
+                        backlog = [BookEvent(change['change_seq'], change['op'], change)
+                                   for change in (book.to_change_dict() for book in changes)]
+    except Exception:
+        book_events.unsubscribe(subscription)
+        raise
+
+    logger.info(f'Conexión SSE abierta (usuario ID: {current_user_id}, {book_events.subscriber_count} activas)')
+
+    def stream():
+        try:
+            yield 'retry: 3000\n\n'
+            replayed_up_to = 0
+            for event in backlog:
+                yield event.to_sse()
+                replayed_up_to = event.id
+            while not subscription.overflowed:
+                # La conexión no sobrevive al JWT con el que se abrió
+                remaining = expires_at - time.time() if expires_at else SSE_HEARTBEAT_SECONDS
+                if remaining <= 0:
+                    yield 'event: expired\ndata: {}\n\n'
+                    break
+                event = subscription.get(timeout=min(SSE_HEARTBEAT_SECONDS, remaining))
+                if event is None:
+                    yield ': keep-alive\n\n'
+                elif event.id > replayed_up_to:
+                    yield event.to_sse()
+        finally:
+            book_events.unsubscribe(subscription)
+
+    # Sin stream_with_context: la sesión de BD se libera al terminar la vista, no al cerrar el stream
+    return Response(stream(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@book_bp.route('/books/stats', methods=['GET'])
+@jwt_required()
+def get_book_stats():
+    """
+    Obtener estadísticas del catálogo (requiere autenticación JWT)
+
+    Conteos por género, idioma y década de publicación, y total de páginas,
+    servidos desde la tabla de resumen book_stats (sin recorrer books).
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Returns:
+        200: Estadísticas del catálogo
+        401: Token inválido o faltante
+        500: Error interno
+    """
+    try:
+        service = BookService(db.session)
+        return jsonify(service.get_stats()), 200
+
+    except Exception as e:
+        logger.error(f'Error al consultar estadísticas: {str(e)}')
+        return jsonify({
+            'error': 'Error al obtener estadísticas',
+            'detail': str(e)
+        }), 500
 
+@book_bp.route('/books/analytics', methods=['GET'])
+@jwt_required()
+def get_book_analytics():
+    """
+    Analítica ad hoc del catálogo (requiere autenticación JWT)
+
+    Filtros, agrupaciones e histogramas calculados en memoria sobre la
+    instantánea columnar del catálogo (requiere el paquete opcional numpy).
+    Los filtros se combinan con AND; genre y language aceptan varios valores
+    separados por comas.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Query params:
+        year_min, year_max: rango de año de publicación (inclusive)
+        pages_min, pages_max: rango de páginas (inclusive)
+        genre, language: valores a incluir (p. ej. genre=Novela,Ensayo)
+        group_by: genre, language, decade o published_year
+        histogram: published_year o pages
+        bins: intervalos del histograma (20 por defecto)
+
+    Returns:
+        200: count, total_pages, avg_pages y, si se piden, groups e histogram
+        400: Parámetros inválidos
+        401: Token inválido o faltante
+        503: Analítica no disponible
+        500: Error interno
+    """
+    try:
+        filters = {}
+        for name in ('year_min', 'year_max', 'pages_min', 'pages_max'):
+            value = request.args.get(name)
+            if value is not None:
+                try:
+                    filters[name] = int(value)
+                except ValueError:
+                    return jsonify({"error": f"{name} debe ser un entero"}), 400
+        for name in ('genre', 'language'):
+            if request.args.get(name):
+                filters[name] = [value.strip() for value in request.args[name].split(',') if value.strip()]
+
+        group_by = request.args.get('group_by')
+        if group_by is not None and group_by not in GROUP_FIELDS:
+            return jsonify({"error": f"group_by debe ser uno de: {', '.join(GROUP_FIELDS)}"}), 400
+        histogram = request.args.get('histogram')
+        if histogram is not None and histogram not in HISTOGRAM_FIELDS:
+            return jsonify({"error": f"histogram debe ser uno de: {', '.join(HISTOGRAM_FIELDS)}"}), 400
+        bins = request.args.get('bins', 20, type=int)
+        if bins is None or bins < 1 or bins > MAX_BINS:
+            return jsonify({"error": f"bins debe estar entre 1 y {MAX_BINS}"}), 400
+
+        service = BookService(db.session)
+        result = service.get_analytics(filters, group_by, histogram, bins)
+        if result is None:
+            return jsonify({
+                "error": "Analítica no disponible",
+                "message": "Requiere el paquete numpy y BOOK_ANALYTICS habilitado"
+            }), 503
+        return jsonify(result), 200
+
+    except Exception as e:
+        logger.error(f'Error al consultar la analítica: {str(e)}')
+        return jsonify({
+            'error': 'Error al obtener la analítica',
+            'detail': str(e)
+        }), 500
+
+@book_bp.route('/books/export', methods=['GET'])
+@jwt_required()
+def export_books():
+    """
+    Exportar el catálogo completo en streaming (requiere autenticación JWT)
+
+    Los libros se leen por bloques y se emiten a medida que se generan, de
+    modo que la respuesta no se construye en memoria (y se comprime en
+    streaming si el cliente envía Accept-Encoding).
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Query params:
+        format: jsonl (por defecto) | csv
+
+    Returns:
+        200: Archivo JSONL o CSV
+        400: Formato no soportado
+        401: Token inválido o faltante
+    """
+    file_format = request.args.get('format', 'jsonl').lower()
+    if file_format not in ('jsonl', 'csv'):
+        return jsonify({"error": "Formato no soportado. Usa csv o jsonl."}), 400
+
+    current_user_id = get_jwt_identity()
+    logger.info(f'Exportando libros en {file_format} (usuario ID: {current_user_id})')
+    service = BookService(db.session)
+
+    # Ambos formatos emiten bloques de ~64 KB (no una línea por libro)
+    def generate_jsonl():
+        lines, size = [], 0
+        for book in service.iter_books():
+            line = json.dumps(book.to_dict(), ensure_ascii=False) + '\n'
+            lines.append(line)
+            size += len(line)
+            if size >= 64 * 1024:
+                yield ''.join(lines)
+                lines, size = [], 0
+        yield ''.join(lines)
+
+    def generate_csv():
+        fields = ('id',) + IMPORT_FIELDS + ('created_at', 'updated_at')
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+        for book in service.iter_books():
+            writer.writerow(book.to_dict())
+            if buffer.tell() >= 64 * 1024:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+
+    if file_format == 'csv':
+        body, mimetype = generate_csv(), 'text/csv'
+    else:
+        body, mimetype = generate_jsonl(), 'application/x-ndjson'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=books.{file_format}'
+    })
+
+@book_bp.route('/books/import', methods=['POST'])
+@jwt_required()
+@idempotent(include_body=False)
+def import_books():
+    """
+    Importar libros desde un archivo CSV o JSONL (requiere autenticación JWT)
+
+    El archivo puede enviarse como multipart (campo "file") o directamente
+    como cuerpo de la petición (Content-Type: text/csv o application/x-ndjson).
+    La importación se ejecuta en segundo plano (hilo del worker o proceso
+    import-worker, según BOOK_IMPORT_RUNNER); el progreso se guarda en la
+    base de datos y se consulta con GET /app/books/import/<job_id>.
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+        Idempotency-Key: clave única de la operación (opcional; los reintentos reciben la respuesta original)
+
+    Query params:
+        format: csv | jsonl (opcional, se deduce del nombre o Content-Type)
+        batch_size: filas por transacción (opcional)
+        duplicates: off | flag | reject para los casi duplicados (por defecto BOOK_DUPLICATE_MODE)
+
+    Returns:
+        202: Importación aceptada (incluye job_id)
+        400: Archivo o formato inválido
+        401: Token inválido o faltante
+        500: Error interno
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        upload = request.files.get('file')
+        filename = upload.filename if upload else None
+        file_format = detect_format(filename, request.content_type, request.args.get('format'))
+        if not file_format:
+            return jsonify({"error": "Formato no soportado. Usa CSV o JSONL."}), 400
+
+        default_batch = current_app.config.get('BOOK_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE)
+        batch_size = request.args.get('batch_size', default_batch, type=int)
+        if batch_size is None or batch_size < 1 or batch_size > 50000:
+            return jsonify({"error": "batch_size debe estar entre 1 y 50000"}), 400
+        duplicate_mode = resolve_duplicate_mode(request.args.get('duplicates'))
+        if duplicate_mode is None:
+            return jsonify({"error": f"duplicates debe ser uno de: {', '.join(DUPLICATE_MODES)}"}), 400
+
+        # Volcar la subida por bloques (sin cargarla en memoria) a BOOK_IMPORT_DIR, donde
+        # sobrevive al worker hasta que el trabajo termina
+        import_dir = current_app.config['BOOK_IMPORT_DIR']
+        os.makedirs(import_dir, exist_ok=True)
+        tmp = tempfile.NamedTemporaryFile(prefix='book-import-', suffix=f'.{file_format}',
+                                          dir=import_dir, delete=False)
+        with tmp:
+            if upload:
+                upload.save(tmp)
+            else:
+                shutil.copyfileobj(request.stream, tmp, 64 * 1024)
+            size = tmp.tell()
+        if size == 0:
+            os.unlink(tmp.name)
+            return jsonify({"error": "El archivo está vacío"}), 400
+
+        try:
+            job = ImportJobRepository(db.session).create(ImportJob(
+                filename or 'request-body', file_format, batch_size, duplicate_mode,
+                current_app.config.get('BOOK_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD),
+                path=tmp.name
+            ))
+        except Exception:
+            db.session.rollback()
+            os.unlink(tmp.name)
+            raise
+        logger.info(f'Importación {job.id} aceptada ({size} bytes, usuario ID: {current_user_id})')
+        # Con BOOK_IMPORT_RUNNER='worker' lo recoge el proceso import-worker
+        if current_app.config.get('BOOK_IMPORT_RUNNER') == RUNNER_THREAD:
+            start_import_job(current_app._get_current_object(), job.id)
+
+        return jsonify({
+            'message': 'Importación iniciada',
+            'job': job.to_dict()
+        }), 202
+
+    except Exception as e:
+        logger.error(f'Error al iniciar importación: {str(e)}')
+        return jsonify({
+            'error': 'Error al iniciar importación',
+            'detail': str(e)
+        }), 500
+
+@book_bp.route('/books/import/<job_id>', methods=['GET'])
+@jwt_required()
+def get_import_job(job_id):
+    """
+    Consultar el progreso de una importación (requiere autenticación JWT)
+
+    Headers:
+        Authorization: Bearer <jwt_token>
+
+    Returns:
+        200: Estado del job
+        401: Token inválido o faltante
+        404: Job no encontrado
+        500: Error interno
+    """
+    try:
+        repository = ImportJobRepository(db.session)
+        job = repository.get(job_id)
+        if not job:
+            return jsonify({"error": "Importación no encontrada"}), 404
+        return jsonify({'job': job.to_dict()}), 200
+
+    except Exception as e:
+        logger.error(f'Error al consultar importación {job_id}: {str(e)}')
+        return jsonify({
+            'error': 'Error al consultar importación',
+            'detail': str(e)
+        }), 500
@@ -0,0 +1,47 @@
+"""
+Controlador de las comprobaciones de salud para el orquestador o el balanceador.
+/healthz (liveness) solo indica que el proceso atiende peticiones;
+/readyz (readiness) comprueba además la conexión con la base de datos y
+que no haya migraciones de esquema pendientes.
+"""
+
+from flask import Blueprint, jsonify
+from middleware.db_breaker import database_breaker
+from middleware.schema_gate import schema_gate
+
+# Crear Blueprint para las comprobaciones de salud (sin JWT, rate limit ni límites de concurrencia)
+health_bp = Blueprint('health_bp', __name__)
+
+@health_bp.route('/healthz', methods=['GET'])
+def healthz():
+    """
+    Liveness: no toca la base de datos, para que una caída de la BD no
+    provoque reinicios del proceso
+
+    Returns:
+        200: {"status": "ok"}
+    """
+    return jsonify({"status": "ok"}), 200
+
+@health_bp.route('/readyz', methods=['GET'])
+def readyz():
+    """
+    Readiness: resultado cacheado (HEALTH_CHECK_TTL segundos) de un SELECT 1,
+    así los sondeos frecuentes de varias réplicas no cargan la base de datos.
+    Con el circuit breaker abierto responde 503 sin intentar conectar.
+
+    Con migraciones pendientes también responde 503: la réplica no recibe
+    tráfico hasta que se ejecuta db-upgrade.
+
+    Returns:
+        200: Listo para recibir tráfico
+        503: Base de datos no disponible o esquema pendiente de migrar
+    """
+    database = database_breaker.check_connection()
+    schema = schema_gate.status() if database['ok'] else {'ok': schema_gate.ready, 'pending': schema_gate.pending}
+    ready = database['ok'] and schema['ok']
+    return jsonify({
+        "status": "ready" if ready else "unavailable",
+        "database": database,
+        "schema": schema
+    }), 200 if ready else 503
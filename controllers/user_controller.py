@@ -4,8 +4,9 @@ Define los endpoints REST para registro, login y gestión de usuarios.
 """
 
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity, get_jwt
 from services.user_service import UserService
+from middleware.idempotency import idempotent
 from models.db import db
 from models.user_model import User
 import logging
@@ -15,7 +16,12 @@ logger = logging.getLogger(__name__)
 # Crear Blueprint para las rutas de usuarios
 user_bp = Blueprint('user_bp', __name__)
 
+# Tamaños de página del listado de usuarios
+DEFAULT_USERS_PAGE_SIZE = 100
+MAX_USERS_PAGE_SIZE = 500
+
 @user_bp.route('/register', methods=['POST'])
+@idempotent()
 def register():
     """
     Endpoint para registrar un nuevo usuario
@@ -105,8 +111,12 @@ def login():
         user = service.authenticate(login_identifier, password)
         
         if user:
-            # Crear token JWT con el ID del usuario
-            access_token = create_access_token(identity=str(user.id))
+            # Crear token JWT con el ID del usuario; username y email viajan como claims
+            # para que /auth/profile pueda responder sin consultar la base de datos
+            access_token = create_access_token(identity=str(user.id), additional_claims={
+                'username': user.username,
+                'email': user.email
+            })
             logger.info(f'Login exitoso para: {login_identifier}')
             
             return jsonify({
@@ -134,8 +144,15 @@ def get_users():
     Headers:
         Authorization: Bearer <jwt_token>
     
+    Query params:
+        limit: tamaño de página (100 por defecto, máximo 500)
+        after: cursor devuelto en next_cursor por la página anterior
+        q: prefijo de username o email (autocompletado, devuelve hasta limit resultados)
+        total: true para incluir el número de usuarios (o de coincidencias con q); cuesta un COUNT(*)
+    
     Returns:
         200: Lista de usuarios
+        400: Parámetros inválidos
         401: Token inválido o faltante
         500: Error interno
     """
@@ -144,15 +161,33 @@ def get_users():
         current_user_id = get_jwt_identity()
         logger.info(f'Consultando listado de usuarios (solicitado por usuario ID: {current_user_id})')
         
+        limit = request.args.get('limit', DEFAULT_USERS_PAGE_SIZE, type=int)
+        after_id = request.args.get('after', type=int)
+        prefix = (request.args.get('q') or '').strip()
+        with_total = request.args.get('total', 'false').lower() in ('1', 'true', 'yes')
+        if limit is None or limit < 1 or limit > MAX_USERS_PAGE_SIZE:
+            return jsonify({"error": f"limit debe estar entre 1 y {MAX_USERS_PAGE_SIZE}"}), 400
+        
         # Crear servicio con la sesión de Flask-SQLAlchemy
         service = UserService(db.session)
-        users = service.get_all_users()
+        if prefix:
+            users = service.search_users(prefix, limit)
+            next_cursor = None
+        else:
+            users = service.get_users_page(limit, after_id)
+            next_cursor = users[-1].id if len(users) == limit else None
         
-        logger.info(f'{len(users)} usuarios encontrados')
-        return jsonify({
+        response = {
             'users': [user.to_dict() for user in users],
-            'total': len(users)
-        }), 200
+            'count': len(users),
+            'next_cursor': next_cursor
+        }
+        # El total es opcional: recorrer la tabla (o el índice) en cada página no escala
+        if with_total:
+            response['total'] = service.count_users(prefix)
+        
+        logger.info(f'{len(users)} usuarios encontrados')
+        return jsonify(response), 200
         
     except Exception as e:
         logger.error(f'Error al consultar usuarios: {str(e)}')
@@ -181,15 +216,15 @@ def get_profile():
         current_user_id = get_jwt_identity()
         logger.info(f'Consultando perfil de usuario ID: {current_user_id}')
         
-        # Crear servicio con la sesión de Flask-SQLAlchemy
+        # Perfil desde la caché del worker o los claims del JWT (la BD solo si no es posible)
         service = UserService(db.session)
-        user = service.get_user_by_id(int(current_user_id))
+        profile = service.get_profile(int(current_user_id), get_jwt())
         
-        if user:
-            logger.info(f'Perfil obtenido para usuario: {user.username}')
+        if profile:
+            logger.info(f'Perfil obtenido para usuario: {profile["username"]}')
             return jsonify({
                 'message': 'Perfil obtenido exitosamente',
-                'user': user.to_dict()
+                'user': profile
             }), 200
         else:
             logger.warning(f'Usuario no encontrado con ID: {current_user_id}')
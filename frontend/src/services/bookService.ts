@@ -5,6 +5,8 @@ import {
   UpdateBookData,
   BooksResponse,
   BookResponse,
+  BatchOperation,
+  BatchResponse,
 } from '@/types/book.types';
 import { AxiosError } from 'axios';
 import { ApiError } from '@/types/api.types';
@@ -149,6 +151,25 @@ class BookService {
     }
   }
 
+  async batch(operations: BatchOperation[], atomic = false): Promise<BatchResponse> {
+    try {
+      const response = await apiClient.post<BatchResponse>('/app/batch', { operations, atomic });
+      this.invalidateCache('/app/books');
+      return response.data;
+    } catch (error) {
+      const axiosError = error as AxiosError<ApiError & Partial<BatchResponse>>;
+      // Lote atómico revertido (409): se devuelven los resultados por operación
+      if (axiosError.response?.data?.results) {
+        return axiosError.response.data as BatchResponse;
+      }
+      throw new Error(
+        axiosError.response?.data?.error || 
+        axiosError.response?.data?.message || 
+        'Error al ejecutar el lote'
+      );
+    }
+  }
+
   clearCache(): void {
     this.invalidateCache();
   }
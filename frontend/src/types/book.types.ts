@@ -44,3 +44,23 @@ export interface BookResponse {
   message: string;
   book: Book;
 }
+
+export type BatchOperation =
+  | { op: 'create'; data: CreateBookData }
+  | { op: 'update'; id: number; data: UpdateBookData }
+  | { op: 'delete'; id: number }
+  | { op: 'get'; id: number };
+
+export interface BatchResult {
+  index: number;
+  op?: BatchOperation['op'];
+  status: number;
+  book?: Book;
+  error?: string;
+}
+
+export interface BatchResponse {
+  atomic: boolean;
+  committed: boolean;
+  results: BatchResult[];
+}
@@ -0,0 +1,91 @@
+"""
+Configuración de gunicorn para producción (se carga automáticamente al
+ejecutar `gunicorn` desde la raíz del proyecto).
+
+Variables de entorno:
+    GUNICORN_BIND:               dirección de escucha (0.0.0.0:5000)
+    GUNICORN_WORKER_CLASS:       sync, gthread (por defecto) o gevent
+    GUNICORN_WORKERS:            procesos worker (por defecto según CPUs y modelo)
+    GUNICORN_THREADS:            hilos por worker con gthread (4)
+    GUNICORN_WORKER_CONNECTIONS: conexiones simultáneas por worker con gevent (1000)
+    GUNICORN_PRELOAD:            cargar la aplicación en el maestro antes del fork (true)
+    GUNICORN_MAX_REQUESTS:       peticiones antes de reciclar un worker (1000, 0 = nunca)
+    GUNICORN_TIMEOUT:            segundos sin respuesta antes de matar un worker (30)
+    GUNICORN_GRACEFUL_TIMEOUT:   segundos para terminar peticiones en curso al reiniciar (30)
+    GUNICORN_KEEPALIVE:          segundos que se mantiene abierta una conexión inactiva (5)
+    GUNICORN_ACCESSLOG:          destino del log de accesos ('-' = stdout, vacío = desactivado)
+                                 (registra la ruta sin la query string)
+
+Modelos de worker:
+    sync:    un proceso por petición en curso; CPU (hash de contraseñas) sin
+             contención del GIL, pero cada conexión SSE bloquea un worker.
+    gthread: varios hilos por proceso; buen equilibrio para lecturas con
+             espera de BD y mantiene keep-alive sin ocupar un hilo.
+    gevent:  corrutinas; miles de conexiones SSE inactivas por worker.
+             Es el único modelo con el que se sirve /app/books/events
+             (con hilos, cada cliente SSE ocuparía un hilo indefinidamente).
+"""
+
+import multiprocessing
+import os
+
+cpu_count = multiprocessing.cpu_count()
+
+wsgi_app = 'main:create_app()'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_class == 'gevent':
+    # Parchear la librería estándar antes de que el maestro importe la
+    # aplicación (preload_app): los locks y sockets creados antes del fork
+    # deben ser ya cooperativos
+    from gevent import monkey
+    monkey.patch_all()
+
+if worker_class == 'sync':
+    # Un proceso por petición: la fórmula clásica para E/S mezclada con CPU
+    default_workers = cpu_count * 2 + 1
+else:
+    # gthread y gevent concurrencian dentro del proceso: un worker por CPU
+    default_workers = cpu_count
+workers = int(os.getenv('GUNICORN_WORKERS', default_workers))
+threads = int(os.getenv('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1))
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+
+# La aplicación (y sus módulos) se carga una vez en el maestro y los workers
+# la heredan por copy-on-write: arranque más rápido y menos memoria
+preload_app = os.getenv('GUNICORN_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+# Reciclar workers periódicamente (con jitter para no reiniciarlos a la vez)
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+
+# Log de accesos a stdout; GUNICORN_ACCESSLOG vacío lo desactiva
+accesslog = os.getenv('GUNICORN_ACCESSLOG', '-') or None
+# Formato por defecto de gunicorn con la ruta (%(U)s) en lugar de la línea completa (%(r)s):
+# la query string puede llevar credenciales (tickets del stream SSE) y no se registra
+access_log_format = '%(h)s %(l)s %(u)s %(t)s "%(m)s %(U)s %(H)s" %(s)s %(b)s "%(f)s" "%(a)s"'
+errorlog = '-'
+loglevel = os.getenv('GUNICORN_LOGLEVEL', 'info')
+
+
+def on_starting(server):
+    # Con SSE y varios workers, el canal 'local' perdería eventos en silencio: no arrancar
+    from services.book_events import event_channel_problem
+    problem = event_channel_problem({
+        'BOOK_EVENTS_SSE': os.getenv('BOOK_EVENTS_SSE', 'auto'),
+        'BOOK_EVENTS_CHANNEL': os.getenv('BOOK_EVENTS_CHANNEL', 'local'),
+    }, server.cfg.workers)
+    if problem:
+        server.log.error(problem)
+        raise SystemExit(1)
+
+
+def post_fork(server, worker):
+    # El worker hereda del maestro el pool de conexiones y los hilos de fondo
+    from main import init_worker
+    init_worker(server.app.wsgi())
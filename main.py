@@ -1,14 +1,42 @@
-from flask import Flask, jsonify
+from flask import Flask, jsonify, current_app
+from flask.cli import with_appcontext
 from flask_cors import CORS
+import click
 import logging
 import os
 from dotenv import load_dotenv
 from flask_jwt_extended import JWTManager
-from datetime import timedelta
+from werkzeug.middleware.proxy_fix import ProxyFix
+from datetime import datetime, timedelta
 
 from controllers.book_controller import book_bp
 from controllers.user_controller import user_bp
+from controllers.health_controller import health_bp
 from models.db import db
+from models.book_model import Book
+from sqlalchemy import inspect
+from middleware.compression import Compression
+from middleware.rate_limit import RateLimiter
+from middleware.load_shedding import LoadShedder, worker_concurrency, DEFAULT_QUEUE_TIMEOUT_MS, DEFAULT_ROUTE_CONCURRENCY
+from middleware.idempotency import DEFAULT_TTL_SECONDS as IDEMPOTENCY_TTL, DEFAULT_WAIT_SECONDS as IDEMPOTENCY_WAIT, DEFAULT_LOCK_SECONDS as IDEMPOTENCY_LOCK
+from middleware.db_breaker import database_breaker, DEFAULT_FAILURES, DEFAULT_RESET_SECONDS, DEFAULT_HEALTH_CHECK_TTL
+from middleware.schema_gate import schema_gate, DEFAULT_CHECK_SECONDS as SCHEMA_CHECK_SECONDS
+from services.book_events import book_events, create_event_channel
+from cache.backends import create_cache_backend, DEFAULT_BACKEND as CACHE_BACKEND
+from cache.shared import shared_cache, DEFAULT_TTL
+from repositories.book_group_commit import book_group_committer
+from services.book_service import BookService, DUPLICATE_MODES, DEFAULT_DUPLICATE_THRESHOLD
+from services.book_analytics import book_analytics, DEFAULT_LOAD_BATCH as ANALYTICS_LOAD_BATCH
+from repositories.change_sequence_repository import ChangeSequenceRepository
+from repositories.idempotency_repository import IdempotencyRepository
+from models.change_sequence_model import BOOKS_SEQUENCE
+from migrations.runner import MigrationRunner, DEFAULT_BATCH_SIZE as MIGRATION_BATCH_SIZE
+from services.book_import_service import (
+    ImportJob, detect_format, execute_import_job, run_import_worker, start_import_sweeper, import_lease_seconds,
+    default_import_dir,
+    DEFAULT_BATCH_SIZE, DEFAULT_LEASE_SECONDS, DEFAULT_POLL_SECONDS, IMPORT_RUNNERS, RUNNER_THREAD
+)
+from repositories.book_import_job_repository import ImportJobRepository
 
 # Cargar variables de entorno
 load_dotenv()
@@ -23,51 +51,11 @@ logging.basicConfig(
 logging.getLogger('sqlalchemy.engine').setLevel(logging.WARNING)
 logging.getLogger('werkzeug').setLevel(logging.INFO)
 
-app = Flask(__name__)
-
-# Configurar CORS para permitir peticiones desde el frontend
-CORS(app, resources={
-    r"/*": {
-        "origins": ["http://localhost:3000"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"]
-    }
-})
-
-# Configuración de la aplicación
-app.config['API_VERSION'] = '1.0.0'
-
-# Configuración de base de datos
-# Primero intentar con MySQL, luego SQLite como fallback
-mysql_uri = os.getenv('MYSQL_URI')
-if mysql_uri:
-    try:
-        app.config['SQLALCHEMY_DATABASE_URI'] = mysql_uri
-        logging.info("Intentando conectar con MySQL...")
-        # Verificar conexión MySQL con una prueba
-        from sqlalchemy import create_engine
-        test_engine = create_engine(mysql_uri)
-        test_conn = test_engine.connect()
-        test_conn.close()
-        logging.info("✓ Usando configuración MySQL")
-    except Exception as e:
-        logging.warning(f"✗ MySQL connection failed: {e}")
-        logging.info("✓ Cambiando a SQLite como fallback")
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_users.db'
-else:
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_users.db'
-    logging.info("✓ Usando configuración SQLite (no se configuró MYSQL_URI)")
-
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-# Configuración JWT
-app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'tu_clave_secreta_jwt_super_segura')
-# Configurar tiempo de expiración del token a 1 hora
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=3600)
-
-# Inicializar extensiones
-db.init_app(app)
-jwt = JWTManager(app)
+# Extensiones (se asocian a la aplicación en create_app)
+jwt = JWTManager()
+compression = Compression()
+rate_limiter = RateLimiter()
+load_shedder = LoadShedder()
 
 # Manejadores de errores JWT
 @jwt.expired_token_loader
@@ -105,28 +93,38 @@ def revoked_token_callback(jwt_header, jwt_payload):
         'message': 'El token JWT ha sido revocado.'
     }), 401
 
-# Registrar blueprints
-app.register_blueprint(book_bp, url_prefix='/app')
-app.register_blueprint(user_bp, url_prefix='/auth')
-
-@app.route('/')
 def index():
     return {
         "message": "API de Libros y Usuarios - CRUD Flask",
-        "version": app.config.get('API_VERSION'),
+        "version": current_app.config.get('API_VERSION'),
         "endpoints": {
             "books": {
                 "GET /app/books": "Obtener todos los libros (requiere JWT)",
                 "GET /app/books/<id>": "Obtener un libro por ID (requiere JWT)",
                 "POST /app/books": "Crear un nuevo libro (requiere JWT)",
                 "PUT /app/books/<id>": "Actualizar un libro (requiere JWT)",
-                "DELETE /app/books/<id>": "Eliminar un libro (requiere JWT)"
+                "DELETE /app/books/<id>": "Eliminar un libro (requiere JWT)",
+                "POST /app/batch": "Varias operaciones de libros en una petición (requiere JWT)",
+                "GET /app/books/<id>/similar": "Libros con título y autor parecidos (requiere JWT)",
+                "GET /app/books/isbn/<isbn>": "Obtener un libro por ISBN-10/13 (requiere JWT)",
+                "POST /app/books/isbn/lookup": "Buscar varios libros por ISBN (requiere JWT)",
+                "GET /app/books/export": "Exportar el catálogo en JSONL/CSV (requiere JWT)",
+                "GET /app/books/changes?since=<cursor>": "Cambios del catálogo desde un cursor (requiere JWT)",
+                "GET /app/books/events": "Stream SSE de cambios del catálogo (requiere JWT)",
+                "GET /app/books/stats": "Estadísticas del catálogo (requiere JWT)",
+                "GET /app/books/analytics": "Filtros, agrupaciones e histogramas en memoria (requiere JWT y numpy)",
+                "POST /app/books/import": "Importar libros desde CSV/JSONL (requiere JWT)",
+                "GET /app/books/import/<job_id>": "Progreso de una importación (requiere JWT)"
             },
             "authentication": {
                 "POST /auth/register": "Registrar nuevo usuario",
                 "POST /auth/login": "Iniciar sesión y obtener token JWT",
                 "GET /auth/profile": "Obtener perfil usuario (requiere JWT)",
                 "GET /auth/users": "Listar usuarios (requiere JWT)"
+            },
+            "health": {
+                "GET /healthz": "El proceso atiende peticiones (liveness)",
+                "GET /readyz": "Conexión con la base de datos verificada (readiness)"
             }
         }, 
         "workflow": {
@@ -137,15 +135,313 @@ def index():
         }
     }
 
+def create_app(config: dict = None):
+    """
+    Factoría de la aplicación: configuración desde variables de entorno (que
+    `config` puede sobrescribir), extensiones, blueprints, comandos CLI y
+    creación de tablas. La usan `python main.py`, `flask --app main`,
+    wsgi.py y gunicorn.conf.py (con preload_app)
+    """
+    app = Flask(__name__)
+
+    # Configurar CORS para permitir peticiones desde el frontend
+    CORS(app, resources={
+        r"/*": {
+            "origins": ["http://localhost:3000"],
+            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"]
+        }
+    })
+
+    # Configuración de la aplicación
+    app.config['API_VERSION'] = '1.0.0'
+
+    # Configuración de base de datos
+    # Primero intentar con MySQL, luego SQLite como fallback
+    mysql_uri = os.getenv('MYSQL_URI')
+    if mysql_uri:
+        try:
+            app.config['SQLALCHEMY_DATABASE_URI'] = mysql_uri
+            logging.info("Intentando conectar con MySQL...")
+            # Verificar conexión MySQL con una prueba
+            from sqlalchemy import create_engine
+            test_engine = create_engine(mysql_uri)
+            test_conn = test_engine.connect()
+            test_conn.close()
+            logging.info("✓ Usando configuración MySQL")
+        except Exception as e:
+            logging.warning(f"✗ MySQL connection failed: {e}")
+            logging.info("✓ Cambiando a SQLite como fallback")
+            app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_users.db'
+    else:
+        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///books_users.db'
+        logging.info("✓ Usando configuración SQLite (no se configuró MYSQL_URI)")
+
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # Aplicar las migraciones pendientes al arrancar. Desactivado por defecto: los rellenos de datos
+    # retrasarían el arranque de los workers; se aplican en el despliegue con 'flask --app main db-upgrade'
+    app.config['MIGRATE_ON_STARTUP'] = os.getenv('MIGRATE_ON_STARTUP', 'false').lower() in ('1', 'true', 'yes')
+    # Con migraciones pendientes, las rutas con BD responden 503 y el esquema se vuelve a comprobar cada N segundos
+    app.config['SCHEMA_CHECK_SECONDS'] = float(os.getenv('SCHEMA_CHECK_SECONDS', SCHEMA_CHECK_SECONDS))
+
+    # Tamaño de lote (filas por transacción) para la importación masiva de libros
+    app.config['BOOK_IMPORT_BATCH_SIZE'] = int(os.getenv('BOOK_IMPORT_BATCH_SIZE', DEFAULT_BATCH_SIZE))
+    # Quién ejecuta las importaciones: 'thread' (hilo del worker que recibe la subida) o
+    # 'worker' (proceso dedicado: flask --app main import-worker)
+    app.config['BOOK_IMPORT_RUNNER'] = os.getenv('BOOK_IMPORT_RUNNER', RUNNER_THREAD)
+    if app.config['BOOK_IMPORT_RUNNER'] not in IMPORT_RUNNERS:
+        raise ValueError(f"BOOK_IMPORT_RUNNER debe ser uno de: {', '.join(IMPORT_RUNNERS)}")
+    # Subidas pendientes de importar (compartido por los workers y el import-worker)
+    app.config['BOOK_IMPORT_DIR'] = os.getenv('BOOK_IMPORT_DIR') or default_import_dir()
+    # Sin renovar la concesión en este tiempo un trabajo en curso se considera abandonado y otro ejecutor lo reanuda
+    app.config['BOOK_IMPORT_LEASE_SECONDS'] = float(os.getenv('BOOK_IMPORT_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+    # Casi duplicados al crear o importar libros: 'off', 'flag' (informar) o 'reject' (rechazar)
+    app.config['BOOK_DUPLICATE_MODE'] = os.getenv('BOOK_DUPLICATE_MODE', 'flag')
+    app.config['BOOK_DUPLICATE_THRESHOLD'] = float(os.getenv('BOOK_DUPLICATE_THRESHOLD', DEFAULT_DUPLICATE_THRESHOLD))
+
+    # Configuración JWT
+    app.config['JWT_SECRET_KEY'] = os.getenv('JWT_SECRET_KEY', 'tu_clave_secreta_jwt_super_segura')
+    # Configurar tiempo de expiración del token a 1 hora
+    app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(seconds=3600)
+
+    # Configuración de compresión de respuestas (gzip/brotli/zstd según Accept-Encoding)
+    app.config['COMPRESS_MIN_SIZE'] = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+    app.config['COMPRESS_STREAM_FLUSH_BYTES'] = int(os.getenv('COMPRESS_STREAM_FLUSH_BYTES', 64 * 1024))
+
+    # Canal de eventos SSE entre workers: 'local' (un solo proceso) o 'redis'
+    app.config['BOOK_EVENTS_CHANNEL'] = os.getenv('BOOK_EVENTS_CHANNEL', 'local')
+    app.config['BOOK_EVENTS_REDIS_URL'] = os.getenv('BOOK_EVENTS_REDIS_URL', 'redis://localhost:6379/0')
+    # Stream SSE: 'auto' (solo con workers gevent), 'on' u 'off'
+    app.config['BOOK_EVENTS_SSE'] = os.getenv('BOOK_EVENTS_SSE', 'auto')
+    # Segundos de validez de los tickets de conexión al stream (POST /app/books/events/ticket)
+    app.config['BOOK_EVENTS_TICKET_SECONDS'] = int(os.getenv('BOOK_EVENTS_TICKET_SECONDS', 30))
+
+    # Group commit: agrupar las escrituras concurrentes de libros en una sola transacción
+    app.config['BOOK_GROUP_COMMIT'] = os.getenv('BOOK_GROUP_COMMIT', 'false').lower() in ('1', 'true', 'yes')
+    app.config['BOOK_GROUP_COMMIT_MAX_BATCH'] = int(os.getenv('BOOK_GROUP_COMMIT_MAX_BATCH', 64))
+    app.config['BOOK_GROUP_COMMIT_MAX_WAIT_MS'] = float(os.getenv('BOOK_GROUP_COMMIT_MAX_WAIT_MS', 5))
+    app.config['BOOK_GROUP_COMMIT_TIMEOUT'] = float(os.getenv('BOOK_GROUP_COMMIT_TIMEOUT', 30))
+
+    # Limitación de peticiones: 'memory' (por worker) o 'redis' (compartida entre workers)
+    app.config['RATELIMIT_ENABLED'] = os.getenv('RATELIMIT_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['RATELIMIT_STORAGE'] = os.getenv('RATELIMIT_STORAGE', 'memory')
+    app.config['RATELIMIT_REDIS_URL'] = os.getenv('RATELIMIT_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Proxies inversos de confianza delante de la aplicación (0 = ninguno): número de saltos de
+    # X-Forwarded-For/-Proto/-Host/-Prefix que se aceptan. Sin PROXY_FIX_X_FOR, detrás de un proxy
+    # la IP del cliente (rate limit, idempotencia) sería la del proxy
+    for header in ('FOR', 'PROTO', 'HOST', 'PREFIX'):
+        app.config[f'PROXY_FIX_X_{header}'] = int(os.getenv(f'PROXY_FIX_X_{header}', 0))
+
+    # Descarte de carga: peticiones simultáneas por ruta y worker, y plazo máximo de cola antes de responder 503
+    app.config['LOADSHED_ENABLED'] = os.getenv('LOADSHED_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['LOADSHED_QUEUE_TIMEOUT_MS'] = float(os.getenv('LOADSHED_QUEUE_TIMEOUT_MS', DEFAULT_QUEUE_TIMEOUT_MS))
+    app.config['LOADSHED_ROUTE_CONCURRENCY'] = int(os.getenv('LOADSHED_ROUTE_CONCURRENCY', DEFAULT_ROUTE_CONCURRENCY))
+    # Hilos (o conexiones con gevent) por worker: los límites de las rutas pesadas se derivan de aquí
+    app.config['LOADSHED_WORKER_CONCURRENCY'] = int(os.getenv('LOADSHED_WORKER_CONCURRENCY') or worker_concurrency(os.environ))
+    for key in ('LOADSHED_AUTH_CONCURRENCY', 'LOADSHED_BATCH_CONCURRENCY',
+                'LOADSHED_ANALYTICS_CONCURRENCY', 'LOADSHED_BULK_CONCURRENCY'):
+        if os.getenv(key):
+            app.config[key] = int(os.getenv(key))
+
+    # Claves de idempotencia (header Idempotency-Key) en las escrituras de libros y el registro
+    app.config['IDEMPOTENCY_ENABLED'] = os.getenv('IDEMPOTENCY_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['IDEMPOTENCY_TTL_SECONDS'] = float(os.getenv('IDEMPOTENCY_TTL_SECONDS', IDEMPOTENCY_TTL))
+    app.config['IDEMPOTENCY_WAIT_SECONDS'] = float(os.getenv('IDEMPOTENCY_WAIT_SECONDS', IDEMPOTENCY_WAIT))
+    app.config['IDEMPOTENCY_LOCK_SECONDS'] = float(os.getenv('IDEMPOTENCY_LOCK_SECONDS', IDEMPOTENCY_LOCK))
+
+    # Circuit breaker de la base de datos y caché de la comprobación de /readyz
+    app.config['DB_BREAKER_ENABLED'] = os.getenv('DB_BREAKER_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+    app.config['DB_BREAKER_FAILURES'] = int(os.getenv('DB_BREAKER_FAILURES', DEFAULT_FAILURES))
+    app.config['DB_BREAKER_RESET_SECONDS'] = float(os.getenv('DB_BREAKER_RESET_SECONDS', DEFAULT_RESET_SECONDS))
+    app.config['HEALTH_CHECK_TTL'] = float(os.getenv('HEALTH_CHECK_TTL', DEFAULT_HEALTH_CHECK_TTL))
+
+    # Caché compartida de servicios: 'file' (SQLite del host, por defecto), 'redis' o 'memory' (un solo worker)
+    app.config['CACHE_BACKEND'] = os.getenv('CACHE_BACKEND', CACHE_BACKEND)
+    app.config['CACHE_DEFAULT_TTL'] = int(os.getenv('CACHE_DEFAULT_TTL', DEFAULT_TTL))
+    if os.getenv('CACHE_FILE_PATH'):
+        app.config['CACHE_FILE_PATH'] = os.getenv('CACHE_FILE_PATH')
+    # Por defecto el fichero de la caché 'file' vive en el directorio de instancia (0700), no en /tmp
+    app.config['CACHE_DIR'] = os.getenv('CACHE_DIR', app.instance_path)
+    app.config['CACHE_REDIS_URL'] = os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Instantánea columnar en memoria para GET /app/books/analytics (requiere el paquete opcional numpy)
+    app.config['BOOK_ANALYTICS'] = os.getenv('BOOK_ANALYTICS', 'true').lower() in ('1', 'true', 'yes')
+    app.config['BOOK_ANALYTICS_LOAD_BATCH'] = int(os.getenv('BOOK_ANALYTICS_LOAD_BATCH', ANALYTICS_LOAD_BATCH))
+
+    if config:
+        app.config.update(config)
+
+    # Confiar en las cabeceras X-Forwarded-* solo si se ha configurado el número de proxies
+    proxy_hops = {name: app.config[f'PROXY_FIX_X_{name.upper()}'] for name in ('for', 'proto', 'host', 'prefix')}
+    if any(proxy_hops.values()):
+        app.wsgi_app = ProxyFix(app.wsgi_app, **{f'x_{name}': hops for name, hops in proxy_hops.items()})
+
+    # Inicializar extensiones
+    db.init_app(app)
+    jwt.init_app(app)
+    compression.init_app(app)
+    rate_limiter.init_app(app)
+    load_shedder.init_app(app)
+    database_breaker.init_app(app)
+    schema_gate.init_app(app)
+    book_events.configure(create_event_channel(app.config))
+    book_group_committer.init_app(app)
+    shared_cache.configure(create_cache_backend(app.config), app.config['CACHE_DEFAULT_TTL'])
+
+    # Registrar blueprints
+    app.register_blueprint(book_bp, url_prefix='/app')
+    app.register_blueprint(user_bp, url_prefix='/auth')
+    app.register_blueprint(health_bp)
+    app.add_url_rule('/', 'index', index)
+
+    # Comandos de mantenimiento (flask --app main <comando>)
+    app.cli.add_command(rebuild_book_stats_command)
+    app.cli.add_command(purge_book_tombstones_command)
+    app.cli.add_command(import_books_command)
+    app.cli.add_command(import_worker_command)
+    app.cli.add_command(purge_idempotency_keys_command)
+    app.cli.add_command(db_upgrade_command)
+    app.cli.add_command(db_status_command)
+
+    # Crear las tablas al inicializar
+    create_tables(app)
+    # Configurar la analítica (cada worker carga su instantánea en la primera consulta)
+    book_analytics.init_app(app)
+    return app
+
+def init_worker(app):
+    """
+    Prepara un worker recién creado por fork (hook post_fork de gunicorn):
+    descarta las conexiones de BD heredadas del proceso maestro, vuelve a
+    arrancar el canal de eventos, cuyo hilo de escucha no sobrevive al fork,
+    y con BOOK_IMPORT_RUNNER='thread' arranca el barrido de importaciones abandonadas
+    """
+    with app.app_context():
+        db.engine.dispose(close=False)
+    book_events.configure(create_event_channel(app.config))
+    if app.config['BOOK_IMPORT_RUNNER'] == RUNNER_THREAD:
+        start_import_sweeper(app)
+
 # Crear tablas si no existen
-def create_tables():
+def create_tables(app):
     """Crear todas las tablas definidas en los modelos"""
     with app.app_context():
+        # Base de datos nueva: create_all crea el esquema ya al día y las migraciones no tienen datos que rellenar
+        fresh = not inspect(db.engine).has_table(Book.__tablename__)
         db.create_all()
         logging.info("Tablas de base de datos creadas/verificadas")
+        # create_all no modifica tablas existentes: columnas e índices nuevos llegan por migraciones
+        runner = MigrationRunner(db.session)
+        if app.config['MIGRATE_ON_STARTUP'] or fresh:
+            runner.upgrade()
+        else:
+            pending = [migration.version for migration in runner.pending()]
+            if pending:
+                # No servir un esquema incompleto: 503 y /readyz no listo hasta que se apliquen
+                logging.error(f"Migraciones de esquema pendientes {pending}: las rutas con base de datos "
+                              f"responden 503 hasta ejecutar 'flask --app main db-upgrade'")
+                schema_gate.mark_pending(pending, init_schema_data)
+                return
+        init_schema_data()
+
+def init_schema_data():
+    """Inicializaciones que necesitan el esquema al día (requiere contexto de aplicación)"""
+    ChangeSequenceRepository(db.session).ensure(BOOKS_SEQUENCE)
+    # Inicializar la tabla de resumen de estadísticas en bases de datos existentes
+    service = BookService(db.session)
+    if service.stats_repository.is_empty():
+        service.rebuild_stats()
+
+@click.command('rebuild-book-stats')
+@with_appcontext
+def rebuild_book_stats_command():
+    """Reconstruir la tabla de resumen de estadísticas (flask --app main rebuild-book-stats)"""
+    groups = BookService(db.session).rebuild_stats()
+    click.echo(f'Estadísticas reconstruidas: {groups} grupos')
+
+@click.command('purge-book-tombstones')
+@with_appcontext
+@click.option('--older-than-days', default=30, show_default=True, help='Antigüedad mínima de las lápidas')
+def purge_book_tombstones_command(older_than_days):
+    """Eliminar definitivamente los libros borrados hace más de N días"""
+    purged = BookService(db.session).purge_tombstones(datetime.utcnow() - timedelta(days=older_than_days))
+    click.echo(f'{purged} lápidas purgadas')
+
+@click.command('purge-idempotency-keys')
+@with_appcontext
+def purge_idempotency_keys_command():
+    """Eliminar las claves de idempotencia caducadas (flask --app main purge-idempotency-keys)"""
+    purged = IdempotencyRepository(db.session).purge_expired()
+    click.echo(f'{purged} claves de idempotencia eliminadas')
+
+@click.command('import-books')
+@with_appcontext
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'file_format', type=click.Choice(['csv', 'jsonl']), help='Formato del archivo')
+@click.option('--batch-size', default=DEFAULT_BATCH_SIZE, show_default=True, help='Filas por transacción')
+@click.option('--duplicates', 'duplicate_mode', type=click.Choice(DUPLICATE_MODES),
+              help='Casi duplicados: off, flag o reject (por defecto BOOK_DUPLICATE_MODE)')
+def import_books_command(path, file_format, batch_size, duplicate_mode):
+    """Importar libros desde un archivo CSV/JSONL (flask --app main import-books libros.csv)"""
+    file_format = detect_format(path, explicit=file_format)
+    if not file_format:
+        raise click.UsageError('No se pudo determinar el formato, usa --format csv|jsonl')
+    repository = ImportJobRepository(db.session)
+    job = repository.create(ImportJob(path, file_format, batch_size,
+                                      duplicate_mode or current_app.config['BOOK_DUPLICATE_MODE'],
+                                      current_app.config['BOOK_DUPLICATE_THRESHOLD'],
+                                      path=os.path.abspath(path)))
+    # Si el comando se interrumpe, import-worker reanuda el trabajo tras el último lote confirmado
+    click.echo(f'Trabajo de importación {job.id}')
+    lease_seconds = import_lease_seconds(current_app.config)
+    job = repository.claim(job.id, job.id, lease_seconds)
+
+    def report(job):
+        click.echo(f'{job.processed} filas procesadas, {job.imported} importadas, '
+                   f'{job.duplicates} duplicadas, {job.near_duplicates} casi duplicadas, {job.invalid} inválidas')
+
+    execute_import_job(db.session, job, current_app.config['BOOK_IMPORT_DIR'], progress=report,
+                       lease_seconds=lease_seconds)
+    for error in job.errors:
+        click.echo(f"Línea {error['line']}: {error['error']}", err=True)
+    click.echo(f'Importación {job.status}')
+    if job.status != 'completed':
+        raise SystemExit(1)
+
+@click.command('import-worker')
+@with_appcontext
+@click.option('--once', is_flag=True, help='Terminar cuando no queden trabajos pendientes')
+@click.option('--poll-seconds', default=DEFAULT_POLL_SECONDS, show_default=True, help='Espera entre consultas sin trabajos')
+def import_worker_command(once, poll_seconds):
+    """Ejecutar las importaciones pendientes o abandonadas (flask --app main import-worker)"""
+    executed = run_import_worker(current_app._get_current_object(), once=once, poll_seconds=poll_seconds)
+    click.echo(f'{executed} importaciones ejecutadas')
+
+@click.command('db-upgrade')
+@click.option('--target', type=int, help='Versión máxima a aplicar (todas por defecto)')
+@click.option('--batch-size', default=MIGRATION_BATCH_SIZE, show_default=True, help='Filas por lote en los rellenos de datos')
+@with_appcontext
+def db_upgrade_command(target, batch_size):
+    """Aplicar las migraciones de esquema pendientes (flask --app main db-upgrade)"""
+    applied = MigrationRunner(db.session, batch_size=batch_size).upgrade(target)
+    for migration in applied:
+        click.echo(f'Aplicada {migration.version:04d} {migration.name}')
+    if not applied:
+        click.echo('El esquema ya está actualizado')
+    # Inicializaciones que create_tables omite mientras haya migraciones pendientes
+    init_schema_data()
 
-# Crear las tablas al inicializar
-create_tables()
+@click.command('db-status')
+@with_appcontext
+def db_status_command():
+    """Mostrar las migraciones aplicadas y pendientes"""
+    for migration, applied in MigrationRunner(db.session).status():
+        state = f'aplicada {applied.applied_at.isoformat()}' if applied else 'pendiente'
+        click.echo(f'{migration.version:04d} {migration.name}: {state}')
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # El servidor de desarrollo abre un hilo por conexión: admite SSE sin gevent
+    create_app({'BOOK_EVENTS_SSE': os.getenv('BOOK_EVENTS_SSE', 'on')}).run(debug=True)
\ No newline at end of file
@@ -0,0 +1,194 @@
+"""
+Compresión de respuestas HTTP.
+Negocia gzip/brotli/zstd según el header Accept-Encoding, solo comprime
+cuerpos por encima de un tamaño mínimo, comprime en streaming las
+respuestas generadas por partes (exportaciones) y reutiliza los cuerpos
+ya comprimidos de respuestas cacheables usando su ETag como clave.
+"""
+
+from flask import request
+from collections import OrderedDict
+import threading
+import zlib
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Códecs opcionales: solo se ofrecen si la librería está instalada
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependencia opcional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - dependencia opcional
+    zstandard = None
+
+# Tipos de contenido que merece la pena comprimir
+COMPRESSIBLE_MIMETYPES = (
+    'application/json', 'application/x-ndjson', 'text/csv', 'text/html', 'text/plain', 'text/css',
+    'application/javascript'
+)
+
+DEFAULT_MIN_SIZE = 1024
+DEFAULT_CACHE_ENTRIES = 128
+DEFAULT_CACHE_BYTES = 32 * 1024 * 1024
+# Bytes sin comprimir entre vaciados del compresor en streaming: cada vaciado cierra un bloque
+# y reinicia parte del contexto, así que vaciar por bloque pequeño empeora mucho la compresión
+DEFAULT_STREAM_FLUSH_BYTES = 64 * 1024
+
+
+def _gzip_compressor(level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress, lambda: compressor.flush(zlib.Z_SYNC_FLUSH), compressor.flush
+
+
+def _brotli_compressor(level):
+    compressor = brotli.Compressor(quality=level)
+    return compressor.process, compressor.flush, compressor.finish
+
+
+def _zstd_compressor(level):
+    compressor = zstandard.ZstdCompressor(level=level).compressobj()
+    return (compressor.compress,
+            lambda: compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK),
+            compressor.flush)
+
+
+class CompressedBodyCache:
+    """Caché LRU de cuerpos comprimidos indexada por (ETag, codificación)"""
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._items.get(key)
+            if body is not None:
+                self._items.move_to_end(key)
+            return body
+
+    def set(self, key, body: bytes):
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._items.pop(key, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._items[key] = body
+            self.size += len(body)
+            while self._items and (len(self._items) > self.max_entries or self.size > self.max_bytes):
+                _, evicted = self._items.popitem(last=False)
+                self.size -= len(evicted)
+
+
+class Compression:
+    """
+    Extensión Flask que comprime las respuestas en un after_request
+
+    Configuración:
+        COMPRESS_MIN_SIZE: tamaño mínimo en bytes para comprimir (1024)
+        COMPRESS_LEVEL_GZIP / COMPRESS_LEVEL_BROTLI / COMPRESS_LEVEL_ZSTD: niveles de compresión
+        COMPRESS_CACHE_ENTRIES / COMPRESS_CACHE_BYTES: límites de la caché por ETag
+        COMPRESS_STREAM_FLUSH_BYTES: bytes sin comprimir entre vaciados en streaming (64 KB)
+    """
+
+    def __init__(self, app=None):
+        self.cache = None
+        self.encodings = []
+        self.compressors = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.min_size = app.config.get('COMPRESS_MIN_SIZE', DEFAULT_MIN_SIZE)
+        self.stream_flush_bytes = app.config.get('COMPRESS_STREAM_FLUSH_BYTES', DEFAULT_STREAM_FLUSH_BYTES)
+        self.cache = CompressedBodyCache(
+            app.config.get('COMPRESS_CACHE_ENTRIES', DEFAULT_CACHE_ENTRIES),
+            app.config.get('COMPRESS_CACHE_BYTES', DEFAULT_CACHE_BYTES)
+        )
+        # Orden de preferencia del servidor ante calidades iguales
+        if brotli is not None:
+            level = app.config.get('COMPRESS_LEVEL_BROTLI', 4)
+            self.compressors['br'] = lambda: _brotli_compressor(level)
+        if zstandard is not None:
+            level = app.config.get('COMPRESS_LEVEL_ZSTD', 3)
+            self.compressors['zstd'] = lambda: _zstd_compressor(level)
+        gzip_level = app.config.get('COMPRESS_LEVEL_GZIP', 6)
+        self.compressors['gzip'] = lambda: _gzip_compressor(gzip_level)
+        self.encodings = list(self.compressors)
+        app.after_request(self.after_request)
+        logger.info(f'Compresión de respuestas habilitada ({", ".join(self.encodings)})')
+
+    def negotiate(self):
+        """Elige la mejor codificación aceptada por el cliente o None"""
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, encoding: str, data: bytes) -> bytes:
+        compress, _, finish = self.compressors[encoding]()
+        return compress(data) + finish()
+
+    def compress_stream(self, encoding: str, chunks):
+        """
+        Comprime un iterable de bloques, vaciando el compresor cada stream_flush_bytes de entrada
+        (el cliente recibe datos con regularidad sin pagar un vaciado por cada bloque pequeño)
+        """
+        compress, flush, finish = self.compressors[encoding]()
+        pending = 0
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            out = compress(chunk)
+            pending += len(chunk)
+            if pending >= self.stream_flush_bytes:
+                out += flush()
+                pending = 0
+            if out:
+                yield out
+        yield finish()
+
+    def after_request(self, response):
+        if (response.status_code < 200 or response.status_code in (204, 304)
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES
+                or 'Content-Encoding' in response.headers
+                or response.direct_passthrough):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+
+        if response.is_streamed:
+            if encoding:
+                response.response = self.compress_stream(encoding, response.response)
+                response.headers.pop('Content-Length', None)
+                response.headers['Content-Encoding'] = encoding
+            return response
+
+        # Respuestas cacheables: ETag débil (mismo contenido con cualquier codificación) y 304 condicional
+        cacheable = request.method == 'GET' and response.status_code == 200
+        if cacheable:
+            if 'ETag' not in response.headers:
+                response.add_etag(weak=True)
+            response.make_conditional(request)
+            if response.status_code == 304:
+                return response
+
+        data = response.get_data()
+        if not encoding or len(data) < self.min_size:
+            return response
+
+        etag = response.get_etag()[0] if cacheable else None
+        body = self.cache.get((etag, encoding)) if etag else None
+        if body is None:
+            body = self.compress(encoding, data)
+            if etag:
+                self.cache.set((etag, encoding), body)
+
+        response.set_data(body)
+        response.headers['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,202 @@
+"""
+Circuit breaker de la conexión a la base de datos.
+Los errores de conexión del engine (fallos al conectar y desconexiones
+detectadas por SQLAlchemy) se cuentan; tras DB_BREAKER_FAILURES seguidos el
+circuito se abre y, durante DB_BREAKER_RESET_SECONDS, las peticiones a las
+rutas con BD reciben 503 de inmediato y las nuevas conexiones fallan sin
+llegar a intentarse. Pasado ese tiempo se deja pasar un único intento de
+conexión: si conecta, el circuito se cierra; si no, vuelve a abrirse.
+
+También mantiene la comprobación de conexión cacheada que usa /readyz.
+"""
+
+from flask import request, jsonify, g, has_request_context
+from sqlalchemy import event, text
+from models.db import db
+import threading
+import time
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+STATE_CLOSED = 'closed'
+STATE_OPEN = 'open'
+STATE_HALF_OPEN = 'half_open'
+
+DEFAULT_FAILURES = 5
+DEFAULT_RESET_SECONDS = 10
+DEFAULT_HEALTH_CHECK_TTL = 2
+
+
+class DatabaseUnavailable(Exception):
+    """Conexión rechazada sin intentarla porque el circuito está abierto"""
+
+
+class DatabaseCircuitBreaker:
+    """
+    Extensión Flask: escucha los eventos del engine de Flask-SQLAlchemy y
+    rechaza en un before_request las peticiones de los blueprints con BD
+
+    Configuración:
+        DB_BREAKER_ENABLED: activa el circuit breaker (True por defecto)
+        DB_BREAKER_FAILURES: errores de conexión seguidos que abren el circuito (5)
+        DB_BREAKER_RESET_SECONDS: segundos antes de volver a intentar conectar (10)
+        HEALTH_CHECK_TTL: segundos que se reutiliza el resultado de la comprobación de /readyz (2)
+    """
+
+    # Blueprints cuyas rutas necesitan la base de datos
+    GUARDED_BLUEPRINTS = ('book_bp', 'user_bp')
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.engine = None
+        self.failure_threshold = DEFAULT_FAILURES
+        self.reset_seconds = DEFAULT_RESET_SECONDS
+        self.health_check_ttl = DEFAULT_HEALTH_CHECK_TTL
+        self._lock = threading.Lock()
+        self._reset_state()
+        if app is not None:
+            self.init_app(app)
+
+    def _reset_state(self):
+        self.state = STATE_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_in_progress = False
+        self._last_check = None
+        self._checked_at = 0.0
+        self._check_lock = threading.Lock()
+
+    def init_app(self, app):
+        self._reset_state()
+        self.enabled = app.config.get('DB_BREAKER_ENABLED', True)
+        self.failure_threshold = int(app.config.get('DB_BREAKER_FAILURES', DEFAULT_FAILURES))
+        self.reset_seconds = float(app.config.get('DB_BREAKER_RESET_SECONDS', DEFAULT_RESET_SECONDS))
+        self.health_check_ttl = float(app.config.get('HEALTH_CHECK_TTL', DEFAULT_HEALTH_CHECK_TTL))
+        with app.app_context():
+            self.engine = db.engine
+        if not self.enabled:
+            return
+        event.listen(self.engine, 'do_connect', self._before_connect)
+        event.listen(self.engine, 'connect', self._on_connect)
+        event.listen(self.engine, 'handle_error', self._on_error)
+        app.before_request(self.check)
+        app.after_request(self._convert_response)
+
+    # Eventos del engine
+
+    def _before_connect(self, dialect, connection_record, cargs, cparams):
+        if not self.allow_connection():
+            if has_request_context():
+                g.database_unavailable = True
+            raise DatabaseUnavailable('Base de datos no disponible (circuito abierto)')
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        self.record_success()
+
+    def _on_error(self, context):
+        if isinstance(context.original_exception, DatabaseUnavailable):
+            return
+        # Sin conexión: falló el propio connect; is_disconnect: se perdió una conexión del pool
+        if context.connection is None or context.is_disconnect:
+            self.record_failure(context.original_exception)
+            if has_request_context() and self.state != STATE_CLOSED:
+                g.database_unavailable = True
+
+    # Estado del circuito
+
+    def allow_connection(self):
+        """True si se puede intentar una conexión nueva (en half-open, solo un intento a la vez)"""
+        with self._lock:
+            if self.state == STATE_CLOSED:
+                return True
+            if self.state == STATE_OPEN and time.monotonic() - self.opened_at >= self.reset_seconds:
+                self.state = STATE_HALF_OPEN
+            if self.state == STATE_HALF_OPEN and not self._trial_in_progress:
+                self._trial_in_progress = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != STATE_CLOSED:
+                logger.info('Conexión con la base de datos recuperada: circuito cerrado')
+            self.state = STATE_CLOSED
+            self.failures = 0
+            self._trial_in_progress = False
+
+    def record_failure(self, error=None):
+        with self._lock:
+            self.failures += 1
+            self._trial_in_progress = False
+            if self.state == STATE_HALF_OPEN or (
+                    self.state == STATE_CLOSED and self.failures >= self.failure_threshold):
+                logger.error(f'Base de datos no disponible, circuito abierto {self.reset_seconds:g}s: {error}')
+                self.state = STATE_OPEN
+                self.opened_at = time.monotonic()
+
+    def retry_after(self):
+        """Segundos hasta el siguiente intento de conexión (0 si el circuito no está abierto)"""
+        if self.state != STATE_OPEN:
+            return 0
+        return max(0.0, self.reset_seconds - (time.monotonic() - self.opened_at))
+
+    # Peticiones HTTP
+
+    def _unavailable_response(self):
+        response = jsonify({
+            'error': 'Base de datos no disponible',
+            'message': 'El servicio no puede acceder a la base de datos. Reintenta más tarde.'
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, math.ceil(self.retry_after())))
+        return response
+
+    def check(self):
+        if request.method == 'OPTIONS' or not request.blueprint:
+            return None
+        if request.blueprint in self.GUARDED_BLUEPRINTS and self.retry_after() > 0:
+            return self._unavailable_response()
+        return None
+
+    def _convert_response(self, response):
+        # Los controladores capturan cualquier excepción como 500: si la causa fue
+        # el circuito (o abrirlo), el cliente recibe 503 con Retry-After
+        if response.status_code == 500 and g.pop('database_unavailable', False):
+            return self._unavailable_response()
+        return response
+
+    # Comprobación de disponibilidad (/readyz)
+
+    def check_connection(self):
+        """
+        Resultado cacheado de un SELECT 1: {'ok': bool, 'state': estado del circuito,
+        'checked_at': epoch, 'error': mensaje si falló}. Con el circuito abierto no toca
+        la BD hasta que toca reintentar (la propia comprobación hace de intento, aunque
+        el balanceador haya retirado el tráfico), y mientras una comprobación está en
+        curso las demás reutilizan la anterior.
+        """
+        if self.enabled and self.retry_after() > 0:
+            return {'ok': False, 'state': self.state, 'checked_at': time.time(), 'error': 'Circuito abierto'}
+        now = time.monotonic()
+        last = self._last_check
+        if last is not None and self.state == STATE_CLOSED and now - self._checked_at < self.health_check_ttl:
+            return dict(last, state=self.state)
+        if not self._check_lock.acquire(blocking=last is None):
+            return dict(last, state=self.state)
+        try:
+            result = {'ok': True, 'checked_at': time.time(), 'error': None}
+            try:
+                with self.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+            except Exception as e:
+                result.update(ok=False, error=str(e).splitlines()[0])
+            self._last_check, self._checked_at = result, time.monotonic()
+            return dict(result, state=self.state)
+        finally:
+            self._check_lock.release()
+
+
+# Instancia única compartida por la aplicación y el controlador de salud
+database_breaker = DatabaseCircuitBreaker()
@@ -0,0 +1,179 @@
+"""
+Claves de idempotencia para los endpoints de escritura.
+Si el cliente envía Idempotency-Key, la primera petición reserva la clave
+y su respuesta (códigos < 500) se guarda durante IDEMPOTENCY_TTL_SECONDS;
+los reintentos con la misma clave reciben esa respuesta sin volver a
+ejecutar la vista. Un reintento que llega mientras la petición original
+sigue en curso espera a su resultado (hasta IDEMPOTENCY_WAIT_SECONDS) en
+lugar de ejecutarse en paralelo. Reutilizar una clave con otra petición
+(otra ruta o cuerpo) se rechaza con 422.
+"""
+
+from flask import request, jsonify, current_app, Response
+from flask_jwt_extended import get_jwt_identity
+from models.db import db
+from models.idempotency_key_model import MAX_KEY_LENGTH
+from repositories.idempotency_repository import IdempotencyRepository
+from middleware.rate_limit import remote_ip
+from sqlalchemy.orm import Session
+from functools import wraps
+import threading
+import hashlib
+import time
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+DEFAULT_TTL_SECONDS = 24 * 3600
+DEFAULT_WAIT_SECONDS = 10
+# Tiempo tras el que una reserva sin respuesta se da por abandonada (por encima del timeout de gunicorn)
+DEFAULT_LOCK_SECONDS = 60
+# Intervalo inicial y máximo de consulta mientras se espera a una petición de otro worker
+POLL_INTERVAL = 0.02
+MAX_POLL_INTERVAL = 0.5
+
+
+def request_fingerprint(include_body: bool = True):
+    """SHA-256 del método, ruta, query string, Content-Type y cuerpo (o solo su tamaño)"""
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.query_string.decode('latin-1'),
+                 request.content_type or ''):
+        digest.update(part.encode())
+        digest.update(b'\0')
+    if include_body:
+        digest.update(request.get_data(cache=True))
+    else:
+        digest.update(str(request.content_length).encode())
+    return digest.hexdigest()
+
+
+def _error(status: int, error: str, message: str):
+    response = jsonify({'error': error, 'message': message})
+    response.status_code = status
+    return response
+
+
+class IdempotencyKeys:
+    """
+    Reserva, espera y reproducción de respuestas por clave
+
+    Configuración:
+        IDEMPOTENCY_ENABLED: acepta el header Idempotency-Key (True por defecto)
+        IDEMPOTENCY_TTL_SECONDS: validez de una respuesta guardada (24 h)
+        IDEMPOTENCY_WAIT_SECONDS: espera máxima de un reintento concurrente (10 s)
+        IDEMPOTENCY_LOCK_SECONDS: validez de una reserva sin respuesta (60 s)
+    """
+
+    def __init__(self):
+        # Peticiones en curso en este worker: los reintentos del mismo proceso esperan su evento
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def _repository(self):
+        # Sesión propia: las reservas se confirman al momento, fuera de la transacción de la vista
+        return IdempotencyRepository(Session(db.engine, expire_on_commit=False))
+
+    def _replay(self, record):
+        response = Response(record.response_body, status=record.response_status, content_type=record.content_type)
+        response.headers[REPLAYED_HEADER] = 'true'
+        return response
+
+    def handle(self, view, include_body: bool, args, kwargs):
+        config = current_app.config
+        key = request.headers.get(HEADER)
+        if key is None or not config.get('IDEMPOTENCY_ENABLED', True):
+            return view(*args, **kwargs)
+        key = key.strip()
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return _error(400, 'Idempotency-Key inválida',
+                          f'La clave debe tener entre 1 y {MAX_KEY_LENGTH} caracteres.')
+
+        try:
+            identity = get_jwt_identity()
+        except RuntimeError:
+            # Vista sin jwt_required (registro)
+            identity = None
+        # Sin usuario, las claves son por IP: un cliente no puede recibir la respuesta de otro
+        # (p. ej. el registro de otra persona) reutilizando una clave fácil de adivinar
+        scope = f'user:{identity}' if identity is not None else f'ip:{remote_ip()}'
+        fingerprint = request_fingerprint(include_body)
+        owner = uuid.uuid4().hex
+        lock_seconds = float(config.get('IDEMPOTENCY_LOCK_SECONDS', DEFAULT_LOCK_SECONDS))
+        deadline = time.monotonic() + float(config.get('IDEMPOTENCY_WAIT_SECONDS', DEFAULT_WAIT_SECONDS))
+        repository = self._repository()
+        poll = POLL_INTERVAL
+        try:
+            while True:
+                record = repository.claim(scope, key, fingerprint, owner, lock_seconds)
+                if record is None:
+                    break
+                if record.fingerprint != fingerprint:
+                    return _error(422, 'Idempotency-Key reutilizada',
+                                  'La clave ya se usó con una petición distinta.')
+                if record.completed:
+                    logger.info(f'Respuesta repetida para la Idempotency-Key {key} ({scope})')
+                    return self._replay(record)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    response = _error(409, 'Petición en curso',
+                                      'Otra petición con la misma Idempotency-Key sigue en curso.')
+                    response.headers['Retry-After'] = '1'
+                    return response
+                # Despertar al terminar la petición original si está en este worker; si no, sondear la tabla
+                event = self._in_flight.get((scope, key))
+                if event is not None:
+                    event.wait(min(remaining, MAX_POLL_INTERVAL))
+                else:
+                    time.sleep(min(remaining, poll))
+                    poll = min(poll * 2, MAX_POLL_INTERVAL)
+
+            return self._run(view, args, kwargs, repository, scope, key, owner)
+        finally:
+            repository.db_session.close()
+
+    def _run(self, view, args, kwargs, repository, scope, key, owner):
+        event = threading.Event()
+        with self._lock:
+            self._in_flight[(scope, key)] = event
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+            if response.status_code < 500 and not response.is_streamed:
+                repository.complete(
+                    scope, key, owner, response.status_code, response.get_data(), response.content_type,
+                    float(current_app.config.get('IDEMPOTENCY_TTL_SECONDS', DEFAULT_TTL_SECONDS))
+                )
+            else:
+                repository.release(scope, key, owner)
+            return response
+        except Exception:
+            repository.release(scope, key, owner)
+            raise
+        finally:
+            with self._lock:
+                self._in_flight.pop((scope, key), None)
+            event.set()
+
+
+# Instancia única compartida por los controladores
+idempotency_keys = IdempotencyKeys()
+
+
+def idempotent(include_body: bool = True):
+    """
+    Decorador para vistas de escritura; va debajo de jwt_required para que
+    cada usuario tenga su propio espacio de claves (sin JWT, uno por IP)
+
+    Args:
+        include_body (bool): Incluir el cuerpo en la huella (False en las
+            subidas de archivos, que no se cargan en memoria: se compara el tamaño)
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            return idempotency_keys.handle(view, include_body, args, kwargs)
+        return wrapper
+    return decorator
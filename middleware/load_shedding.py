@@ -0,0 +1,176 @@
+"""
+Descarte de carga con límites de concurrencia por ruta.
+Cada endpoint tiene un semáforo con el máximo de peticiones en curso en el
+worker. Una petición que no obtiene plaza antes de su plazo de cola recibe
+503 con Retry-After enseguida, en lugar de esperar hasta el timeout de
+gunicorn. Si el proxy envía X-Request-Start, el tiempo ya esperado en el
+proxy y en la cola de gunicorn cuenta para el plazo.
+
+Los límites de las rutas pesadas se derivan de la concurrencia real del
+worker (hilos de gthread, conexiones de gevent): un límite igual o mayor
+que el número de hilos nunca haría esperar a nadie, porque gunicorn no
+entrega más peticiones que hilos tiene el worker.
+"""
+
+from flask import request, jsonify, g
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE_TIMEOUT_MS = 250
+DEFAULT_ROUTE_CONCURRENCY = 32
+# Hilos por worker de gunicorn.conf.py con gthread
+DEFAULT_WORKER_CONCURRENCY = 4
+
+
+def worker_concurrency(environ):
+    """
+    Peticiones que un worker atiende a la vez según la configuración de
+    gunicorn.conf.py: 1 con sync, GUNICORN_THREADS con gthread y
+    GUNICORN_WORKER_CONNECTIONS con gevent
+    """
+    worker_class = environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    if worker_class == 'sync':
+        return 1
+    if worker_class == 'gevent':
+        return int(environ.get('GUNICORN_WORKER_CONNECTIONS') or 1000)
+    return int(environ.get('GUNICORN_THREADS') or DEFAULT_WORKER_CONCURRENCY)
+
+
+def request_queue_age(now: float = None):
+    """
+    Segundos desde que el proxy recibió la petición según X-Request-Start
+    ('t=1697051234.123' de nginx con ${msec}, o milisegundos/microsegundos
+    desde epoch), o 0 si no hay header o no se entiende
+    """
+    header = request.headers.get('X-Request-Start', '').strip()
+    if header.startswith('t='):
+        header = header[2:]
+    try:
+        started = float(header)
+    except ValueError:
+        return 0.0
+    if started > 1e14:
+        started /= 1e6
+    elif started > 1e11:
+        started /= 1e3
+    now = time.time() if now is None else now
+    return max(0.0, now - started)
+
+
+def default_limits(config: dict):
+    """
+    Peticiones simultáneas por worker para cada endpoint (nombre del endpoint
+    de Flask o prefijo del blueprint, que aplica un límite propio a cada ruta
+    del blueprint). None deja el endpoint sin límite.
+
+    Las rutas pesadas admiten como máximo LOADSHED_WORKER_CONCURRENCY - 1
+    peticiones, así que siempre queda un hilo para las ligeras.
+    LOADSHED_ROUTE_CONCURRENCY, LOADSHED_AUTH_CONCURRENCY, LOADSHED_BATCH_CONCURRENCY,
+    LOADSHED_ANALYTICS_CONCURRENCY y LOADSHED_BULK_CONCURRENCY fijan un valor explícito.
+    """
+    heavy = max(1, int(config.get('LOADSHED_WORKER_CONCURRENCY', DEFAULT_WORKER_CONCURRENCY)) - 1)
+
+    def limit(key, default):
+        value = config.get(key)
+        return int(value) if value else min(default, heavy)
+
+    route = int(config.get('LOADSHED_ROUTE_CONCURRENCY', DEFAULT_ROUTE_CONCURRENCY))
+    auth = limit('LOADSHED_AUTH_CONCURRENCY', 4)
+    bulk = limit('LOADSHED_BULK_CONCURRENCY', 2)
+    return {
+        # Hash de contraseñas: CPU pura
+        'user_bp.login': auth,
+        'user_bp.register': auth,
+        'book_bp.execute_batch': limit('LOADSHED_BATCH_CONCURRENCY', 8),
+        'book_bp.get_book_analytics': limit('LOADSHED_ANALYTICS_CONCURRENCY', 4),
+        'book_bp.export_books': bulk,
+        'book_bp.import_books': bulk,
+        # Las conexiones SSE duran horas: su número lo acota el modelo de worker
+        'book_bp.book_events_stream': None,
+        # Con gthread este límite no llega a esperar (hay menos hilos): el resto de
+        # rutas se descartan por el tiempo en cola medido con X-Request-Start
+        'book_bp': route,
+        'user_bp': route,
+    }
+
+
+class LoadShedder:
+    """
+    Extensión Flask que reserva una plaza del endpoint en un before_request
+    y la libera en el teardown de la petición (al final del stream con
+    stream_with_context)
+
+    Configuración:
+        LOADSHED_ENABLED: activa los límites (True por defecto)
+        LOADSHED_QUEUE_TIMEOUT_MS: plazo de cola de cada petición (250 ms)
+        LOADSHED_WORKER_CONCURRENCY: peticiones simultáneas del worker (según gunicorn.conf.py)
+    """
+
+    def __init__(self, app=None):
+        self.limits = {}
+        self.queue_timeout = DEFAULT_QUEUE_TIMEOUT_MS / 1000
+        self._semaphores = {}
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('LOADSHED_ENABLED', True):
+            return
+        self.limits = default_limits(app.config)
+        concurrency = int(app.config.get('LOADSHED_WORKER_CONCURRENCY', DEFAULT_WORKER_CONCURRENCY))
+        ineffective = sorted(endpoint for endpoint, limit in self.limits.items()
+                             if limit and limit >= concurrency and '.' in endpoint)
+        if concurrency > 1 and ineffective:
+            logger.warning(f'Límites de concurrencia sin efecto con {concurrency} hilos por worker: '
+                           f"{', '.join(ineffective)}")
+        self.queue_timeout = float(app.config.get('LOADSHED_QUEUE_TIMEOUT_MS', DEFAULT_QUEUE_TIMEOUT_MS)) / 1000
+        self._semaphores = {}
+        app.before_request(self.acquire)
+        app.teardown_request(self.release)
+
+    def limit_for(self, endpoint: str):
+        if not endpoint:
+            return None
+        if endpoint in self.limits:
+            return self.limits[endpoint]
+        return self.limits.get(endpoint.split('.', 1)[0])
+
+    def semaphore_for(self, endpoint: str):
+        limit = self.limit_for(endpoint)
+        if not limit:
+            return None
+        semaphore = self._semaphores.get(endpoint)
+        if semaphore is None:
+            with self._lock:
+                semaphore = self._semaphores.setdefault(endpoint, threading.BoundedSemaphore(limit))
+        return semaphore
+
+    def acquire(self):
+        if request.method == 'OPTIONS':
+            return None
+        semaphore = self.semaphore_for(request.endpoint)
+        if semaphore is None:
+            return None
+        # Lo que queda del plazo tras la espera en el proxy: si ya se agotó, el cliente
+        # probablemente ha dejado de esperar y atenderla solo alarga la cola
+        remaining = self.queue_timeout - request_queue_age()
+        if remaining <= 0 or not semaphore.acquire(timeout=remaining):
+            logger.warning(f'Petición descartada por sobrecarga en {request.endpoint}')
+            response = jsonify({
+                'error': 'Servicio sobrecargado',
+                'message': 'Demasiadas peticiones en curso. Reintenta en unos segundos.'
+            })
+            response.status_code = 503
+            response.headers['Retry-After'] = '1'
+            return response
+        g.load_shedding_slot = semaphore
+        return None
+
+    def release(self, exc=None):
+        semaphore = g.pop('load_shedding_slot', None)
+        if semaphore is not None:
+            semaphore.release()
@@ -0,0 +1,229 @@
+"""
+Limitación de peticiones con token buckets.
+Cada política asigna a una clave (identidad JWT, IP o identificador de
+login) un bucket con una tasa de recarga y una ráfaga máxima. Las
+comprobaciones se hacen en un before_request, antes de verificar el JWT
+completo, tocar la base de datos o calcular hashes de contraseñas, y las
+peticiones rechazadas reciben 429 con Retry-After.
+"""
+
+from flask import request, jsonify, current_app
+from flask_jwt_extended import decode_token
+from cache.redis_client import RedisClient
+from collections import OrderedDict
+import threading
+import hashlib
+import math
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+PERIODS = {'second': 1, 'minute': 60, 'hour': 3600}
+DEFAULT_MAX_KEYS = 100000
+
+
+def parse_rate(rate: str):
+    """
+    Convierte una tasa en texto ('10/minute', '50/second;burst=100') en
+    (tokens por segundo, ráfaga máxima)
+    """
+    spec, _, options = rate.partition(';')
+    amount, _, period = spec.strip().partition('/')
+    amount = int(amount)
+    seconds = PERIODS[period.strip() or 'second']
+    burst = amount
+    if options.strip().startswith('burst='):
+        burst = int(options.strip()[len('burst='):])
+    return amount / seconds, burst
+
+
+def remote_ip():
+    """
+    IP del cliente. Detrás de un proxy inverso es la del proxy salvo que se
+    configure PROXY_FIX_X_FOR (ProxyFix en create_app), y entonces todos los
+    clientes compartirían bucket
+    """
+    return request.remote_addr or 'unknown'
+
+
+def login_identifier():
+    """
+    Identificador de login (username o email) del cuerpo JSON, normalizado, y
+    la IP: un atacante que prueba contraseñas de una cuenta agota solo su
+    bucket, sin bloquear el login del titular desde otra dirección
+    """
+    data = request.get_json(silent=True) or {}
+    login = data.get('login') or data.get('username') or data.get('email')
+    return f'{str(login).strip().lower()}@{remote_ip()}' if login else None
+
+
+def jwt_identity():
+    """
+    Identidad del JWT con la firma y la caducidad verificadas (HS256: unos
+    microsegundos), para que un token falsificado no pueda consumir el bucket
+    de otro usuario. Sin token o con un token inválido se usa la IP.
+    """
+    header = request.headers.get('Authorization', '')
+    if header.startswith('Bearer '):
+        try:
+            identity = decode_token(header[7:]).get(current_app.config.get('JWT_IDENTITY_CLAIM', 'sub'))
+            if identity is not None:
+                return f'user:{identity}'
+        except Exception:
+            pass
+    return f'ip:{remote_ip()}'
+
+
+class RatePolicy:
+    """Política de limitación: tasa, ráfaga y función que calcula la clave"""
+
+    def __init__(self, name: str, rate: str, key_func):
+        self.name = name
+        self.rate, self.burst = parse_rate(rate)
+        self.key_func = key_func
+
+
+class MemoryBucketStore:
+    """Buckets en memoria del proceso (LRU acotado por número de claves)"""
+
+    def __init__(self, max_keys: int = DEFAULT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, key: str, rate: float, burst: int, now: float = None):
+        """
+        Intenta consumir un token del bucket
+
+        Returns:
+            float: 0 si se permite la petición, o segundos hasta el próximo token
+        """
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (burst, now))
+            tokens = min(burst, tokens + (now - updated) * rate)
+            if tokens >= 1:
+                tokens -= 1
+                wait = 0.0
+            else:
+                wait = (1 - tokens) / rate
+            self._buckets[key] = (tokens, now)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class RedisBucketStore:
+    """
+    Buckets compartidos entre workers en Redis (cliente RESP propio, ver
+    cache/redis_client.py). La recarga y el consumo se hacen atómicamente con
+    un script Lua, enviado con EVALSHA y con EVAL solo si el servidor no lo tiene.
+    """
+
+    SCRIPT = """
+    local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local now = tonumber(ARGV[3])
+    local tokens = tonumber(bucket[1]) or burst
+    local updated = tonumber(bucket[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+    local wait = 0
+    if tokens >= 1 then
+        tokens = tokens - 1
+    else
+        wait = (1 - tokens) / rate
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return tostring(wait)
+    """
+
+    def __init__(self, url: str, prefix: str = 'ratelimit:'):
+        self.client = RedisClient(url)
+        self.prefix = prefix
+        self._sha = hashlib.sha1(self.SCRIPT.encode()).hexdigest()
+
+    def consume(self, key: str, rate: float, burst: int, now: float = None):
+        now = time.time() if now is None else now
+        return float(self.client.evalsha(self._sha, self.SCRIPT, [self.prefix + key], [rate, burst, now]))
+
+
+def default_policies(config: dict):
+    """
+    Políticas por endpoint (nombre del endpoint de Flask o prefijo del blueprint)
+
+    RATELIMIT_LOGIN_PER_IP, RATELIMIT_LOGIN_PER_IDENTIFIER, RATELIMIT_REGISTER_PER_IP
+    y RATELIMIT_BOOKS_PER_USER permiten ajustar las tasas.
+    """
+    login_ip = RatePolicy('login_ip', config.get('RATELIMIT_LOGIN_PER_IP', '20/minute'), remote_ip)
+    login_identifier_policy = RatePolicy(
+        'login_identifier', config.get('RATELIMIT_LOGIN_PER_IDENTIFIER', '5/minute'), login_identifier
+    )
+    register_ip = RatePolicy('register_ip', config.get('RATELIMIT_REGISTER_PER_IP', '5/minute'), remote_ip)
+    books_user = RatePolicy('books_user', config.get('RATELIMIT_BOOKS_PER_USER', '50/second;burst=100'), jwt_identity)
+    return {
+        'user_bp.login': [login_ip, login_identifier_policy],
+        'user_bp.register': [register_ip],
+        'book_bp': [books_user],
+    }
+
+
+class RateLimiter:
+    """
+    Extensión Flask que aplica las políticas de limitación en un before_request
+
+    Configuración:
+        RATELIMIT_ENABLED: activa la limitación (True por defecto)
+        RATELIMIT_STORAGE: 'memory' (por defecto, por worker) o 'redis' (compartido)
+        RATELIMIT_REDIS_URL: URL de Redis para el almacenamiento compartido
+    """
+
+    def __init__(self, app=None):
+        self.store = None
+        self.policies = {}
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        if not app.config.get('RATELIMIT_ENABLED', True):
+            return
+        if app.config.get('RATELIMIT_STORAGE', 'memory') == 'redis':
+            self.store = RedisBucketStore(app.config.get('RATELIMIT_REDIS_URL', 'redis://localhost:6379/0'))
+        else:
+            self.store = MemoryBucketStore(app.config.get('RATELIMIT_MAX_KEYS', DEFAULT_MAX_KEYS))
+        self.policies = default_policies(app.config)
+        app.before_request(self.check)
+
+    def policies_for(self, endpoint: str):
+        if not endpoint:
+            return []
+        policies = self.policies.get(endpoint)
+        if policies is None:
+            policies = self.policies.get(endpoint.split('.', 1)[0], [])
+        return policies
+
+    def check(self):
+        if request.method == 'OPTIONS':
+            return None
+        for policy in self.policies_for(request.endpoint):
+            key = policy.key_func()
+            if key is None:
+                continue
+            try:
+                wait = self.store.consume(f'{policy.name}:{key}', policy.rate, policy.burst)
+            except Exception as e:
+                # Si el almacenamiento compartido falla, no se bloquea el servicio
+                logger.error(f'Error en el almacenamiento de rate limit: {str(e)}')
+                return None
+            if wait > 0:
+                logger.warning(f'Rate limit excedido ({policy.name}) para {key} en {request.endpoint}')
+                response = jsonify({
+                    'error': 'Demasiadas peticiones',
+                    'message': f'Límite de peticiones excedido. Reintenta en {math.ceil(wait)} segundos.'
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(math.ceil(wait))
+                return response
+        return None
@@ -0,0 +1,103 @@
+"""
+Bloqueo de las rutas con BD mientras haya migraciones de esquema pendientes.
+La aplicación no aplica migraciones al arrancar (salvo MIGRATE_ON_STARTUP),
+así que con un código más nuevo que el esquema las consultas fallarían con
+500. En su lugar, las rutas de los blueprints con BD responden 503 con
+Retry-After, /readyz informa de que la réplica no está lista y cada worker
+vuelve a comprobar el esquema cada SCHEMA_CHECK_SECONDS: cuando
+`flask --app main db-upgrade` termina, el servicio se recupera sin reiniciar.
+"""
+
+from flask import request, jsonify
+from migrations.runner import MigrationRunner
+from models.db import db
+import threading
+import time
+import math
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHECK_SECONDS = 10
+
+
+class SchemaGate:
+    """
+    Extensión Flask que rechaza en un before_request las peticiones con BD
+    mientras el esquema no está al día
+
+    Configuración:
+        SCHEMA_CHECK_SECONDS: segundos entre comprobaciones de las migraciones pendientes (10)
+    """
+
+    # Blueprints cuyas rutas necesitan el esquema al día
+    GUARDED_BLUEPRINTS = ('book_bp', 'user_bp')
+
+    def __init__(self, app=None):
+        self.pending = []
+        self.check_seconds = DEFAULT_CHECK_SECONDS
+        self._on_ready = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.pending = []
+        self._on_ready = None
+        self.check_seconds = float(app.config.get('SCHEMA_CHECK_SECONDS', DEFAULT_CHECK_SECONDS))
+        app.before_request(self.check)
+
+    def mark_pending(self, versions: list, on_ready=None):
+        """Registra las migraciones pendientes; on_ready() se ejecuta cuando dejan de estarlo"""
+        self.pending = list(versions)
+        self._on_ready = on_ready
+        self._checked_at = time.monotonic()
+
+    @property
+    def ready(self):
+        return not self.pending
+
+    def refresh(self):
+        """Vuelve a consultar schema_version si ha pasado SCHEMA_CHECK_SECONDS (requiere contexto de aplicación)"""
+        if not self.pending or time.monotonic() - self._checked_at < self.check_seconds:
+            return
+        # Una sola comprobación a la vez; el resto de peticiones usan el estado anterior
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._checked_at = time.monotonic()
+            pending = [migration.version for migration in MigrationRunner(db.session).pending()]
+            if not pending and self._on_ready is not None:
+                self._on_ready()
+            if not pending:
+                logger.info('Esquema actualizado: se reanudan las rutas con base de datos')
+            self.pending = pending
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f'Error al comprobar las migraciones pendientes: {str(e)}')
+        finally:
+            self._lock.release()
+
+    def status(self):
+        """{'ok': bool, 'pending': versiones pendientes} para /readyz"""
+        self.refresh()
+        return {'ok': self.ready, 'pending': list(self.pending)}
+
+    def check(self):
+        if request.method == 'OPTIONS' or request.blueprint not in self.GUARDED_BLUEPRINTS:
+            return None
+        self.refresh()
+        if self.ready:
+            return None
+        response = jsonify({
+            'error': 'Migraciones pendientes',
+            'message': "El esquema de la base de datos no está actualizado: ejecuta 'flask --app main db-upgrade'."
+        })
+        response.status_code = 503
+        response.headers['Retry-After'] = str(max(1, math.ceil(self.check_seconds)))
+        return response
+
+
+# Instancia única compartida por la aplicación y el controlador de salud
+schema_gate = SchemaGate()
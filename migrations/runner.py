@@ -0,0 +1,183 @@
+"""
+Ejecutor de migraciones de esquema versionadas.
+db.create_all() crea las tablas nuevas pero nunca modifica las existentes;
+las columnas e índices añadidos a los modelos llegan a las bases de datos
+ya desplegadas (SQLite o MySQL) mediante migraciones numeradas que se
+registran en la tabla schema_version. Cada operación comprueba antes el
+estado real del esquema, así que repetir una migración interrumpida (o que
+dos procesos arranquen a la vez) es seguro, y los rellenos de datos se
+hacen por rangos de ID con un commit por lote para no bloquear la tabla.
+"""
+
+from models.schema_version_model import SchemaVersion
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
+from sqlalchemy.orm import Session
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 5000
+
+
+class Migration:
+    """Migración numerada: `upgrade(ops)` recibe las operaciones de esquema"""
+
+    def __init__(self, version: int, name: str, upgrade):
+        self.version = version
+        self.name = name
+        self.upgrade = upgrade
+
+
+class SchemaOperations:
+    """Operaciones idempotentes de esquema y relleno de datos por lotes"""
+
+    def __init__(self, db_session: Session, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_session = db_session
+        self.batch_size = batch_size
+        self.dialect = db_session.get_bind().dialect
+
+    def _inspector(self):
+        # Inspector nuevo en cada consulta: el esquema cambia durante la migración
+        return inspect(self.db_session.get_bind())
+
+    def execute(self, sql: str, params: dict = None):
+        return self.db_session.execute(text(sql), params or {})
+
+    def has_column(self, table: str, column: str) -> bool:
+        return column in {col['name'] for col in self._inspector().get_columns(table)}
+
+    def has_index(self, table: str, name: str) -> bool:
+        inspector = self._inspector()
+        names = {index['name'] for index in inspector.get_indexes(table)}
+        names |= {constraint['name'] for constraint in inspector.get_unique_constraints(table)}
+        return name in names
+
+    def add_column(self, table: str, column, server_default: str = None) -> bool:
+        """
+        Añade una columna definida en el modelo si no existe. Las columnas NOT
+        NULL necesitan `server_default` para las filas existentes. En SQLite y
+        en MySQL 8 (ALGORITHM=INSTANT) es un cambio de metadatos sin reescribir
+        la tabla.
+        """
+        if self.has_column(table, column.name):
+            return False
+        ddl = f'{column.name} {column.type.compile(dialect=self.dialect)}'
+        if server_default is not None:
+            ddl += f' DEFAULT {server_default}'
+        if not column.nullable:
+            ddl += ' NOT NULL'
+        logger.info(f'Añadiendo columna {table}.{column.name}')
+        self._run_ddl(f'ALTER TABLE {table} ADD COLUMN {ddl}', lambda: self.has_column(table, column.name))
+        return True
+
+    def create_index(self, table: str, name: str, columns, unique: bool = False) -> bool:
+        """
+        Crea un índice si no existe. En MySQL se construye en línea
+        (ALGORITHM=INPLACE, LOCK=NONE): las lecturas y escrituras continúan
+        mientras se crea.
+        """
+        if self.has_index(table, name):
+            return False
+        sql = f"CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({', '.join(columns)})"
+        if self.dialect.name == 'mysql':
+            sql += ' ALGORITHM=INPLACE LOCK=NONE'
+        logger.info(f'Creando índice {name} en {table}')
+        self._run_ddl(sql, lambda: self.has_index(table, name))
+        return True
+
+    def ensure_model_indexes(self, table) -> int:
+        """Crea los índices declarados en un modelo (tabla de SQLAlchemy) que falten en la base de datos"""
+        created = 0
+        for index in table.indexes:
+            if self.create_index(table.name, index.name, [column.name for column in index.columns], index.unique):
+                created += 1
+        return created
+
+    def _run_ddl(self, sql: str, applied):
+        try:
+            self.execute(sql)
+            self.db_session.commit()
+        except (OperationalError, ProgrammingError):
+            # Otro proceso pudo aplicar el mismo cambio entre la comprobación y el DDL
+            self.db_session.rollback()
+            if not applied():
+                raise
+
+    def id_ranges(self, table: str, batch_size: int = None):
+        """Rangos (desde, hasta] de IDs de la tabla en bloques de batch_size"""
+        batch_size = batch_size or self.batch_size
+        max_id = self.execute(f'SELECT MAX(id) FROM {table}').scalar() or 0
+        self.db_session.commit()
+        for start in range(0, max_id, batch_size):
+            yield start, min(start + batch_size, max_id)
+
+    def backfill(self, table: str, assignments: str, where: str = None, params: dict = None) -> int:
+        """
+        UPDATE por rangos de ID con un commit por lote (bloqueos breves, la
+        aplicación sigue escribiendo entre lotes)
+
+        Returns:
+            int: Filas actualizadas
+        """
+        updated = 0
+        condition = f' AND ({where})' if where else ''
+        for low, high in self.id_ranges(table):
+            result = self.execute(
+                f'UPDATE {table} SET {assignments} WHERE id > :low AND id <= :high{condition}',
+                dict(params or {}, low=low, high=high)
+            )
+            self.db_session.commit()
+            updated += result.rowcount
+        return updated
+
+
+class MigrationRunner:
+    """Aplica en orden las migraciones pendientes y las registra en schema_version"""
+
+    def __init__(self, db_session: Session, migrations=None, batch_size: int = DEFAULT_BATCH_SIZE):
+        if migrations is None:
+            from migrations.versions import MIGRATIONS
+            migrations = MIGRATIONS
+        self.db_session = db_session
+        self.migrations = sorted(migrations, key=lambda migration: migration.version)
+        self.batch_size = batch_size
+
+    def applied(self):
+        """Migraciones registradas: {versión: SchemaVersion}"""
+        SchemaVersion.__table__.create(self.db_session.get_bind(), checkfirst=True)
+        return {row.version: row for row in self.db_session.query(SchemaVersion).all()}
+
+    def pending(self):
+        applied = self.applied()
+        return [migration for migration in self.migrations if migration.version not in applied]
+
+    def status(self):
+        """Lista de (migración, SchemaVersion o None)"""
+        applied = self.applied()
+        return [(migration, applied.get(migration.version)) for migration in self.migrations]
+
+    def upgrade(self, target: int = None):
+        """
+        Aplica las migraciones pendientes hasta `target` (todas por defecto)
+
+        Returns:
+            list: Migraciones aplicadas en esta ejecución
+        """
+        done = []
+        for migration in self.pending():
+            if target is not None and migration.version > target:
+                break
+            logger.info(f'Aplicando migración {migration.version:04d} {migration.name}')
+            start = time.perf_counter()
+            migration.upgrade(SchemaOperations(self.db_session, self.batch_size))
+            try:
+                self.db_session.add(SchemaVersion(migration.version, migration.name))
+                self.db_session.commit()
+            except IntegrityError:
+                # Registrada a la vez por otro proceso
+                self.db_session.rollback()
+            logger.info(f'Migración {migration.version:04d} aplicada en {time.perf_counter() - start:.2f} s')
+            done.append(migration)
+        return done
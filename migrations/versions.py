@@ -0,0 +1,136 @@
+"""
+Migraciones de esquema, en orden. Para añadir una columna o un índice a un
+modelo existente se declara en el modelo (para las bases de datos nuevas)
+y se añade aquí una migración con el siguiente número de versión.
+"""
+
+from migrations.runner import Migration
+from models.book_model import Book
+from models.user_model import User
+from models.book_stats_model import BookStat
+from models.book_similarity_model import BookSimilarityBand
+from models.idempotency_key_model import IdempotencyKey
+from models.book_import_job_model import ImportJob
+from models.change_sequence_model import ChangeSequence, BOOKS_SEQUENCE
+from repositories.book_stats_repository import BookStatsRepository
+from repositories.change_sequence_repository import ChangeSequenceRepository
+from repositories.book_similarity_repository import BookSimilarityRepository
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def add_book_change_feed(ops):
+    """Lápidas (deleted_at) y secuencia de cambios (change_seq) del feed incremental"""
+    ops.add_column('books', Book.__table__.c.deleted_at)
+    ops.add_column('books', Book.__table__.c.change_seq, server_default='0')
+    # Los libros existentes entran en el feed en orden de ID
+    ops.backfill('books', 'change_seq = id', 'change_seq = 0')
+    ops.create_index('books', 'ix_books_change_seq', ['change_seq'])
+    # La secuencia debe continuar por encima de los valores asignados
+    max_seq = ops.execute('SELECT MAX(change_seq) FROM books').scalar() or 0
+    sequences = ChangeSequenceRepository(ops.db_session)
+    if sequences.get_value(BOOKS_SEQUENCE) < max_seq:
+        sequences.set_value(BOOKS_SEQUENCE, max_seq)
+    ops.db_session.commit()
+
+
+def add_book_isbn_normalized(ops):
+    """ISBN-13 normalizado con índice único (ver Book.normalize_isbn)"""
+    ops.add_column('books', Book.__table__.c.isbn_normalized)
+    # La normalización se hace en Python: se leen y actualizan los libros por rangos de ID
+    update = text('UPDATE books SET isbn_normalized = :normalized WHERE id = :book_id')
+    filled = 0
+    for low, high in ops.id_ranges('books'):
+        rows = ops.execute(
+            'SELECT id, isbn FROM books WHERE id > :low AND id <= :high '
+            'AND isbn IS NOT NULL AND isbn_normalized IS NULL AND deleted_at IS NULL',
+            {'low': low, 'high': high}
+        ).all()
+        values = [{'normalized': Book.normalize_isbn(isbn), 'book_id': book_id} for book_id, isbn in rows]
+        values = [value for value in values if value['normalized']]
+        try:
+            if values:
+                ops.db_session.execute(update, values)
+            ops.db_session.commit()
+            filled += len(values)
+        except IntegrityError:
+            # Con el índice único ya creado (migración repetida) se omiten solo los duplicados
+            ops.db_session.rollback()
+            for value in values:
+                try:
+                    ops.db_session.execute(update, value)
+                    ops.db_session.commit()
+                    filled += 1
+                except IntegrityError:
+                    ops.db_session.rollback()
+    # Si había ISBN repetidos solo conserva el normalizado el libro más antiguo
+    # (GROUP BY en lugar de un auto-JOIN: la columna aún no tiene índice)
+    duplicates = ops.execute(
+        'UPDATE books SET isbn_normalized = NULL WHERE isbn_normalized IS NOT NULL AND id NOT IN ('
+        'SELECT first_id FROM (SELECT MIN(id) AS first_id FROM books WHERE isbn_normalized IS NOT NULL '
+        'GROUP BY isbn_normalized) AS first_books)'
+    ).rowcount
+    ops.db_session.commit()
+    if duplicates:
+        logger.warning(f'{duplicates} libros con ISBN repetido quedan sin ISBN normalizado')
+    logger.info(f'{filled} ISBN normalizados')
+    ops.create_index('books', 'ix_books_isbn_normalized', ['isbn_normalized'], unique=True)
+
+
+def ensure_model_indexes(ops):
+    """Índices declarados en los modelos que falten en bases de datos antiguas"""
+    for model in (Book, User, BookStat, ChangeSequence):
+        ops.ensure_model_indexes(model.__table__)
+
+
+def rebuild_book_stats(ops):
+    """Tabla de resumen de estadísticas coherente con las lápidas ya migradas"""
+    BookStatsRepository(ops.db_session).rebuild()
+
+
+def add_book_similarity_index(ops):
+    """Índice MinHash de casi duplicados (título y autor) para los libros existentes"""
+    BookSimilarityBand.__table__.create(ops.db_session.get_bind(), checkfirst=True)
+    similarity = BookSimilarityRepository(ops.db_session)
+    indexed = 0
+    for low, high in ops.id_ranges('books'):
+        params = {'low': low, 'high': high}
+        rows = ops.execute(
+            'SELECT id, title, author FROM books WHERE id > :low AND id <= :high AND deleted_at IS NULL', params
+        ).all()
+        # Repetible: se reemplazan las bandas del rango
+        ops.execute('DELETE FROM book_similarity_bands WHERE book_id > :low AND book_id <= :high', params)
+        similarity.index_books(rows)
+        ops.db_session.commit()
+        indexed += len(rows)
+    logger.info(f'{indexed} libros añadidos al índice de casi duplicados')
+
+
+def add_idempotency_keys(ops):
+    """Respuestas guardadas por Idempotency-Key, con índice de caducidad"""
+    IdempotencyKey.__table__.create(ops.db_session.get_bind(), checkfirst=True)
+
+
+def add_book_import_jobs(ops):
+    """Trabajos de importación y su progreso (antes en memoria de cada worker)"""
+    ImportJob.__table__.create(ops.db_session.get_bind(), checkfirst=True)
+
+
+def reindex_book_similarity(ops):
+    """Índice de casi duplicados con títulos en cualquier alfabeto (antes solo contaban las letras latinas)"""
+    add_book_similarity_index(ops)
+
+
+MIGRATIONS = [
+    Migration(1, 'add_book_change_feed', add_book_change_feed),
+    Migration(2, 'add_book_isbn_normalized', add_book_isbn_normalized),
+    Migration(3, 'ensure_model_indexes', ensure_model_indexes),
+    Migration(4, 'rebuild_book_stats', rebuild_book_stats),
+    Migration(5, 'add_book_similarity_index', add_book_similarity_index),
+    Migration(6, 'add_idempotency_keys', add_idempotency_keys),
+    Migration(7, 'add_book_import_jobs', add_book_import_jobs),
+    Migration(8, 'reindex_book_similarity', reindex_book_similarity),
+]
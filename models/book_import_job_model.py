@@ -0,0 +1,109 @@
+"""
+Modelo de trabajos de importación masiva de libros.
+Cada fila guarda la configuración, el estado y los contadores de una
+importación. El servicio confirma los contadores en la misma transacción
+que cada lote insertado, así que processed indica exactamente cuántas
+filas del archivo están ya aplicadas y un trabajo interrumpido (worker
+reciclado o caído) se reanuda desde ahí. owner y heartbeat_at forman la
+concesión del ejecutor que lo tiene reservado.
+"""
+
+from models.db import db
+from datetime import datetime
+import uuid
+
+# Estados de un trabajo
+STATUS_PENDING = 'pending'
+STATUS_RUNNING = 'running'
+STATUS_COMPLETED = 'completed'
+STATUS_FAILED = 'failed'
+
+# Máximo de errores de fila (y de casi duplicados) que se guardan en el trabajo (el resto solo se cuentan)
+MAX_REPORTED_ERRORS = 100
+
+class ImportJob(db.Model):
+    __tablename__ = 'book_import_jobs'
+    __table_args__ = (
+        db.Index('ix_book_import_jobs_status_heartbeat', 'status', 'heartbeat_at'),
+    )
+
+    id = db.Column(db.String(32), primary_key=True)
+    source = db.Column(db.String(255), nullable=False)
+    format = db.Column(db.String(10), nullable=False)
+    # Archivo a importar (en BOOK_IMPORT_DIR para las subidas)
+    path = db.Column(db.String(500))
+    batch_size = db.Column(db.Integer, nullable=False)
+    duplicate_mode = db.Column(db.String(10), nullable=False)
+    duplicate_threshold = db.Column(db.Float, nullable=False)
+    status = db.Column(db.String(20), nullable=False, default=STATUS_PENDING)
+    processed = db.Column(db.Integer, nullable=False, default=0)
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    duplicates = db.Column(db.Integer, nullable=False, default=0)
+    near_duplicates = db.Column(db.Integer, nullable=False, default=0)
+    invalid = db.Column(db.Integer, nullable=False, default=0)
+    batches = db.Column(db.Integer, nullable=False, default=0)
+    errors = db.Column(db.JSON, nullable=False, default=list)
+    near_duplicate_rows = db.Column(db.JSON, nullable=False, default=list)
+    owner = db.Column(db.String(32))
+    heartbeat_at = db.Column(db.DateTime)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __init__(self, source: str, file_format: str, batch_size: int, duplicate_mode: str,
+                 duplicate_threshold: float, path: str = None):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.format = file_format
+        self.path = path
+        self.batch_size = batch_size
+        self.duplicate_mode = duplicate_mode
+        self.duplicate_threshold = duplicate_threshold
+        self.status = STATUS_PENDING
+        self.processed = 0
+        self.imported = 0
+        self.duplicates = 0
+        self.near_duplicates = 0
+        self.invalid = 0
+        self.batches = 0
+        self.errors = []
+        self.near_duplicate_rows = []
+        self.created_at = datetime.utcnow()
+
+    @property
+    def finished(self):
+        return self.status in (STATUS_COMPLETED, STATUS_FAILED)
+
+    def add_error(self, line: int, message: str):
+        """Registra un error de fila (solo se conservan los primeros MAX_REPORTED_ERRORS)"""
+        self.invalid += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            # Asignar una lista nueva: las columnas JSON no detectan cambios en el sitio
+            self.errors = self.errors + [{'line': line, 'error': message}]
+
+    def add_near_duplicate(self, line: int, matches: list):
+        """Registra una fila casi duplicada (descartada o marcada según duplicate_mode)"""
+        self.near_duplicates += 1
+        if len(self.near_duplicate_rows) < MAX_REPORTED_ERRORS:
+            self.near_duplicate_rows = self.near_duplicate_rows + [{'line': line, 'matches': matches}]
+
+    def to_dict(self):
+        """Convierte el trabajo a diccionario para respuestas JSON"""
+        return {
+            'job_id': self.id,
+            'source': self.source,
+            'format': self.format,
+            'batch_size': self.batch_size,
+            'duplicate_mode': self.duplicate_mode,
+            'status': self.status,
+            'processed': self.processed,
+            'imported': self.imported,
+            'duplicates': self.duplicates,
+            'near_duplicates': self.near_duplicates,
+            'invalid': self.invalid,
+            'batches': self.batches,
+            'errors': list(self.errors or []),
+            'near_duplicate_rows': list(self.near_duplicate_rows or []),
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'heartbeat_at': self.heartbeat_at.isoformat() if self.heartbeat_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
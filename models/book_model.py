@@ -14,8 +14,14 @@ class Book(db.Model):
     language = db.Column(db.String(50), nullable=True)
     pages = db.Column(db.Integer, nullable=True)
     isbn = db.Column(db.String(50), nullable=True)
+    # ISBN-13 normalizado (sin guiones; los ISBN-10 se convierten): único entre los libros no
+    # eliminados (las lápidas lo dejan a NULL) e indexado para búsquedas y deduplicación
+    isbn_normalized = db.Column(db.String(13), nullable=True, unique=True, index=True)
     created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, onupdate=datetime.utcnow)
+    # Lápida de borrado lógico y secuencia de cambios para el feed incremental (/books/changes)
+    deleted_at = db.Column(db.DateTime, nullable=True)
+    change_seq = db.Column(db.BigInteger, nullable=False, default=0, index=True)
 
     def __init__(self, title: str, author: str, published_year: Optional[int] = None, editorial: Optional[str] = None, genre: Optional[str] = None, language: Optional[str] = None, pages: Optional[int] = None, isbn: Optional[str] = None):
         self.title = title
@@ -26,6 +32,7 @@ class Book(db.Model):
         self.language = language
         self.pages = pages
         self.isbn = isbn
+        self.isbn_normalized = Book.normalize_isbn(isbn)
         self.created_at = datetime.utcnow()
         self.updated_at = datetime.utcnow()
 
@@ -44,24 +51,91 @@ class Book(db.Model):
             "updated_at": self.updated_at.isoformat() if self.updated_at else None
         }
 
+    def to_change_dict(self) -> Dict[str, Any]:
+        if self.deleted_at is not None:
+            return {
+                "op": "delete",
+                "id": self.id,
+                "change_seq": self.change_seq,
+                "deleted_at": self.deleted_at.isoformat()
+            }
+        return {
+            "op": "upsert",
+            "id": self.id,
+            "change_seq": self.change_seq,
+            "book": self.to_dict()
+        }
+
     def update(self, title: Optional[str] = None, author: Optional[str] = None, published_year: Optional[int] = None, editorial: Optional[str] = None, genre: Optional[str] = None, language: Optional[str] = None, pages: Optional[int] = None, isbn: Optional[str] = None):
-        if title is not None:
-            self.title = title
-        if author is not None:
-            self.author = author
-        if published_year is not None:
-            self.published_year = published_year
-        if editorial is not None:
-            self.editorial = editorial
-        if genre is not None:
-            self.genre = genre
-        if language is not None:
-            self.language = language
-        if pages is not None:
-            self.pages = pages
-        if isbn is not None:
-            self.isbn = isbn
-        self.updated_at = datetime.utcnow()
+        values = Book.update_values(title=title, author=author, published_year=published_year, editorial=editorial, genre=genre, language=language, pages=pages, isbn=isbn)
+        for field, value in values.items():
+            setattr(self, field, value)
+
+    @staticmethod
+    def update_values(title: Optional[str] = None, author: Optional[str] = None, published_year: Optional[int] = None, editorial: Optional[str] = None, genre: Optional[str] = None, language: Optional[str] = None, pages: Optional[int] = None, isbn: Optional[str] = None) -> Dict[str, Any]:
+        # Columnas a modificar en una actualización parcial (los campos None se ignoran)
+        values = {
+            "title": title,
+            "author": author,
+            "published_year": published_year,
+            "editorial": editorial,
+            "genre": genre,
+            "language": language,
+            "pages": pages,
+            "isbn": isbn
+        }
+        values = {field: value for field, value in values.items() if value is not None}
+        if "isbn" in values:
+            values["isbn_normalized"] = Book.normalize_isbn(values["isbn"])
+        values["updated_at"] = datetime.utcnow()
+        return values
+
+    @classmethod
+    def from_row(cls, row) -> "Book":
+        # Construye un Book desvinculado de la sesión a partir de una fila (p. ej. devuelta por RETURNING)
+        book = cls(title=row["title"], author=row["author"])
+        for column in cls.__table__.columns.keys():
+            setattr(book, column, row[column])
+        return book
+
+    def to_cache_dict(self) -> Dict[str, Any]:
+        # Todas las columnas en forma serializable a JSON (fechas en ISO 8601) para la caché compartida
+        values = {}
+        for column in self.__table__.columns.keys():
+            value = getattr(self, column)
+            values[column] = value.isoformat() if isinstance(value, datetime) else value
+        return values
+
+    @classmethod
+    def from_cache_dict(cls, data: Dict[str, Any]) -> "Book":
+        row = dict(data)
+        for column in ("created_at", "updated_at", "deleted_at"):
+            if row.get(column):
+                row[column] = datetime.fromisoformat(row[column])
+        return cls.from_row(row)
+
+    @staticmethod
+    def normalize_isbn(isbn: Optional[str]) -> Optional[str]:
+        # ISBN-13 sin guiones ni espacios (los ISBN-10 se convierten a ISBN-13); None si no es un ISBN válido
+        if not isinstance(isbn, str):
+            return None
+        value = isbn.replace("-", "").replace(" ", "").upper()
+        if not value.isascii():
+            return None
+        if len(value) == 10 and value[:9].isdigit() and (value[9].isdigit() or value[9] == "X"):
+            check = 10 if value[9] == "X" else int(value[9])
+            if (sum((10 - i) * int(digit) for i, digit in enumerate(value[:9])) + check) % 11:
+                return None
+            value = "978" + value[:9]
+            return value + Book._isbn13_check_digit(value)
+        if len(value) == 13 and value.isdigit() and value[12] == Book._isbn13_check_digit(value[:12]):
+            return value
+        return None
+
+    @staticmethod
+    def _isbn13_check_digit(digits: str) -> str:
+        total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(digits))
+        return str((10 - total % 10) % 10)
 
     @staticmethod
     def validate_book_data(data: Dict[str, Any]) -> Optional[str]:
@@ -86,6 +160,7 @@ class Book(db.Model):
                 return "Pages must be an integer."
             if data["pages"] < 1:
                 return "Pages must be greater than 0."
+        # Cualquier texto es un ISBN aceptable; si no se puede normalizar, isbn_normalized queda a NULL
         if "isbn" in data and not isinstance(data["isbn"], str):
             return "ISBN must be a string."
         return None
\ No newline at end of file
@@ -0,0 +1,20 @@
+"""
+Modelo del índice de similitud de libros.
+Cada libro activo tiene una fila por banda de su firma MinHash (título y
+autor normalizados); dos libros con el mismo cubo en alguna banda son
+candidatos a casi duplicado. El cubo incluye la banda en su hash, así que
+la búsqueda solo necesita el índice sobre bucket. El repositorio de libros
+mantiene el índice en la misma transacción que cada escritura.
+"""
+
+from models.db import db
+
+class BookSimilarityBand(db.Model):
+    __tablename__ = 'book_similarity_bands'
+    __table_args__ = (
+        db.Index('ix_book_similarity_bands_bucket', 'bucket'),
+    )
+
+    book_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    band = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.BigInteger, nullable=False)
@@ -0,0 +1,37 @@
+"""
+Modelo de estadísticas agregadas del catálogo.
+Define la tabla book_stats, un resumen por grupo (género, idioma, década
+de publicación y total) que el repositorio de libros mantiene de forma
+incremental en la misma transacción que cada escritura.
+"""
+
+from models.db import db
+
+# Dimensiones soportadas en la tabla de resumen
+DIMENSION_TOTAL = 'total'
+DIMENSION_GENRE = 'genre'
+DIMENSION_LANGUAGE = 'language'
+DIMENSION_DECADE = 'decade'
+
+# Valor usado para los libros sin dato en una dimensión (NULL no participa en UNIQUE)
+UNKNOWN_VALUE = ''
+
+class BookStat(db.Model):
+    __tablename__ = 'book_stats'
+    __table_args__ = (
+        db.UniqueConstraint('dimension', 'value', name='uq_book_stats_dimension_value'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    dimension = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(200), nullable=False, default=UNKNOWN_VALUE)
+    book_count = db.Column(db.Integer, nullable=False, default=0)
+    total_pages = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def to_dict(self):
+        """Convierte el grupo a diccionario para respuestas JSON"""
+        return {
+            'value': self.value if self.value != UNKNOWN_VALUE else None,
+            'count': self.book_count,
+            'pages': self.total_pages
+        }
@@ -0,0 +1,23 @@
+"""
+Modelo de secuencias de cambios.
+Cada fila es un contador monotónico con nombre (p. ej. 'books') que se
+incrementa dentro de la transacción de cada escritura, de modo que el orden
+de las secuencias coincide con el orden de confirmación de los cambios.
+"""
+
+from models.db import db
+
+# Nombre de la secuencia de cambios del catálogo de libros
+BOOKS_SEQUENCE = 'books'
+# Mayor change_seq de las lápidas ya purgadas (los cursores anteriores requieren resincronizar)
+BOOKS_PURGED_SEQUENCE = 'books_purged'
+
+class ChangeSequence(db.Model):
+    __tablename__ = 'change_sequences'
+
+    name = db.Column(db.String(50), primary_key=True)
+    value = db.Column(db.BigInteger, nullable=False, default=0)
+
+    def __init__(self, name: str, value: int = 0):
+        self.name = name
+        self.value = value
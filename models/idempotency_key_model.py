@@ -0,0 +1,35 @@
+"""
+Modelo de claves de idempotencia.
+Cada fila guarda, para una clave Idempotency-Key enviada por un cliente, la
+huella de la petición original y su respuesta, que se devuelve tal cual a
+los reintentos hasta expires_at. Mientras la petición original está en
+curso response_status es NULL y expires_at marca cuándo se considera
+abandonada (el worker pudo morir sin liberarla).
+"""
+
+from models.db import db
+
+# Tamaño máximo de una clave (la envía el cliente)
+MAX_KEY_LENGTH = 255
+
+class IdempotencyKey(db.Model):
+    __tablename__ = 'idempotency_keys'
+    __table_args__ = (
+        db.Index('ix_idempotency_keys_expires_at', 'expires_at'),
+    )
+
+    # Ámbito de la clave: usuario del JWT ('user:<id>') o IP del cliente sin JWT ('ip:<ip>', registro)
+    scope = db.Column(db.String(100), primary_key=True)
+    key = db.Column(db.String(MAX_KEY_LENGTH), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # Token de la petición que tiene la clave reservada (solo ella puede completarla o liberarla)
+    owner = db.Column(db.String(32), nullable=False)
+    response_status = db.Column(db.Integer)
+    response_body = db.Column(db.LargeBinary(2 ** 24 - 1))
+    content_type = db.Column(db.String(100))
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    @property
+    def completed(self):
+        return self.response_status is not None
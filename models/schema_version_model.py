@@ -0,0 +1,27 @@
+"""
+Modelo de versiones de esquema.
+Cada fila registra una migración ya aplicada a la base de datos (ver
+migrations/), de modo que el ejecutor solo aplica las pendientes.
+"""
+
+from models.db import db
+from datetime import datetime
+
+class SchemaVersion(db.Model):
+    __tablename__ = 'schema_version'
+
+    version = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    name = db.Column(db.String(100), nullable=False)
+    applied_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    def __init__(self, version: int, name: str):
+        self.version = version
+        self.name = name
+        self.applied_at = datetime.utcnow()
+
+    def to_dict(self):
+        return {
+            'version': self.version,
+            'name': self.name,
+            'applied_at': self.applied_at.isoformat() if self.applied_at else None
+        }
@@ -0,0 +1,181 @@
+"""
+Group commit para las escrituras individuales de libros.
+Las altas, modificaciones y bajas concurrentes de un worker se encolan
+durante unos milisegundos y se ejecutan en una única transacción (un solo
+COMMIT/fsync para todo el grupo). Si alguna operación falla, el grupo se
+revierte y sus operaciones se repiten una a una, así que un error solo
+afecta a su llamador.
+
+El resultado que recibe el llamador siempre es definitivo: si su operación
+sigue en cola al agotarse BOOK_GROUP_COMMIT_TIMEOUT, se retira de la cola y
+se lanza GroupCommitTimeout (no se ha escrito nada y se puede reintentar);
+si el hilo ya la había tomado, se espera a que su grupo termine.
+"""
+
+from models.change_sequence_model import BOOKS_SEQUENCE
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+import threading
+import queue
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_BATCH = 64
+DEFAULT_MAX_WAIT_MS = 5
+# Segundos que una operación puede esperar en cola antes de retirarse
+DEFAULT_RESULT_TIMEOUT = 30
+
+
+class GroupCommitTimeout(Exception):
+    """La operación se retiró de la cola sin ejecutarse: no se ha escrito nada"""
+
+
+class GroupCommitter:
+    """
+    Cola de escrituras de libros confirmadas en grupo por un hilo dedicado
+
+    Configuración:
+        BOOK_GROUP_COMMIT: habilita el modo (False por defecto)
+        BOOK_GROUP_COMMIT_MAX_BATCH: operaciones máximas por transacción
+        BOOK_GROUP_COMMIT_MAX_WAIT_MS: espera máxima para completar un grupo
+        BOOK_GROUP_COMMIT_TIMEOUT: segundos en cola antes de lanzar GroupCommitTimeout
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.max_batch = DEFAULT_MAX_BATCH
+        self.max_wait = DEFAULT_MAX_WAIT_MS / 1000
+        self.result_timeout = DEFAULT_RESULT_TIMEOUT
+        self.app = None
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        # Una cola nueva por aplicación: el hilo se asocia al contexto de esta app
+        self.app = app
+        self._queue = queue.Queue()
+        self._thread = None
+        self.enabled = bool(app.config.get('BOOK_GROUP_COMMIT', False))
+        self.max_batch = app.config.get('BOOK_GROUP_COMMIT_MAX_BATCH', DEFAULT_MAX_BATCH)
+        self.max_wait = app.config.get('BOOK_GROUP_COMMIT_MAX_WAIT_MS', DEFAULT_MAX_WAIT_MS) / 1000
+        self.result_timeout = float(app.config.get('BOOK_GROUP_COMMIT_TIMEOUT', DEFAULT_RESULT_TIMEOUT))
+        if self.enabled:
+            logger.info(f'Group commit de libros habilitado (lote máximo {self.max_batch}, '
+                        f'espera máxima {self.max_wait * 1000:.0f} ms)')
+
+    def submit(self, operation: str, *args):
+        """
+        Encola una operación de BookRepository y espera su resultado
+
+        Args:
+            operation (str): Método del repositorio ('create_book', 'update_book', 'delete_book')
+            *args: Argumentos del método
+
+        Returns:
+            Resultado del método una vez confirmado el grupo (o lanza su excepción)
+
+        Raises:
+            GroupCommitTimeout: La operación seguía en cola tras result_timeout y se ha retirado
+        """
+        self._ensure_started()
+        future = Future()
+        self._queue.put((operation, args, future))
+        try:
+            return future.result(timeout=self.result_timeout)
+        except FutureTimeout:
+            # Cancelar solo es posible antes de que el hilo la tome (set_running_or_notify_cancel)
+            if future.cancel():
+                raise GroupCommitTimeout(f'{operation} sin ejecutar tras {self.result_timeout:g} s en la cola '
+                                         'del group commit')
+        # Ya está en un grupo en curso: su resultado llegará al terminar ese grupo
+        return future.result()
+
+    def _ensure_started(self):
+        # El hilo se crea en el primer uso: con preload/fork cada worker arranca el suyo
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, name='book-group-commit', daemon=True)
+                    self._thread.start()
+
+    def _collect(self):
+        """Bloquea hasta la primera operación y agrupa las que lleguen dentro del plazo"""
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        from models.db import db
+        from repositories.book_repository import BookRepository
+
+        with self.app.app_context():
+            while True:
+                # Las operaciones canceladas por timeout se descartan; el resto ya no se puede cancelar
+                batch = [item for item in self._collect() if item[2].set_running_or_notify_cancel()]
+                if not batch:
+                    continue
+                try:
+                    results = self._execute_group(db.session, BookRepository(db.session), batch)
+                except Exception as e:
+                    # Alguna operación (o el COMMIT) falló: se repite cada una en su propia
+                    # transacción para que el error solo llegue a su llamador
+                    logger.warning(f'Group commit de {len(batch)} operaciones fallido, '
+                                   f'reintentando individualmente: {str(e)}')
+                    try:
+                        db.session.rollback()
+                        results = self._execute_individually(db.session, BookRepository(db.session), batch)
+                    except Exception as retry_error:
+                        # Sin resultado no puede quedar ningún llamador esperando indefinidamente
+                        results = [(future, None, retry_error) for _, _, future in batch]
+                finally:
+                    db.session.remove()
+                for future, result, error in results:
+                    if error is not None:
+                        future.set_exception(error)
+                    else:
+                        future.set_result(result)
+
+    def _execute_group(self, session, repository, batch):
+        """
+        Ejecuta todo el grupo en una transacción con un único COMMIT; la
+        secuencia de cambios se reserva una vez y las estadísticas se
+        aplican con un único UPSERT para todo el grupo
+        """
+        results = []
+        repository.sequence_repository.reserve(BOOKS_SEQUENCE, len(batch))
+        repository.stats_repository.defer()
+        try:
+            for operation, args, future in batch:
+                result = getattr(repository, operation)(*args, commit=False)
+                results.append((future, result, None))
+            repository.stats_repository.flush()
+        finally:
+            repository.sequence_repository.release(BOOKS_SEQUENCE)
+        session.commit()
+        return results
+
+    def _execute_individually(self, session, repository, batch):
+        """Camino de error: cada operación con su propio COMMIT o ROLLBACK"""
+        results = []
+        for operation, args, future in batch:
+            try:
+                result = getattr(repository, operation)(*args, commit=False)
+                session.commit()
+                results.append((future, result, None))
+            except Exception as e:
+                session.rollback()
+                results.append((future, None, e))
+        return results
+
+
+book_group_committer = GroupCommitter()
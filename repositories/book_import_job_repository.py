@@ -0,0 +1,102 @@
+"""
+Repositorio de los trabajos de importación (tabla book_import_jobs).
+La reserva de un trabajo es una escritura condicional: solo un ejecutor
+(hilo de un worker o proceso import-worker) obtiene cada trabajo pendiente
+o abandonado, y un ejecutor que pierde su concesión deja de confirmar lotes.
+"""
+
+from models.book_import_job_model import ImportJob, STATUS_PENDING, STATUS_RUNNING
+from sqlalchemy import or_, and_, select, update
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+
+class ImportJobRepository:
+    """Repositorio para crear, reservar y renovar trabajos de importación"""
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+
+    def create(self, job: ImportJob):
+        self.db_session.add(job)
+        self.db_session.commit()
+        return job
+
+    def get(self, job_id: str):
+        return self.db_session.get(ImportJob, job_id)
+
+    def _claimable(self, lease_seconds: float, now: datetime):
+        # Pendiente, o en curso con la concesión caducada (su ejecutor murió o fue reciclado)
+        return or_(
+            ImportJob.status == STATUS_PENDING,
+            and_(ImportJob.status == STATUS_RUNNING,
+                 ImportJob.heartbeat_at < now - timedelta(seconds=lease_seconds))
+        )
+
+    def claim(self, job_id: str, owner: str, lease_seconds: float):
+        """
+        Reserva un trabajo para `owner`
+
+        Returns:
+            ImportJob | None: El trabajo reservado (con su progreso confirmado), o None si no está disponible
+        """
+        now = datetime.utcnow()
+        claimed = self.db_session.execute(
+            update(ImportJob).where(ImportJob.id == job_id, self._claimable(lease_seconds, now))
+            .values(status=STATUS_RUNNING, owner=owner, heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db_session.commit()
+        if not claimed:
+            return None
+        job = self.get(job_id)
+        self.db_session.refresh(job)
+        return job
+
+    def claim_next(self, owner: str, lease_seconds: float):
+        """Reserva el trabajo disponible más antiguo (None si no hay ninguno)"""
+        now = datetime.utcnow()
+        candidates = self.db_session.execute(
+            select(ImportJob.id).where(self._claimable(lease_seconds, now))
+            .order_by(ImportJob.created_at).limit(10)
+        ).scalars().all()
+        self.db_session.commit()
+        for job_id in candidates:
+            job = self.claim(job_id, owner, lease_seconds)
+            if job is not None:
+                return job
+        return None
+
+    def renew(self, job: ImportJob, owner: str):
+        """
+        Renueva la concesión de `owner` dentro de la transacción en curso (sin hacer commit).
+        El ejecutor pasa el owner con el que reservó el trabajo: job.owner se recarga
+        de la BD tras cada commit y ya sería el del ejecutor que lo haya relevado
+
+        Returns:
+            bool: False si otro ejecutor ha reservado el trabajo
+        """
+        now = datetime.utcnow()
+        renewed = self.db_session.execute(
+            update(ImportJob).where(ImportJob.id == job.id, ImportJob.owner == owner)
+            .values(heartbeat_at=now)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        return bool(renewed)
+
+    def heartbeat(self, job: ImportJob, owner: str):
+        """
+        Renueva la concesión en una transacción propia (otra conexión), sin
+        confirmar el progreso en memoria del trabajo ni el lote en curso
+
+        Returns:
+            bool: False si otro ejecutor ha reservado el trabajo
+        """
+        with Session(bind=self.db_session.get_bind()) as session:
+            renewed = session.execute(
+                update(ImportJob).where(ImportJob.id == job.id, ImportJob.owner == owner)
+                .values(heartbeat_at=datetime.utcnow())
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            session.commit()
+        return bool(renewed)
@@ -1,44 +1,286 @@
 from models.book_model import Book
+from models.change_sequence_model import BOOKS_SEQUENCE, BOOKS_PURGED_SEQUENCE
+from repositories.book_stats_repository import BookStatsRepository, StatsDelta, stats_values, STATS_FIELDS
+from repositories.change_sequence_repository import ChangeSequenceRepository
+from repositories.book_similarity_repository import BookSimilarityRepository
+from sqlalchemy import func, insert, select, update
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
+from datetime import datetime
 
 class BookRepository:
     # Repositorio para manejar las operaciones CRUD de los libros
-    def __init__(self, db_session: Session):
+    # Las estadísticas (book_stats), la secuencia de cambios y el índice de casi duplicados
+    # se actualizan en la misma transacción que cada escritura
+    # Los borrados son lógicos (deleted_at) para que el feed de cambios pueda informar de ellos
+    # Con group commit habilitado, las escrituras individuales se encolan y se confirman en grupo
+    def __init__(self, db_session: Session, group_committer=None):
         self.db_session = db_session
+        self.group_committer = group_committer
+        self.stats_repository = BookStatsRepository(db_session)
+        self.sequence_repository = ChangeSequenceRepository(db_session)
+        self.similarity_repository = BookSimilarityRepository(db_session)
+
+    # Consulta base de libros no eliminados
+    def _active_books(self):
+        return self.db_session.query(Book).filter(Book.deleted_at.is_(None))
 
     # Obtener todos los libros
     def get_all_books(self):
-        return self.db_session.query(Book).all()
+        return self._active_books().all()
     
+    # Obtener una página de libros ordenada por ID (paginación por cursor, usa la PK)
+    def get_books_page(self, limit: int, after_id: int = None):
+        query = self._active_books()
+        if after_id is not None:
+            query = query.filter(Book.id > after_id)
+        return query.order_by(Book.id).limit(limit).all()
+
+    # Recorrer todos los libros por bloques (paginación por cursor, memoria constante)
+    def iter_books(self, batch_size: int = 1000):
+        after_id = None
+        while True:
+            books = self.get_books_page(batch_size, after_id)
+            if not books:
+                return
+            yield from books
+            after_id = books[-1].id
+            # Liberar los objetos del bloque ya emitido
+            self.db_session.expunge_all()
+
+    # Contar los libros de forma exacta (COUNT sobre la clave primaria)
+    def count_books(self):
+        return self.db_session.query(func.count(Book.id)).filter(Book.deleted_at.is_(None)).scalar()
+
     # Obtener un libro por su ID
     def get_book_by_id(self, book_id: int):
-        return self.db_session.query(Book).filter(Book.id == book_id).first()
+        return self._active_books().filter(Book.id == book_id).first()
+
+    # Obtener un libro por su ISBN normalizado (índice único; las lápidas no tienen ISBN normalizado)
+    def get_book_by_isbn(self, isbn_normalized: str):
+        return self.db_session.query(Book).filter(Book.isbn_normalized == isbn_normalized).first()
+
+    # Obtener los libros de varios ISBN normalizados con una sola consulta IN
+    def get_books_by_isbns(self, isbns_normalized):
+        if not isbns_normalized:
+            return []
+        return self.db_session.query(Book).filter(Book.isbn_normalized.in_(list(isbns_normalized))).all()
+
+    # Obtener los cambios (altas, modificaciones y lápidas) posteriores a un cursor
+    def get_changes(self, since: int, limit: int):
+        return self.db_session.query(Book).filter(Book.change_seq > since).order_by(Book.change_seq).limit(limit).all()
+
+    # Columnas de analítica de los libros activos por bloques de filas (paginación por cursor, sin crear objetos Book)
+    def iter_analytics_rows(self, batch_size: int = 1000):
+        columns = (Book.id, Book.published_year, Book.pages, Book.genre, Book.language, Book.change_seq)
+        after_id = 0
+        while True:
+            rows = self.db_session.execute(
+                select(*columns).where(Book.deleted_at.is_(None), Book.id > after_id).order_by(Book.id).limit(batch_size)
+            ).all()
+            if not rows:
+                return
+            yield [tuple(row) for row in rows]
+            after_id = rows[-1][0]
+
+    # Columnas de analítica de los cambios posteriores a un cursor (incluye lápidas)
+    def get_analytics_changes(self, since: int, limit: int):
+        columns = (Book.id, Book.published_year, Book.pages, Book.genre, Book.language, Book.deleted_at, Book.change_seq)
+        return [tuple(row) for row in self.db_session.execute(
+            select(*columns).where(Book.change_seq > since).order_by(Book.change_seq).limit(limit)
+        ).all()]
+
+    # Mayor change_seq de las lápidas purgadas (cursores anteriores deben resincronizar)
+    def get_purged_seq(self):
+        return self.sequence_repository.get_value(BOOKS_PURGED_SEQUENCE)
+
+    # Purgar definitivamente las lápidas anteriores a una fecha
+    def purge_tombstones(self, older_than: datetime):
+        tombstones = self.db_session.query(Book).filter(Book.deleted_at.isnot(None), Book.deleted_at < older_than)
+        max_seq = tombstones.with_entities(func.max(Book.change_seq)).scalar()
+        if max_seq is None:
+            return 0
+        purged = tombstones.delete(synchronize_session=False)
+        self.sequence_repository.set_value(BOOKS_PURGED_SEQUENCE, max(max_seq, self.get_purged_seq()))
+        self.db_session.commit()
+        return purged
+
+    # Valor actual de la secuencia de cambios (cursor para empezar a sincronizar)
+    def get_change_cursor(self):
+        return self.sequence_repository.get_value(BOOKS_SEQUENCE)
 
     # Crear un nuevo libro
-    def create_book(self, book_data: dict):
+    # Un único INSERT (la PK llega por RETURNING o lastrowid); el objeto no se adjunta
+    # a la sesión, así que el commit no lo expira y no hace falta refrescarlo con otro SELECT
+    def create_book(self, book_data: dict, commit: bool = True):
+        if commit and self.group_committer is not None:
+            return self.group_committer.submit('create_book', book_data)
         # Remove 'id' from book_data if it exists to let the database auto-generate it
         book_data_copy = book_data.copy()
         book_data_copy.pop('id', None)
         
         new_book = Book(**book_data_copy)
-        self.db_session.add(new_book)
-        self.db_session.commit()
-        self.db_session.refresh(new_book)
+        new_book.change_seq = self.sequence_repository.next_values(BOOKS_SEQUENCE)
+        values = {column: getattr(new_book, column) for column in Book.__table__.columns.keys() if column != 'id'}
+        try:
+            result = self.db_session.execute(insert(Book).values(values))
+        except IntegrityError:
+            # ISBN duplicado: se revierte la reserva de la secuencia
+            self._discard(commit)
+            raise
+        new_book.id = result.inserted_primary_key[0]
+        self.stats_repository.record_create(stats_values(new_book))
+        self.similarity_repository.index_books([(new_book.id, new_book.title, new_book.author)])
+        if commit:
+            self.db_session.commit()
         return new_book
 
     # Actualizar un libro existente
-    def update_book(self, book_id: int, book_data: dict):
+    # Con RETURNING: un solo UPDATE que devuelve la fila actualizada. Solo si cambian campos
+    # de las estadísticas se leen antes sus valores anteriores (necesarios para los deltas)
+    def update_book(self, book_id: int, book_data: dict, commit: bool = True):
+        if commit and self.group_committer is not None:
+            return self.group_committer.submit('update_book', book_id, book_data)
+        values = Book.update_values(**book_data)
+        if not self._supports_returning('update'):
+            return self._update_book_fallback(book_id, values, commit)
+
+        old_values = None
+        if any(field in values for field in STATS_FIELDS):
+            old_row = self.db_session.execute(
+                select(*(getattr(Book, field) for field in STATS_FIELDS))
+                .where(Book.id == book_id, Book.deleted_at.is_(None))
+                .with_for_update()
+            ).mappings().first()
+            if old_row is None:
+                return None
+            old_values = dict(old_row)
+
+        values['change_seq'] = self.sequence_repository.next_values(BOOKS_SEQUENCE)
+        try:
+            row = self.db_session.execute(
+                update(Book).where(Book.id == book_id, Book.deleted_at.is_(None)).values(values)
+                .returning(*Book.__table__.columns).execution_options(synchronize_session=False)
+            ).mappings().first()
+        except IntegrityError:
+            self._discard(commit)
+            raise
+        if row is None:
+            # No existe: deshacer la reserva de la secuencia
+            self._discard(commit)
+            return None
+        book = Book.from_row(row)
+        if old_values is not None:
+            self.stats_repository.record_update(old_values, stats_values(book))
+        if 'title' in values or 'author' in values:
+            self.similarity_repository.index_books([(book.id, book.title, book.author)], replace=True)
+        if commit:
+            self.db_session.commit()
+        return book
+
+    # Actualización sin RETURNING (p. ej. MySQL): SELECT + UPDATE, sin el refresh posterior
+    def _update_book_fallback(self, book_id: int, values: dict, commit: bool):
         book = self.get_book_by_id(book_id)
         if book:
-            book.update(**book_data)
+            old_values = stats_values(book)
+            for field, value in values.items():
+                setattr(book, field, value)
+            book.change_seq = self.sequence_repository.next_values(BOOKS_SEQUENCE)
+            if 'title' in values or 'author' in values:
+                self.similarity_repository.index_books([(book.id, book.title, book.author)], replace=True)
+            try:
+                self.db_session.flush()
+            except IntegrityError:
+                self._discard(commit)
+                raise
+            # Delta solo tras un UPDATE correcto: con defer() no se deshace al revertir un savepoint
+            self.stats_repository.record_update(old_values, stats_values(book))
+            self.db_session.expunge(book)
+            if commit:
+                self.db_session.commit()
+        return book
+
+    # Eliminar un libro (borrado lógico: queda una lápida en el feed de cambios)
+    # La lápida libera su ISBN normalizado para que pueda volver a darse de alta
+    # Con RETURNING: un solo UPDATE que marca la lápida y devuelve la fila para la respuesta
+    def delete_book(self, book_id: int, commit: bool = True):
+        if commit and self.group_committer is not None:
+            return self.group_committer.submit('delete_book', book_id)
+        now = datetime.utcnow()
+        if not self._supports_returning('update'):
+            return self._delete_book_fallback(book_id, now, commit)
+
+        seq = self.sequence_repository.next_values(BOOKS_SEQUENCE)
+        row = self.db_session.execute(
+            update(Book).where(Book.id == book_id, Book.deleted_at.is_(None))
+            .values(deleted_at=now, updated_at=now, change_seq=seq, isbn_normalized=None)
+            .returning(*Book.__table__.columns).execution_options(synchronize_session=False)
+        ).mappings().first()
+        if row is None:
+            self._discard(commit)
+            return None
+        book = Book.from_row(row)
+        self.stats_repository.record_delete(stats_values(book))
+        self.similarity_repository.remove_books([book.id])
+        if commit:
             self.db_session.commit()
-            self.db_session.refresh(book)
         return book
 
-    # Eliminar un libro
-    def delete_book(self, book_id: int):
+    # Borrado sin RETURNING: SELECT + UPDATE
+    def _delete_book_fallback(self, book_id: int, now: datetime, commit: bool):
         book = self.get_book_by_id(book_id)
         if book:
-            self.db_session.delete(book)
+            book.deleted_at = now
+            book.updated_at = now
+            book.isbn_normalized = None
+            book.change_seq = self.sequence_repository.next_values(BOOKS_SEQUENCE)
+            self.similarity_repository.remove_books([book.id])
+            self.db_session.flush()
+            self.stats_repository.record_delete(stats_values(book))
+            self.db_session.expunge(book)
+            if commit:
+                self.db_session.commit()
+        return book
+
+    # Indica si el dialecto soporta RETURNING para el tipo de sentencia (p. ej. UPDATE: SQLite >= 3.35, PostgreSQL)
+    def _supports_returning(self, statement: str):
+        return getattr(self.db_session.get_bind().dialect, f'{statement}_returning', False)
+
+    # Descartar una escritura sin efecto: si la transacción es propia se revierte,
+    # si la gestiona el llamador (commit=False) es él quien revierte su savepoint
+    def _discard(self, commit: bool):
+        if commit:
+            self.db_session.rollback()
+
+    # Obtener los ISBN normalizados que ya existen en la base de datos (una sola consulta IN sobre el índice)
+    def get_existing_isbns(self, isbns_normalized):
+        if not isbns_normalized:
+            return set()
+        rows = self.db_session.query(Book.isbn_normalized).filter(
+            Book.isbn_normalized.in_(list(isbns_normalized))
+        ).all()
+        return {row.isbn_normalized for row in rows}
+
+    # Insertar un lote de libros con un único INSERT multi-fila (sin cargar objetos ORM)
+    # Devuelve el rango de change_seq asignado al lote (su longitud es el número de libros)
+    def bulk_create_books(self, rows: list, commit: bool = True):
+        if not rows:
+            return range(0)
+        # Reservar un rango de la secuencia de cambios para todo el lote
+        first_seq = self.sequence_repository.next_values(BOOKS_SEQUENCE, len(rows))
+        rows = [dict(row, change_seq=first_seq + i, isbn_normalized=Book.normalize_isbn(row.get('isbn')))
+                for i, row in enumerate(rows)]
+        self.db_session.execute(insert(Book), rows)
+        # IDs asignados por la BD, recuperados por el rango de change_seq del lote (índice ix_books_change_seq)
+        ids = self.db_session.execute(
+            select(Book.change_seq, Book.id).where(Book.change_seq.between(first_seq, first_seq + len(rows) - 1))
+        ).all()
+        ids = dict(ids)
+        self.similarity_repository.index_books((ids[row['change_seq']], row['title'], row['author']) for row in rows)
+        delta = StatsDelta()
+        for row in rows:
+            delta.add(row)
+        self.stats_repository.apply(delta)
+        if commit:
             self.db_session.commit()
-        return book
\ No newline at end of file
+        return range(first_seq, first_seq + len(rows))
@@ -0,0 +1,173 @@
+"""
+Repositorio del índice de casi duplicados (tabla book_similarity_bands).
+La firma de un libro son NUM_HASHES valores MinHash de los trigramas de su
+título y autor normalizados, agrupados en NUM_BANDS bandas (LSH): dos libros
+comparten cubo en alguna banda con probabilidad 1 - (1 - J^ROWS_PER_BAND)^NUM_BANDS,
+siendo J la similitud de Jaccard de sus trigramas. Los candidatos se buscan
+con el índice de cubos y se confirman con la similitud exacta.
+"""
+
+from models.book_model import Book
+from models.book_similarity_model import BookSimilarityBand
+from sqlalchemy import delete, insert, select
+from sqlalchemy.orm import Session
+import hashlib
+import re
+import struct
+import unicodedata
+
+# 10 bandas de 3 valores: umbral efectivo en torno a J = 0.46 (J = 0.7 se detecta el 99% de las veces)
+NUM_BANDS = 10
+ROWS_PER_BAND = 3
+NUM_HASHES = NUM_BANDS * ROWS_PER_BAND
+# Máximo de candidatos por búsqueda que se comparan con la similitud exacta
+MAX_CANDIDATES = 200
+# Cubos por consulta IN en las búsquedas de varios libros
+LOOKUP_CHUNK = 500
+
+# Cada digest blake2b de 64 bytes aporta 8 funciones hash de 64 bits (una sal distinta por digest):
+# el mínimo de cada columna se calcula en C con zip/min, sin aritmética por trigrama en Python
+_SALTS = [bytes([seed]) * 16 for seed in range((NUM_HASHES + 7) // 8)]
+_unpack_hashes = struct.Struct('<8Q').unpack
+_BUCKET_MASK = (1 << 63) - 1
+# Todo lo que no sea letra o dígito Unicode (cualquier alfabeto); el guion bajo también se descarta
+_NON_ALNUM = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize_text(value) -> str:
+    """Minúsculas, sin acentos ni signos de puntuación y con los espacios colapsados"""
+    value = unicodedata.normalize('NFKD', str(value or '').lower())
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(' ', value).strip()
+
+
+def trigrams(title, author) -> set:
+    """
+    Trigramas de caracteres del título y autor normalizados; vacío si el
+    título no tiene letras ni dígitos (el autor solo no identifica un libro)
+    """
+    title = normalize_text(title)
+    if not title:
+        return set()
+    text = f'  {title}  {normalize_text(author)} '
+    return {text[i:i + 3] for i in range(len(text) - 2)} - {'   '}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def band_buckets(grams: set):
+    """Cubos (banda, cubo) de la firma MinHash de un conjunto de trigramas"""
+    if not grams:
+        return []
+    hashes = []
+    for gram in grams:
+        data = gram.encode()
+        hashes.append(sum((_unpack_hashes(hashlib.blake2b(data, digest_size=64, salt=salt).digest())
+                           for salt in _SALTS), ()))
+    signature = list(map(min, zip(*hashes)))
+    buckets = []
+    for band in range(NUM_BANDS):
+        rows = signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND]
+        # El número de banda entra en el hash: un cubo identifica también su banda
+        digest = hashlib.blake2b(bytes([band]) + b''.join(row.to_bytes(8, 'little') for row in rows),
+                                 digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, 'little') & _BUCKET_MASK))
+    return buckets
+
+
+def book_signature(title, author):
+    """(trigramas, cubos) de un título y autor"""
+    grams = trigrams(title, author)
+    return grams, band_buckets(grams)
+
+
+class BookSimilarityRepository:
+    """Mantenimiento del índice y búsqueda de candidatos a casi duplicado (sin hacer commit)"""
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+
+    def index_books(self, books, replace: bool = False):
+        """
+        Indexa libros dados como tuplas (id, título, autor) con un único INSERT multi-fila
+
+        Args:
+            replace (bool): Eliminar antes las bandas existentes (actualizaciones)
+        """
+        books = list(books)
+        if replace and books:
+            self.remove_books([book_id for book_id, _, _ in books])
+        rows = [{'book_id': book_id, 'band': band, 'bucket': bucket}
+                for book_id, title, author in books
+                for band, bucket in band_buckets(trigrams(title, author))]
+        if rows:
+            self.db_session.execute(insert(BookSimilarityBand), rows)
+        return len(rows)
+
+    def remove_books(self, book_ids):
+        self.db_session.execute(
+            delete(BookSimilarityBand).where(BookSimilarityBand.book_id.in_(list(book_ids)))
+            .execution_options(synchronize_session=False)
+        )
+
+    def find_similar(self, title, author, min_similarity: float, exclude_id: int = None, limit: int = MAX_CANDIDATES):
+        """
+        Libros activos parecidos a un título y autor
+
+        Returns:
+            list: (id, título, autor, similitud) de mayor a menor similitud
+        """
+        return self.find_similar_signatures([book_signature(title, author)], min_similarity, exclude_id, limit)[0]
+
+    def find_similar_signatures(self, items, min_similarity: float, exclude_id: int = None, limit: int = MAX_CANDIDATES):
+        """
+        Candidatos de varias firmas (ver book_signature): una consulta por bloque de
+        cubos para todas ellas y otra para cargar los libros candidatos
+
+        Returns:
+            list: Por cada firma, lista de (id, título, autor, similitud)
+        """
+        owners = {}
+        for position, (_, buckets) in enumerate(items):
+            for _, bucket in buckets:
+                owners.setdefault(bucket, []).append(position)
+        if not owners:
+            return [[] for _ in items]
+
+        matches = [{} for _ in items]
+        buckets = list(owners)
+        for start in range(0, len(buckets), LOOKUP_CHUNK):
+            query = select(BookSimilarityBand.bucket, BookSimilarityBand.book_id).where(
+                BookSimilarityBand.bucket.in_(buckets[start:start + LOOKUP_CHUNK])
+            )
+            if exclude_id is not None:
+                query = query.where(BookSimilarityBand.book_id != exclude_id)
+            for bucket, book_id in self.db_session.execute(query):
+                for position in owners[bucket]:
+                    matches[position][book_id] = matches[position].get(book_id, 0) + 1
+
+        # Los candidatos con más bandas en común primero
+        candidates = [sorted(found, key=found.get, reverse=True)[:limit] for found in matches]
+        ids = {book_id for found in candidates for book_id in found}
+        books = {}
+        if ids:
+            books = {row.id: row for row in self.db_session.execute(
+                select(Book.id, Book.title, Book.author).where(Book.id.in_(ids), Book.deleted_at.is_(None))
+            )}
+
+        results = []
+        for (grams, _), found in zip(items, candidates):
+            similar = []
+            for book_id in found:
+                book = books.get(book_id)
+                if book is None:
+                    continue
+                similarity = jaccard(grams, trigrams(book.title, book.author))
+                if similarity >= min_similarity:
+                    similar.append((book.id, book.title, book.author, round(similarity, 3)))
+            results.append(sorted(similar, key=lambda match: match[3], reverse=True))
+        return results
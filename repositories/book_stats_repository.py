@@ -0,0 +1,213 @@
+"""
+Repositorio para las estadísticas agregadas del catálogo (tabla book_stats).
+Traduce cada alta, modificación o baja de libros en deltas por grupo y los
+aplica con un único UPSERT, de modo que las estadísticas se leen en
+O(grupos) en lugar de recorrer la tabla books.
+"""
+
+from models.book_model import Book
+from models.book_stats_model import (
+    BookStat, DIMENSION_TOTAL, DIMENSION_GENRE, DIMENSION_LANGUAGE, DIMENSION_DECADE, UNKNOWN_VALUE
+)
+from sqlalchemy import func, insert
+from sqlalchemy.orm import Session
+from collections import defaultdict
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Campos del libro que afectan a las estadísticas
+STATS_FIELDS = ('genre', 'language', 'published_year', 'pages')
+
+
+def stats_values(source):
+    """Extrae los campos relevantes para estadísticas de un Book o de un dict"""
+    if isinstance(source, dict):
+        return {field: source.get(field) for field in STATS_FIELDS}
+    return {field: getattr(source, field) for field in STATS_FIELDS}
+
+
+def decade_of(year):
+    """Década de publicación como texto ('1990') o valor desconocido"""
+    if year is None:
+        return UNKNOWN_VALUE
+    return str((year // 10) * 10)
+
+
+class StatsDelta:
+    """Acumula deltas (libros, páginas) por grupo (dimensión, valor)"""
+
+    def __init__(self):
+        self.groups = defaultdict(lambda: [0, 0])
+
+    def add(self, values: dict, sign: int = 1):
+        pages = (values.get('pages') or 0) * sign
+        keys = (
+            (DIMENSION_TOTAL, UNKNOWN_VALUE),
+            (DIMENSION_GENRE, values.get('genre') or UNKNOWN_VALUE),
+            (DIMENSION_LANGUAGE, values.get('language') or UNKNOWN_VALUE),
+            (DIMENSION_DECADE, decade_of(values.get('published_year'))),
+        )
+        for key in keys:
+            group = self.groups[key]
+            group[0] += sign
+            group[1] += pages
+        return self
+
+    def copy(self):
+        delta = StatsDelta()
+        delta.groups.update((key, list(group)) for key, group in self.groups.items())
+        return delta
+
+    def rows(self):
+        """Grupos con cambios reales, listos para el UPSERT"""
+        return [
+            {'dimension': dimension, 'value': value, 'book_count': count, 'total_pages': pages}
+            for (dimension, value), (count, pages) in self.groups.items()
+            if count or pages
+        ]
+
+
+class BookStatsRepository:
+    """Repositorio para mantener y consultar la tabla de resumen book_stats"""
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+        self._deferred = None
+
+    def defer(self):
+        """Acumula los deltas en memoria hasta flush() (un solo UPSERT para varias escrituras)"""
+        self._deferred = StatsDelta()
+
+    def flush(self):
+        """Aplica los deltas acumulados desde defer()"""
+        delta, self._deferred = self._deferred, None
+        if delta is not None:
+            self.apply(delta)
+
+    def checkpoint(self):
+        """Copia de los deltas acumulados, para restaurarlos si se revierte un savepoint"""
+        return self._deferred.copy() if self._deferred is not None else None
+
+    def restore(self, checkpoint):
+        """Descarta los deltas acumulados desde checkpoint()"""
+        if self._deferred is not None:
+            self._deferred = checkpoint
+
+    def record_create(self, values: dict):
+        """Suma un libro nuevo a sus grupos"""
+        self._record(values, None)
+
+    def record_delete(self, values: dict):
+        """Resta un libro eliminado de sus grupos"""
+        self._record(None, values)
+
+    def record_update(self, old_values: dict, new_values: dict):
+        """Mueve un libro entre grupos si cambiaron sus campos relevantes"""
+        if old_values == new_values:
+            return
+        self._record(new_values, old_values)
+
+    def _record(self, added: dict, removed: dict):
+        delta = self._deferred if self._deferred is not None else StatsDelta()
+        if removed is not None:
+            delta.add(removed, -1)
+        if added is not None:
+            delta.add(added)
+        if delta is not self._deferred:
+            self.apply(delta)
+
+    def apply(self, delta: StatsDelta):
+        """
+        Aplica los deltas en la transacción en curso (sin hacer commit)
+
+        Usa INSERT ... ON CONFLICT / ON DUPLICATE KEY UPDATE en una sola
+        sentencia cuando el dialecto lo soporta, y UPDATE + INSERT en otro caso.
+        """
+        rows = delta.rows()
+        if not rows:
+            return
+        dialect = self.db_session.get_bind().dialect.name
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+            stmt = sqlite_insert(BookStat).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=['dimension', 'value'],
+                set_={
+                    'book_count': BookStat.book_count + stmt.excluded.book_count,
+                    'total_pages': BookStat.total_pages + stmt.excluded.total_pages
+                }
+            )
+            self.db_session.execute(stmt)
+        elif dialect in ('mysql', 'mariadb'):
+            from sqlalchemy.dialects.mysql import insert as mysql_insert
+            stmt = mysql_insert(BookStat).values(rows)
+            stmt = stmt.on_duplicate_key_update(
+                book_count=BookStat.book_count + stmt.inserted.book_count,
+                total_pages=BookStat.total_pages + stmt.inserted.total_pages
+            )
+            self.db_session.execute(stmt)
+        else:
+            for row in rows:
+                updated = self.db_session.query(BookStat).filter(
+                    BookStat.dimension == row['dimension'], BookStat.value == row['value']
+                ).update({
+                    BookStat.book_count: BookStat.book_count + row['book_count'],
+                    BookStat.total_pages: BookStat.total_pages + row['total_pages']
+                }, synchronize_session=False)
+                if not updated:
+                    self.db_session.execute(insert(BookStat), [row])
+
+    def get_stats(self):
+        """Obtiene todos los grupos con al menos un libro"""
+        return self.db_session.query(BookStat).filter(BookStat.book_count > 0).order_by(
+            BookStat.dimension, BookStat.book_count.desc()
+        ).all()
+
+    def get_total(self):
+        """Número de libros según el contador mantenido (una fila, sin recorrer books)"""
+        count = self.db_session.query(BookStat.book_count).filter(
+            BookStat.dimension == DIMENSION_TOTAL, BookStat.value == UNKNOWN_VALUE
+        ).scalar()
+        return count or 0
+
+    def is_empty(self):
+        """Indica si la tabla de resumen aún no se ha construido"""
+        return self.db_session.query(BookStat.id).first() is None
+
+    def rebuild(self):
+        """
+        Reconstruye la tabla de resumen desde cero con GROUP BY sobre books
+        (para reparaciones o para inicializar una base de datos existente)
+        """
+        self.db_session.query(BookStat).delete(synchronize_session=False)
+        pages = func.coalesce(func.sum(Book.pages), 0)
+        active = Book.deleted_at.is_(None)
+        rows = []
+        total = self.db_session.query(func.count(Book.id), pages).filter(active).one()
+        rows.append({'dimension': DIMENSION_TOTAL, 'value': UNKNOWN_VALUE,
+                     'book_count': total[0], 'total_pages': total[1]})
+        for dimension, column in ((DIMENSION_GENRE, Book.genre), (DIMENSION_LANGUAGE, Book.language)):
+            for value, count, total_pages in self.db_session.query(column, func.count(Book.id), pages).filter(active).group_by(column):
+                rows.append({'dimension': dimension, 'value': value or UNKNOWN_VALUE,
+                             'book_count': count, 'total_pages': total_pages})
+        # La década se agrupa en Python sobre los años ya agregados (pocos grupos)
+        decades = StatsDelta()
+        for year, count, total_pages in self.db_session.query(Book.published_year, func.count(Book.id), pages).filter(active).group_by(Book.published_year):
+            group = decades.groups[(DIMENSION_DECADE, decade_of(year))]
+            group[0] += count
+            group[1] += total_pages
+        rows.extend(decades.rows())
+        # Fusionar posibles claves repetidas (p. ej. '' y NULL en género)
+        merged = {}
+        for row in rows:
+            key = (row['dimension'], row['value'])
+            if key in merged:
+                merged[key]['book_count'] += row['book_count']
+                merged[key]['total_pages'] += row['total_pages']
+            else:
+                merged[key] = row
+        self.db_session.execute(insert(BookStat), list(merged.values()))
+        self.db_session.commit()
+        logger.info(f'Estadísticas de libros reconstruidas ({len(merged)} grupos)')
+        return len(merged)
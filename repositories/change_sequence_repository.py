@@ -0,0 +1,79 @@
+"""
+Repositorio para las secuencias de cambios (tabla change_sequences).
+"""
+
+from models.change_sequence_model import ChangeSequence
+from sqlalchemy import insert, select, update
+from sqlalchemy.orm import Session
+
+
+class ChangeSequenceRepository:
+    """Repositorio para reservar valores de secuencias monotónicas"""
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+        self._reserved = {}
+
+    def reserve(self, name: str, count: int):
+        """
+        Reserva de una vez `count` valores que consumirán las siguientes llamadas
+        a next_values(name) de este repositorio (los no usados quedan como huecos)
+        """
+        first = self.next_values(name, count)
+        self._reserved[name] = iter(range(first, first + count))
+
+    def release(self, name: str):
+        """Descarta la reserva pendiente de una secuencia"""
+        self._reserved.pop(name, None)
+
+    def ensure(self, name: str):
+        """Crea la secuencia si no existe (se llama al iniciar la aplicación)"""
+        if self.db_session.get(ChangeSequence, name) is None:
+            self.db_session.add(ChangeSequence(name))
+            self.db_session.commit()
+
+    def next_values(self, name: str, count: int = 1):
+        """
+        Reserva `count` valores consecutivos dentro de la transacción en curso
+
+        El UPDATE bloquea la fila hasta el commit, así que los escritores
+        concurrentes obtienen valores en el mismo orden en que confirman.
+
+        Returns:
+            int: Primer valor reservado (el rango es [primero, primero + count))
+        """
+        reserved = self._reserved.get(name)
+        if reserved is not None and count == 1:
+            value = next(reserved, None)
+            if value is not None:
+                return value
+            self.release(name)
+        stmt = update(ChangeSequence).where(ChangeSequence.name == name).values(
+            value=ChangeSequence.value + count
+        ).execution_options(synchronize_session=False)
+        if self.db_session.get_bind().dialect.update_returning:
+            last = self.db_session.execute(stmt.returning(ChangeSequence.value)).scalar()
+        else:
+            self.db_session.execute(stmt)
+            last = self.db_session.execute(
+                select(ChangeSequence.value).where(ChangeSequence.name == name)
+            ).scalar()
+        if last is None:
+            raise RuntimeError(f'La secuencia {name} no está inicializada')
+        return last - count + 1
+
+    def get_value(self, name: str):
+        """Valor actual de la secuencia (0 si no existe)"""
+        value = self.db_session.execute(
+            select(ChangeSequence.value).where(ChangeSequence.name == name)
+        ).scalar()
+        return value or 0
+
+    def set_value(self, name: str, value: int):
+        """Fija el valor de la secuencia, creándola si no existe (sin hacer commit)"""
+        updated = self.db_session.execute(
+            update(ChangeSequence).where(ChangeSequence.name == name).values(value=value)
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            self.db_session.execute(insert(ChangeSequence), [{'name': name, 'value': value}])
@@ -0,0 +1,98 @@
+"""
+Repositorio de las claves de idempotencia (tabla idempotency_keys).
+Cada operación confirma su propia transacción corta: la reserva de una
+clave tiene que ser visible para los reintentos concurrentes antes de que
+termine la petición que la reservó.
+"""
+
+from models.idempotency_key_model import IdempotencyKey
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from datetime import datetime, timedelta
+
+
+class IdempotencyRepository:
+    """Repositorio para reservar, completar y consultar claves de idempotencia"""
+
+    def __init__(self, db_session: Session):
+        self.db_session = db_session
+
+    def claim(self, scope: str, key: str, fingerprint: str, owner: str, lock_seconds: float):
+        """
+        Reserva la clave para la petición `owner` durante lock_seconds
+
+        Una clave caducada (respuesta vencida o reserva abandonada) se
+        reutiliza con la misma escritura condicional, así que solo una de las
+        peticiones concurrentes la obtiene.
+
+        Returns:
+            IdempotencyKey | None: None si la reserva es nuestra; si no, la fila existente
+        """
+        now = datetime.utcnow()
+        values = {
+            'fingerprint': fingerprint, 'owner': owner, 'response_status': None, 'response_body': None,
+            'content_type': None, 'created_at': now, 'expires_at': now + timedelta(seconds=lock_seconds)
+        }
+        try:
+            self.db_session.execute(insert(IdempotencyKey), [dict(values, scope=scope, key=key)])
+            self.db_session.commit()
+            return None
+        except IntegrityError:
+            self.db_session.rollback()
+        reclaimed = self.db_session.execute(
+            update(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.expires_at < now
+            ).values(**values).execution_options(synchronize_session=False)
+        ).rowcount
+        self.db_session.commit()
+        if reclaimed:
+            return None
+        record = self.get(scope, key)
+        if record is None:
+            # La petición original se liberó entre el INSERT y la consulta: reintentar
+            return self.claim(scope, key, fingerprint, owner, lock_seconds)
+        return record
+
+    def get(self, scope: str, key: str):
+        record = self.db_session.execute(
+            select(IdempotencyKey).where(IdempotencyKey.scope == scope, IdempotencyKey.key == key)
+        ).scalar()
+        if record is not None:
+            # Siempre leer el estado actual en la siguiente consulta (sondeo de las esperas)
+            self.db_session.expunge(record)
+        self.db_session.commit()
+        return record
+
+    def complete(self, scope: str, key: str, owner: str, status: int, body: bytes,
+                 content_type: str, ttl_seconds: float):
+        """Guarda la respuesta de la petición que reservó la clave (False si ya no es suya)"""
+        completed = self.db_session.execute(
+            update(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key, IdempotencyKey.owner == owner
+            ).values(
+                response_status=status, response_body=body, content_type=content_type,
+                expires_at=datetime.utcnow() + timedelta(seconds=ttl_seconds)
+            ).execution_options(synchronize_session=False)
+        ).rowcount
+        self.db_session.commit()
+        return bool(completed)
+
+    def release(self, scope: str, key: str, owner: str):
+        """Libera la reserva sin guardar respuesta (errores 5xx: el cliente puede reintentar)"""
+        self.db_session.execute(
+            delete(IdempotencyKey).where(
+                IdempotencyKey.scope == scope, IdempotencyKey.key == key,
+                IdempotencyKey.owner == owner, IdempotencyKey.response_status.is_(None)
+            ).execution_options(synchronize_session=False)
+        )
+        self.db_session.commit()
+
+    def purge_expired(self, now: datetime = None):
+        """Elimina las claves caducadas (usa el índice de expires_at)"""
+        purged = self.db_session.execute(
+            delete(IdempotencyKey).where(IdempotencyKey.expires_at < (now or datetime.utcnow()))
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        self.db_session.commit()
+        return purged
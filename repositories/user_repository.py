@@ -4,11 +4,23 @@ Maneja las operaciones de acceso a datos para usuarios.
 """
 
 from models.user_model import User
+from sqlalchemy import func, and_, or_
 from sqlalchemy.orm import Session
 import logging
 
 logger = logging.getLogger(__name__)
 
+
+def prefix_upper_bound(prefix: str):
+    """Menor cadena mayor que todas las que empiezan por el prefijo ('ab' -> 'ac')"""
+    while prefix:
+        last = ord(prefix[-1])
+        if last < 0x10FFFF:
+            return prefix[:-1] + chr(last + 1)
+        prefix = prefix[:-1]
+    return None
+
+
 class UserRepository:
     """Repositorio para manejar las operaciones CRUD de usuarios"""
     
@@ -57,11 +69,47 @@ class UserRepository:
 
     def get_all(self):
         """Obtiene todos los usuarios"""
-        logger.info('Obteniendo todos los usuarios en repositorio')
+        logger.debug('Obteniendo todos los usuarios en repositorio')
         users = self.db_session.query(User).all()
-        logger.info(f'{len(users)} usuarios obtenidos en repositorio')
+        logger.debug(f'{len(users)} usuarios obtenidos en repositorio')
         return users
 
+    def get_page(self, limit: int, after_id: int = None):
+        """Obtiene una página de usuarios ordenada por ID (paginación por cursor sobre la PK)"""
+        query = self.db_session.query(User)
+        if after_id is not None:
+            query = query.filter(User.id > after_id)
+        return query.order_by(User.id).limit(limit).all()
+
+    def count(self):
+        """Cuenta todos los usuarios"""
+        return self.db_session.query(func.count(User.id)).scalar()
+
+    def _prefix_range(self, column, prefix: str):
+        upper = prefix_upper_bound(prefix)
+        return column >= prefix if upper is None else and_(column >= prefix, column < upper)
+
+    def count_by_prefix(self, prefix: str):
+        """Cuenta los usuarios cuyo username o email empieza por el prefijo (mismos rangos que la búsqueda)"""
+        return self.db_session.query(func.count(User.id)).filter(
+            or_(self._prefix_range(User.username, prefix), self._prefix_range(User.email, prefix))
+        ).scalar()
+
+    def search_by_prefix(self, prefix: str, limit: int):
+        """
+        Busca usuarios cuyo username o email empiece por el prefijo
+
+        Cada columna se consulta como un rango [prefijo, siguiente_prefijo) sobre
+        su índice (en lugar de LIKE, que no siempre aprovecha el índice) y los
+        resultados se combinan ordenados por username.
+        """
+        users = {}
+        for column in (User.username, User.email):
+            query = self.db_session.query(User).filter(self._prefix_range(column, prefix))
+            for user in query.order_by(column).limit(limit):
+                users[user.id] = user
+        return sorted(users.values(), key=lambda user: user.username)[:limit]
+
     def update_user(self, user_id: int, user_data: dict):
         """Actualiza un usuario existente"""
         user = self.get_by_id(user_id)
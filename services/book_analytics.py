@@ -0,0 +1,320 @@
+"""
+Instantánea columnar en memoria del catálogo para análisis ad hoc.
+Guarda published_year y pages como arrays de NumPy y genre y language
+codificados con diccionario (un entero por fila), ordenados por ID. Se
+carga por bloques en la primera consulta del worker (no al arrancar: los
+comandos de línea de comandos y los workers que nunca la consultan no
+leen la tabla completa), BookService le aplica cada alta,
+modificación o baja del worker y, antes de cada consulta, se pone al día
+con el feed de cambios (importaciones y escrituras de otros workers).
+Requiere el paquete opcional numpy; sin él la analítica queda desactivada.
+"""
+
+from models.book_stats_model import UNKNOWN_VALUE
+from datetime import datetime
+import threading
+import time
+import logging
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - dependencia opcional
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# Valor de las columnas numéricas y categóricas cuando el dato no existe
+MISSING = -1
+GROUP_FIELDS = ('genre', 'language', 'decade', 'published_year')
+HISTOGRAM_FIELDS = ('published_year', 'pages')
+DEFAULT_LOAD_BATCH = 50000
+DEFAULT_REFRESH_LIMIT = 10000
+MAX_BINS = 200
+# Fracción de filas eliminadas a partir de la cual se compactan los arrays
+COMPACT_RATIO = 0.25
+
+
+class CategoryDictionary:
+    """Codificación por diccionario de una columna categórica"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+
+    def encode(self, value):
+        if value is None or value == UNKNOWN_VALUE:
+            return MISSING
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def lookup(self, value):
+        """Código de un valor ya visto (None si no aparece en la instantánea)"""
+        return self.codes.get(value)
+
+    def decode(self, code: int):
+        return self.values[code] if code != MISSING else None
+
+
+class BookSnapshot:
+    """Columnas del catálogo ordenadas por ID, con huecos para las bajas"""
+
+    COLUMNS = ('ids', 'seqs', 'years', 'pages', 'genres', 'languages', 'alive')
+
+    def __init__(self, capacity: int = 1024):
+        self.size = 0
+        self.dead = 0
+        self.ids = np.zeros(capacity, dtype=np.int64)
+        # change_seq de la versión aplicada de cada fila (descarta cambios atrasados)
+        self.seqs = np.zeros(capacity, dtype=np.int64)
+        self.years = np.full(capacity, MISSING, dtype=np.int32)
+        self.pages = np.full(capacity, MISSING, dtype=np.int32)
+        self.genres = np.full(capacity, MISSING, dtype=np.int32)
+        self.languages = np.full(capacity, MISSING, dtype=np.int32)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.genre_dictionary = CategoryDictionary()
+        self.language_dictionary = CategoryDictionary()
+
+    def _reserve(self, needed: int):
+        capacity = len(self.ids)
+        if needed <= capacity:
+            return
+        while capacity < needed:
+            capacity *= 2
+        for name in self.COLUMNS:
+            old = getattr(self, name)
+            new = np.full(capacity, MISSING, dtype=old.dtype) if old.dtype == np.int32 else np.zeros(capacity, dtype=old.dtype)
+            new[:self.size] = old[:self.size]
+            setattr(self, name, new)
+
+    def _position(self, book_id: int):
+        pos = int(np.searchsorted(self.ids[:self.size], book_id))
+        found = pos < self.size and self.ids[pos] == book_id
+        return pos, found
+
+    def append_rows(self, rows):
+        """Añade filas (id, published_year, pages, genre, language, change_seq) con IDs crecientes (carga inicial)"""
+        count = len(rows)
+        if not count:
+            return
+        self._reserve(self.size + count)
+        end = self.size + count
+        ids, years, pages, genres, languages, seqs = zip(*rows)
+        self.ids[self.size:end] = ids
+        self.seqs[self.size:end] = seqs
+        self.years[self.size:end] = [MISSING if year is None else year for year in years]
+        self.pages[self.size:end] = [MISSING if value is None else value for value in pages]
+        self.genres[self.size:end] = [self.genre_dictionary.encode(value) for value in genres]
+        self.languages[self.size:end] = [self.language_dictionary.encode(value) for value in languages]
+        self.alive[self.size:end] = True
+        self.size = end
+
+    def upsert(self, book_id: int, published_year, pages, genre, language, change_seq: int):
+        pos, found = self._position(book_id)
+        if found and self.seqs[pos] > change_seq:
+            return
+        if not found:
+            self._reserve(self.size + 1)
+            if pos < self.size:
+                # ID anterior al último conocido (confirmado fuera de orden): desplazar la cola
+                for name in self.COLUMNS:
+                    column = getattr(self, name)
+                    column[pos + 1:self.size + 1] = column[pos:self.size]
+            self.size += 1
+            self.ids[pos] = book_id
+        elif not self.alive[pos]:
+            self.dead -= 1
+        self.seqs[pos] = change_seq
+        self.years[pos] = MISSING if published_year is None else published_year
+        self.pages[pos] = MISSING if pages is None else pages
+        self.genres[pos] = self.genre_dictionary.encode(genre)
+        self.languages[pos] = self.language_dictionary.encode(language)
+        self.alive[pos] = True
+
+    def remove(self, book_id: int, change_seq: int):
+        pos, found = self._position(book_id)
+        if found and self.alive[pos] and self.seqs[pos] <= change_seq:
+            self.seqs[pos] = change_seq
+            self.alive[pos] = False
+            self.dead += 1
+            if self.dead > self.size * COMPACT_RATIO:
+                self._compact()
+
+    def _compact(self):
+        keep = self.alive[:self.size]
+        live = int(keep.sum())
+        for name in self.COLUMNS:
+            column = getattr(self, name)
+            column[:live] = column[:self.size][keep]
+        self.size = live
+        self.dead = 0
+
+    def rows(self):
+        return self.size - self.dead
+
+
+class BookAnalytics:
+    """
+    Instantánea columnar del catálogo y consultas vectorizadas sobre ella
+
+    Configuración:
+        BOOK_ANALYTICS: habilita la instantánea (True por defecto; requiere numpy)
+        BOOK_ANALYTICS_LOAD_BATCH: filas por consulta en la carga inicial
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.load_batch = DEFAULT_LOAD_BATCH
+        self.snapshot = None
+        self.cursor = 0
+        self.loaded_at = None
+        # _lock protege los arrays; _refresh_lock serializa las lecturas del feed de cambios
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+
+    @property
+    def available(self):
+        return np is not None
+
+    def init_app(self, app):
+        """Configura la analítica; la instantánea se carga en la primera consulta (refresh)"""
+        requested = bool(app.config.get('BOOK_ANALYTICS', True))
+        self.enabled = requested and self.available
+        self.load_batch = app.config.get('BOOK_ANALYTICS_LOAD_BATCH', DEFAULT_LOAD_BATCH)
+        self.snapshot = None
+        if requested and not self.enabled:
+            logger.info('Analítica de libros desactivada: requiere el paquete opcional numpy')
+
+    def load(self, book_repository):
+        """Carga completa por bloques; el cursor se toma antes para no perder cambios concurrentes"""
+        start = time.perf_counter()
+        cursor = book_repository.get_change_cursor()
+        snapshot = BookSnapshot()
+        for rows in book_repository.iter_analytics_rows(self.load_batch):
+            snapshot.append_rows(rows)
+        with self._lock:
+            self.snapshot = snapshot
+            self.cursor = cursor
+            self.loaded_at = datetime.utcnow()
+        logger.info(f'Instantánea de analítica cargada: {snapshot.rows()} libros en '
+                    f'{(time.perf_counter() - start) * 1000:.0f} ms')
+
+    def apply(self, book):
+        """Aplica un cambio ya confirmado por este worker (alta, modificación o baja)"""
+        if not self.enabled or book is None:
+            return
+        with self._lock:
+            if self.snapshot is None:
+                return
+            if book.deleted_at is not None:
+                self.snapshot.remove(book.id, book.change_seq)
+            else:
+                self.snapshot.upsert(book.id, book.published_year, book.pages, book.genre, book.language,
+                                     book.change_seq)
+
+    def refresh(self, book_repository, limit: int = DEFAULT_REFRESH_LIMIT):
+        """Pone la instantánea al día con el feed de cambios (o la recarga si faltan cambios purgados)"""
+        with self._refresh_lock:
+            if self.snapshot is None or self.cursor < book_repository.get_purged_seq():
+                self.load(book_repository)
+                return
+            while True:
+                changes = book_repository.get_analytics_changes(self.cursor, limit)
+                with self._lock:
+                    for book_id, published_year, pages, genre, language, deleted_at, change_seq in changes:
+                        if deleted_at is not None:
+                            self.snapshot.remove(book_id, change_seq)
+                        else:
+                            self.snapshot.upsert(book_id, published_year, pages, genre, language, change_seq)
+                        self.cursor = max(self.cursor, change_seq)
+                if len(changes) < limit:
+                    return
+
+    def query(self, filters: dict, group_by: str = None, histogram: str = None, bins: int = 20):
+        """
+        Filtros, agregados, agrupaciones e histogramas vectorizados
+
+        Args:
+            filters (dict): year_min, year_max, pages_min, pages_max (int) y genre, language (listas)
+            group_by (str): 'genre', 'language', 'decade' o 'published_year'
+            histogram (str): 'published_year' o 'pages'
+            bins (int): Intervalos del histograma
+
+        Returns:
+            dict: count, total_pages, avg_pages y, si se piden, groups e histogram
+        """
+        start = time.perf_counter()
+        with self._lock:
+            snapshot = self.snapshot
+            size = snapshot.size
+            years = snapshot.years[:size]
+            pages = snapshot.pages[:size]
+            mask = snapshot.alive[:size].copy()
+            for column, minimum, maximum in ((years, 'year_min', 'year_max'), (pages, 'pages_min', 'pages_max')):
+                if filters.get(minimum) is not None or filters.get(maximum) is not None:
+                    mask &= column != MISSING
+                if filters.get(minimum) is not None:
+                    mask &= column >= filters[minimum]
+                if filters.get(maximum) is not None:
+                    mask &= column <= filters[maximum]
+            for column, dictionary, name in ((snapshot.genres[:size], snapshot.genre_dictionary, 'genre'),
+                                             (snapshot.languages[:size], snapshot.language_dictionary, 'language')):
+                if filters.get(name):
+                    codes = [dictionary.lookup(value) for value in filters[name]]
+                    mask &= np.isin(column, [code for code in codes if code is not None])
+
+            selected_pages = pages[mask]
+            known_pages = np.where(selected_pages != MISSING, selected_pages, 0).astype(np.int64)
+            pages_count = int((selected_pages != MISSING).sum())
+            result = {
+                'count': int(mask.sum()),
+                'total_pages': int(known_pages.sum()),
+                'avg_pages': round(float(known_pages.sum()) / pages_count, 2) if pages_count else None
+            }
+            if group_by:
+                result['groups'] = self._group(snapshot, mask, known_pages, group_by)
+            if histogram:
+                values = (years if histogram == 'published_year' else pages)[mask]
+                values = values[values != MISSING]
+                counts, edges = np.histogram(values, bins=bins) if values.size else (np.zeros(0, dtype=np.int64), np.zeros(0))
+                result['histogram'] = {
+                    'field': histogram,
+                    'bins': [{'from': float(edges[i]), 'to': float(edges[i + 1]), 'count': int(counts[i])}
+                             for i in range(len(counts))]
+                }
+            result['snapshot'] = {
+                'rows': snapshot.rows(),
+                'cursor': self.cursor,
+                'loaded_at': self.loaded_at.isoformat() if self.loaded_at else None
+            }
+        result['elapsed_ms'] = round((time.perf_counter() - start) * 1000, 3)
+        return result
+
+    @staticmethod
+    def _group(snapshot, mask, known_pages, group_by: str):
+        """Conteo y páginas por grupo con bincount (mismo formato que /books/stats)"""
+        size = snapshot.size
+        if group_by in ('genre', 'language'):
+            dictionary = snapshot.genre_dictionary if group_by == 'genre' else snapshot.language_dictionary
+            codes = (snapshot.genres if group_by == 'genre' else snapshot.languages)[:size][mask]
+            keys = list(range(MISSING, len(dictionary.values)))
+            labels = [dictionary.decode(code) for code in keys]
+            index = codes + 1
+        else:
+            years = snapshot.years[:size][mask]
+            step = 10 if group_by == 'decade' else 1
+            known = years != MISSING
+            # bincount sobre el desplazamiento desde el primer año (sin ordenar); el índice 0 es "sin año"
+            base = int(years[known].min()) // step if known.any() else 0
+            index = np.where(known, years // step - base + 1, 0)
+            labels = [None] + [str((base + offset) * step) for offset in range(int(index.max(initial=0)))]
+        counts = np.bincount(index, minlength=len(labels))
+        pages = np.bincount(index, weights=known_pages, minlength=len(labels))
+        groups = [{'value': labels[i], 'count': int(counts[i]), 'pages': int(pages[i])}
+                  for i in range(len(labels)) if counts[i]]
+        return sorted(groups, key=lambda group: group['count'], reverse=True)
+
+
+book_analytics = BookAnalytics()
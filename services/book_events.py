@@ -0,0 +1,284 @@
+"""
+Difusión de eventos de cambios de libros (Server-Sent Events).
+BookService publica un evento tras cada alta, modificación o baja; el
+broker en proceso lo reparte a las suscripciones abiertas de este worker y
+un canal enchufable (local o Redis pub/sub) lo replica al resto de workers.
+El ID de cada evento es el change_seq del libro, por lo que un cliente que
+se reconecta con Last-Event-ID puede reanudar desde el búfer reciente o,
+si es más antiguo, desde el feed de cambios en base de datos.
+"""
+
+from cache.redis_client import RedisClient
+from itsdangerous import URLSafeTimedSerializer, BadSignature
+from collections import deque
+import threading
+import queue
+import json
+import uuid
+import logging
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUFFER_SIZE = 1000
+DEFAULT_SUBSCRIBER_QUEUE = 256
+# Segundos de validez de un ticket de conexión al stream (solo para abrirla, no para mantenerla)
+DEFAULT_TICKET_SECONDS = 30
+TICKET_SALT = 'book-events-ticket'
+
+
+class BookEvent:
+    """Evento de cambio de un libro"""
+
+    def __init__(self, event_id: int, event_type: str, data: dict, origin: str = None):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.origin = origin
+
+    def to_dict(self):
+        return {'id': self.id, 'type': self.type, 'data': self.data, 'origin': self.origin}
+
+    @staticmethod
+    def from_dict(payload: dict):
+        return BookEvent(payload['id'], payload['type'], payload['data'], payload.get('origin'))
+
+    def to_sse(self) -> str:
+        """Serializa el evento en formato text/event-stream"""
+        return f'id: {self.id}\nevent: {self.type}\ndata: {json.dumps(self.data, ensure_ascii=False)}\n\n'
+
+
+class LocalEventChannel:
+    """
+    Canal en proceso: entrega los eventos publicados directamente al broker.
+    Sirve para un único worker y como sustituto del canal compartido en pruebas.
+    """
+
+    def __init__(self):
+        self._callbacks = []
+
+    def start(self, callback):
+        self._callbacks.append(callback)
+
+    def publish(self, event: BookEvent):
+        for callback in self._callbacks:
+            callback(event)
+
+    def close(self):
+        self._callbacks = []
+
+
+class RedisEventChannel:
+    """
+    Canal entre workers basado en Redis pub/sub (cliente RESP propio, ver
+    cache/redis_client.py). Cada worker publica en el canal y un hilo de
+    escucha entrega al broker local los eventos de todos los workers
+    (incluidos los propios), reconectando si se pierde la conexión.
+    """
+
+    RECONNECT_DELAY = 1.0
+
+    def __init__(self, url: str, channel: str = 'books:events'):
+        self.client = RedisClient(url)
+        self.channel = channel
+        self._subscription = None
+        self._thread = None
+        self._stopped = threading.Event()
+
+    def start(self, callback):
+        self._thread = threading.Thread(target=self._listen, args=(callback,),
+                                        name='book-events-redis', daemon=True)
+        self._thread.start()
+
+    def _listen(self, callback):
+        while not self._stopped.is_set():
+            self._subscription = self.client.subscribe(self.channel)
+            try:
+                for _, data in self._subscription.messages():
+                    try:
+                        callback(BookEvent.from_dict(json.loads(data)))
+                    except Exception as e:
+                        logger.error(f'Evento de libro inválido en {self.channel}: {str(e)}')
+            except Exception as e:
+                if not self._stopped.is_set():
+                    logger.warning(f'Conexión pub/sub de eventos perdida: {str(e)}')
+            self._stopped.wait(self.RECONNECT_DELAY)
+
+    def publish(self, event: BookEvent):
+        self.client.publish(self.channel, json.dumps(event.to_dict()))
+
+    def close(self):
+        self._stopped.set()
+        if self._subscription is not None:
+            self._subscription.close()
+
+
+class Subscription:
+    """Cola acotada de eventos para una conexión SSE"""
+
+    def __init__(self, max_queue: int):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.overflowed = False
+
+    def push(self, event: BookEvent):
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            # Cliente demasiado lento: se cierra y reanudará con Last-Event-ID
+            self.overflowed = True
+
+    def get(self, timeout: float):
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBroker:
+    """
+    Broker en proceso: mantiene las suscripciones de este worker y un búfer
+    circular con los últimos eventos para reanudar conexiones.
+    """
+
+    def __init__(self, buffer_size: int = DEFAULT_BUFFER_SIZE, subscriber_queue: int = DEFAULT_SUBSCRIBER_QUEUE):
+        self.origin = uuid.uuid4().hex
+        self.subscriber_queue = subscriber_queue
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.channel = None
+        self.configure(LocalEventChannel())
+
+    def configure(self, channel, buffer_size: int = None, subscriber_queue: int = None):
+        """Sustituye el canal entre workers (y opcionalmente los límites de memoria)"""
+        if self.channel is not None:
+            self.channel.close()
+        if buffer_size:
+            self._buffer = deque(self._buffer, maxlen=buffer_size)
+        if subscriber_queue:
+            self.subscriber_queue = subscriber_queue
+        self.channel = channel
+        channel.start(self._dispatch)
+
+    def publish(self, event_id: int, event_type: str, data: dict):
+        """Publica un evento en el canal (no lanza excepciones al llamador)"""
+        try:
+            self.channel.publish(BookEvent(event_id, event_type, data, self.origin))
+        except Exception as e:
+            logger.error(f'Error al publicar evento de libro {event_type} {event_id}: {str(e)}')
+
+    def _dispatch(self, event: BookEvent):
+        with self._lock:
+            self._buffer.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.push(event)
+
+    def subscribe(self):
+        subscription = Subscription(self.subscriber_queue)
+        with self._lock:
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    @property
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def replay(self, last_event_id: int):
+        """
+        Eventos del búfer posteriores a last_event_id, solo si el búfer los
+        contiene todos sin huecos (los eventos de lote cubren first_seq..id)
+
+        Returns:
+            list | None: Eventos a reenviar, o None si hay que recurrir al feed en BD
+        """
+        with self._lock:
+            events = [event for event in self._buffer if event.id > last_event_id]
+        expected = last_event_id + 1
+        for event in events:
+            if event.data.get('first_seq', event.id) != expected:
+                return None
+            expected = event.id + 1
+        return events
+
+
+book_events = EventBroker()
+
+
+def evented_server():
+    """
+    True si el proceso corre con gevent (workers gevent de gunicorn, que
+    parchean la librería estándar): cada conexión SSE inactiva es una
+    corrutina y no ocupa un hilo del worker
+    """
+    try:
+        from gevent import monkey
+    except ImportError:  # pragma: no cover - gevent no instalado
+        return False
+    return monkey.is_module_patched('socket')
+
+
+def sse_enabled(config: dict):
+    """
+    BOOK_EVENTS_SSE: 'auto' (por defecto, solo con gevent), 'on' (también con
+    hilos, p. ej. el servidor de desarrollo) u 'off'
+    """
+    mode = str(config.get('BOOK_EVENTS_SSE', 'auto')).lower()
+    if mode == 'auto':
+        return evented_server()
+    return mode in ('on', 'true', '1', 'yes')
+
+
+def create_event_channel(config: dict):
+    """
+    Crea el canal entre workers según la configuración
+
+    BOOK_EVENTS_CHANNEL: 'local' (por defecto) o 'redis'
+    BOOK_EVENTS_REDIS_URL: URL de Redis para el canal 'redis'
+    """
+    kind = config.get('BOOK_EVENTS_CHANNEL', 'local')
+    if kind == 'redis':
+        return RedisEventChannel(config.get('BOOK_EVENTS_REDIS_URL', 'redis://localhost:6379/0'))
+    return LocalEventChannel()
+
+
+def event_channel_problem(config: dict, workers: int):
+    """
+    Comprueba al arrancar que los eventos llegan a todas las conexiones SSE:
+    con el canal 'local' cada worker solo ve sus propios cambios, así que con
+    SSE activo y varios workers los clientes perderían eventos sin saberlo
+
+    Returns:
+        str | None: Descripción del problema, o None si la configuración es válida
+    """
+    if workers > 1 and sse_enabled(config) and config.get('BOOK_EVENTS_CHANNEL', 'local') != 'redis':
+        return (f'El stream SSE está activo con {workers} workers y BOOK_EVENTS_CHANNEL=local: '
+                'cada worker solo recibiría sus propios eventos. Configura BOOK_EVENTS_CHANNEL=redis, '
+                'un solo worker o BOOK_EVENTS_SSE=off.')
+    return None
+
+
+def issue_stream_ticket(secret: str, identity: str, expires_at: int):
+    """
+    Ticket firmado para abrir el stream con ?ticket= (EventSource no admite
+    headers): caduca en segundos y, a diferencia del JWT, no sirve para nada
+    más si acaba en un log. expires_at (el exp del JWT) limita la conexión.
+    """
+    return URLSafeTimedSerializer(secret, salt=TICKET_SALT).dumps({'sub': identity, 'exp': expires_at})
+
+
+def read_stream_ticket(secret: str, ticket: str, max_age: int):
+    """
+    Valida un ticket de issue_stream_ticket
+
+    Returns:
+        tuple | None: (identidad, exp del JWT), o None si es inválido o ha caducado
+    """
+    try:
+        payload = URLSafeTimedSerializer(secret, salt=TICKET_SALT).loads(ticket, max_age=max_age)
+    except BadSignature:
+        return None
+    return payload['sub'], payload.get('exp')
@@ -0,0 +1,422 @@
+"""
+Servicio de importación masiva de libros.
+Procesa archivos CSV/JSONL de forma incremental (fila a fila, sin cargar
+el archivo completo en memoria), valida cada fila con las reglas de
+Book.validate_book_data, descarta duplicados por ISBN, marca o descarta
+los casi duplicados (índice MinHash de título y autor) y confirma los
+cambios en lotes de tamaño configurable.
+
+Los trabajos y su progreso viven en la tabla book_import_jobs: cada lote
+se confirma junto con los contadores del trabajo, así que si el proceso que
+lo ejecuta muere o se recicla, otro ejecutor lo reserva al caducar la
+concesión (BOOK_IMPORT_LEASE_SECONDS) y continúa tras el último lote
+confirmado. La concesión se renueva con cada lote y, entre lotes, cada
+tercio de su duración, así que un lote lento no la deja caducar. Los
+trabajos los ejecuta un hilo del worker que recibe la subida
+(BOOK_IMPORT_RUNNER='thread', que además recoge los abandonados) o un
+proceso dedicado (flask --app main import-worker, BOOK_IMPORT_RUNNER='worker').
+"""
+
+from repositories.book_repository import BookRepository
+from repositories.book_similarity_repository import book_signature, jaccard
+from services.book_events import book_events
+from services.book_service import (
+    book_cache, STATS_CACHE_KEY, DUPLICATES_OFF, DUPLICATES_REJECT, DEFAULT_DUPLICATE_THRESHOLD
+)
+from repositories.book_import_job_repository import ImportJobRepository
+from models.book_import_job_model import ImportJob, STATUS_COMPLETED, STATUS_FAILED
+from models.book_model import Book
+from sqlalchemy.orm import Session
+from datetime import datetime
+import threading
+import tempfile
+import codecs
+import time
+import csv
+import json
+import uuid
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Campos del modelo Book que se aceptan en una fila de importación
+IMPORT_FIELDS = ('title', 'author', 'published_year', 'editorial', 'genre', 'language', 'pages', 'isbn')
+INTEGER_FIELDS = ('published_year', 'pages')
+
+DEFAULT_BATCH_SIZE = 1000
+
+# Ejecutores: hilo en el worker que recibe la subida o proceso dedicado (import-worker)
+RUNNER_THREAD = 'thread'
+RUNNER_WORKER = 'worker'
+IMPORT_RUNNERS = (RUNNER_THREAD, RUNNER_WORKER)
+# Sin renovar la concesión en este tiempo el trabajo se considera abandonado y se puede reanudar
+DEFAULT_LEASE_SECONDS = 300
+# Espera de import-worker entre consultas cuando no hay trabajos
+DEFAULT_POLL_SECONDS = 5
+
+
+class LeaseLost(Exception):
+    """Otro ejecutor ha reservado el trabajo (la concesión caducó)"""
+
+
+def default_import_dir():
+    """Directorio de las subidas pendientes de importar (compartido por los workers del host)"""
+    return os.path.join(tempfile.gettempdir(), 'book-imports')
+
+
+def detect_format(filename: str = None, content_type: str = None, explicit: str = None):
+    """
+    Determina el formato del archivo ('csv' o 'jsonl')
+
+    Args:
+        filename (str): Nombre del archivo subido
+        content_type (str): Content-Type de la petición
+        explicit (str): Formato indicado explícitamente por el cliente
+
+    Returns:
+        str: 'csv', 'jsonl' o None si no se puede determinar
+    """
+    if explicit:
+        explicit = explicit.lower()
+        if explicit in ('csv', 'jsonl', 'ndjson'):
+            return 'jsonl' if explicit == 'ndjson' else explicit
+        return None
+    name = (filename or '').lower()
+    if name.endswith('.csv'):
+        return 'csv'
+    if name.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    ctype = (content_type or '').lower()
+    if 'csv' in ctype:
+        return 'csv'
+    if 'ndjson' in ctype or 'jsonl' in ctype or 'json-lines' in ctype:
+        return 'jsonl'
+    return None
+
+
+def coerce_row(row: dict):
+    """
+    Normaliza una fila de entrada antes de validarla: elimina columnas
+    desconocidas y valores vacíos, y convierte a entero los campos numéricos
+    que llegan como texto (CSV)
+    """
+    data = {}
+    for field in IMPORT_FIELDS:
+        value = row.get(field)
+        if isinstance(value, str):
+            value = value.strip()
+            if value == '':
+                continue
+            if field in INTEGER_FIELDS and value.lstrip('-').isdigit():
+                value = int(value)
+        if value is None:
+            continue
+        data[field] = value
+    return data
+
+
+class BookImportService:
+    """Servicio para importar libros desde archivos CSV/JSONL por lotes"""
+
+    def __init__(self, db_session: Session, lease_seconds: float = DEFAULT_LEASE_SECONDS):
+        self.db_session = db_session
+        self.book_repository = BookRepository(db_session)
+        self.job_repository = ImportJobRepository(db_session)
+        # Renovar con margen: tres intentos antes de que la concesión caduque
+        self.renew_interval = lease_seconds / 3
+        self._renewed_at = time.monotonic()
+        # Ejecutor que reservó el trabajo (fijado al empezar: job.owner se recarga tras cada commit)
+        self._owner = None
+
+    def iter_rows(self, binary_stream, file_format: str):
+        """
+        Itera las filas del archivo de forma incremental
+
+        Args:
+            binary_stream: Flujo binario del archivo
+            file_format (str): 'csv' o 'jsonl'
+
+        Yields:
+            tuple: (número de línea, dict con la fila o None, mensaje de error o None)
+        """
+        text_stream = codecs.getreader('utf-8-sig')(binary_stream, errors='replace')
+        if file_format == 'csv':
+            reader = csv.DictReader(text_stream)
+            for row in reader:
+                yield reader.line_num, row, None
+        else:
+            for line_number, line in enumerate(text_stream, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    yield line_number, None, f'JSON inválido: {e}'
+                    continue
+                if not isinstance(row, dict):
+                    yield line_number, None, 'Cada línea debe ser un objeto JSON'
+                    continue
+                yield line_number, row, None
+
+    def run(self, job: ImportJob, binary_stream, progress=None):
+        """
+        Ejecuta un trabajo ya reservado, confirmando cada lote en su propia
+        transacción junto con el progreso del trabajo. Si el trabajo ya tiene
+        filas procesadas (reanudación) se saltan sin volver a aplicarlas
+
+        Args:
+            job (ImportJob): Trabajo reservado donde se reporta el progreso
+            binary_stream: Flujo binario del archivo
+            progress (callable): Función opcional llamada tras cada lote con el trabajo
+
+        Returns:
+            ImportJob: Trabajo con el resultado final
+        """
+        resume_after = job.processed
+        if resume_after:
+            logger.info(f'Reanudando importación {job.id} tras {resume_after} filas confirmadas')
+        else:
+            logger.info(f'Iniciando importación {job.id} ({job.format}, lotes de {job.batch_size})')
+        batch = []
+        position = 0
+        self._owner = job.owner
+        self._renewed_at = time.monotonic()
+        try:
+            for line_number, row, error in self.iter_rows(binary_stream, job.format):
+                # Saltar filas de un archivo grande o validar lotes enormes puede durar más que la concesión
+                if time.monotonic() - self._renewed_at >= self.renew_interval:
+                    self._heartbeat(job)
+                position += 1
+                if position <= resume_after:
+                    continue
+                job.processed += 1
+                if error is None:
+                    data = coerce_row(row)
+                    error = Book.validate_book_data(data)
+                if error:
+                    job.add_error(line_number, error)
+                else:
+                    batch.append((line_number, data))
+                if len(batch) >= job.batch_size:
+                    self._flush_batch(job, batch)
+                    batch = []
+                    if progress:
+                        progress(job)
+            self._flush_batch(job, batch)
+            job.status = STATUS_COMPLETED
+            job.finished_at = datetime.utcnow()
+            self._commit_progress(job)
+            if progress:
+                progress(job)
+            logger.info(f'Importación {job.id} completada: {job.imported} importados, '
+                        f'{job.duplicates} duplicados, {job.invalid} inválidos')
+        except LeaseLost:
+            self.db_session.rollback()
+            logger.warning(f'Importación {job.id}: otro ejecutor ha reservado el trabajo, se abandona')
+        except Exception as e:
+            self.db_session.rollback()
+            logger.error(f'Error en importación {job.id}: {str(e)}')
+            self.fail(job, str(e))
+        return job
+
+    def fail(self, job: ImportJob, message: str):
+        """Marca el trabajo como fallido conservando el progreso confirmado"""
+        try:
+            job.status = STATUS_FAILED
+            job.errors = list(job.errors) + [{'line': None, 'error': message}]
+            job.finished_at = datetime.utcnow()
+            self._commit_progress(job)
+        except LeaseLost:
+            self.db_session.rollback()
+        except Exception as e:
+            # Sin BD no se puede marcar: la concesión caducará y otro ejecutor lo reintentará
+            self.db_session.rollback()
+            logger.error(f'No se pudo marcar como fallida la importación {job.id}: {str(e)}')
+
+    def _commit_progress(self, job: ImportJob):
+        """Renueva la concesión y confirma el lote en curso junto con el progreso del trabajo"""
+        if not self.job_repository.renew(job, self._owner or job.owner):
+            raise LeaseLost(job.id)
+        self.db_session.commit()
+        self._renewed_at = time.monotonic()
+
+    def _heartbeat(self, job: ImportJob):
+        """Renueva la concesión entre lotes sin confirmar el progreso parcial"""
+        if not self.job_repository.heartbeat(job, self._owner or job.owner):
+            raise LeaseLost(job.id)
+        self._renewed_at = time.monotonic()
+
+    def _flush_batch(self, job: ImportJob, batch: list):
+        """
+        Deduplica por ISBN normalizado (dentro del lote y contra la BD), revisa los
+        casi duplicados e inserta el lote (lista de (línea, fila))
+        """
+        if not batch:
+            return
+        isbns = {Book.normalize_isbn(row.get('isbn')) for _, row in batch} - {None}
+        seen = self.book_repository.get_existing_isbns(isbns)
+        unique = []
+        for line_number, row in batch:
+            isbn = Book.normalize_isbn(row.get('isbn'))
+            if isbn:
+                if isbn in seen:
+                    job.duplicates += 1
+                    continue
+                seen.add(isbn)
+            unique.append((line_number, row))
+        if job.duplicate_mode != DUPLICATES_OFF:
+            unique = self._check_near_duplicates(job, unique)
+        rows = [row for _, row in unique]
+        seqs = self.book_repository.bulk_create_books(rows, commit=False)
+        job.imported += len(seqs)
+        job.batches += 1
+        # Los libros del lote y los contadores del trabajo se confirman juntos: al reanudar
+        # se continúa exactamente tras la última fila de este lote
+        self._commit_progress(job)
+        if seqs:
+            book_cache.invalidate(STATS_CACHE_KEY)
+            book_events.publish(seqs[-1], 'import', {
+                'first_seq': seqs[0], 'change_seq': seqs[-1], 'count': len(seqs)
+            })
+
+    def _check_near_duplicates(self, job: ImportJob, batch: list):
+        """
+        Busca los casi duplicados del lote con una consulta al índice para todas las
+        filas, más los de filas anteriores del mismo lote (aún no indexadas). Con
+        duplicate_mode 'reject' se descartan; con 'flag' se importan y se informan
+        """
+        signatures = [book_signature(row.get('title'), row.get('author')) for _, row in batch]
+        found = self.book_repository.similarity_repository.find_similar_signatures(signatures, job.duplicate_threshold)
+        kept, kept_buckets = [], {}
+        for index, ((line_number, row), (grams, buckets), matches) in enumerate(zip(batch, signatures, found)):
+            matches = [{'id': book_id, 'similarity': similarity} for book_id, _, _, similarity in matches]
+            earlier = {position for pair in buckets for position in kept_buckets.get(pair, ())}
+            for position in sorted(earlier):
+                similarity = jaccard(grams, signatures[position][0])
+                if similarity >= job.duplicate_threshold:
+                    matches.append({'line': batch[position][0], 'similarity': round(similarity, 3)})
+            if matches:
+                job.add_near_duplicate(line_number, matches)
+                if job.duplicate_mode == DUPLICATES_REJECT:
+                    continue
+            kept.append((line_number, row))
+            for pair in buckets:
+                kept_buckets.setdefault(pair, []).append(index)
+        return kept
+
+
+def import_lease_seconds(config):
+    return float(config.get('BOOK_IMPORT_LEASE_SECONDS', DEFAULT_LEASE_SECONDS))
+
+
+def execute_import_job(db_session: Session, job: ImportJob, import_dir: str, progress=None,
+                       lease_seconds: float = DEFAULT_LEASE_SECONDS):
+    """
+    Importa el archivo de un trabajo ya reservado y, al terminar, borra la
+    subida si está en import_dir (los archivos de import-books no se tocan)
+    """
+    service = BookImportService(db_session, lease_seconds)
+    try:
+        with open(job.path, 'rb') as stream:
+            service.run(job, stream, progress)
+    except OSError as e:
+        logger.error(f'No se pudo leer el archivo de la importación {job.id}: {str(e)}')
+        service.fail(job, str(e))
+    if job.finished and os.path.dirname(os.path.abspath(job.path)) == os.path.abspath(import_dir):
+        try:
+            os.unlink(job.path)
+        except OSError:
+            pass
+    return job
+
+
+def run_import_job(app, job_id: str):
+    """
+    Reserva y ejecuta un trabajo con su propio contexto de aplicación
+
+    Returns:
+        bool: False si el trabajo no estaba disponible (terminado o reservado por otro ejecutor)
+    """
+    from models.db import db
+    with app.app_context():
+        try:
+            lease_seconds = import_lease_seconds(app.config)
+            job = ImportJobRepository(db.session).claim(job_id, uuid.uuid4().hex, lease_seconds)
+            if job is None:
+                return False
+            execute_import_job(db.session, job, app.config['BOOK_IMPORT_DIR'], lease_seconds=lease_seconds)
+            return True
+        finally:
+            db.session.remove()
+
+
+def _run_and_drain(app, job_id: str):
+    run_import_job(app, job_id)
+    # Recoger también los trabajos pendientes o abandonados (concesión caducada) por otros ejecutores
+    run_import_worker(app, once=True)
+
+
+def start_import_job(app, job_id: str):
+    """
+    Lanza un trabajo en un hilo de fondo del worker actual; al terminarlo, el
+    hilo ejecuta los demás trabajos disponibles. Si el worker se recicla
+    antes de terminar, el trabajo queda con la concesión caducada y lo
+    reanuda el barrido de otro worker (start_import_sweeper) o import-worker
+
+    Args:
+        app: Aplicación Flask
+        job_id (str): ID del trabajo ya guardado
+    """
+    thread = threading.Thread(target=_run_and_drain, args=(app, job_id),
+                              name=f'book-import-{job_id[:8]}', daemon=True)
+    thread.start()
+    return thread
+
+
+def start_import_sweeper(app):
+    """
+    Con BOOK_IMPORT_RUNNER='thread', hilo de cada worker que reserva los
+    trabajos abandonados cada media concesión (la consulta usa el índice
+    de estado y heartbeat_at). Sustituye al proceso import-worker.
+    """
+    poll_seconds = import_lease_seconds(app.config) / 2
+    thread = threading.Thread(target=run_import_worker, args=(app,), kwargs={'poll_seconds': poll_seconds},
+                              name='book-import-sweeper', daemon=True)
+    thread.start()
+    return thread
+
+
+def run_import_worker(app, once: bool = False, poll_seconds: float = DEFAULT_POLL_SECONDS, should_stop=None):
+    """
+    Bucle de un proceso dedicado: reserva el trabajo disponible más antiguo
+    (pendiente o abandonado por otro ejecutor) y lo ejecuta
+
+    Args:
+        app: Aplicación Flask
+        once (bool): Terminar cuando no queden trabajos disponibles
+        poll_seconds (float): Espera entre consultas cuando no hay trabajos
+        should_stop (callable): Función opcional que detiene el bucle entre trabajos
+
+    Returns:
+        int: Trabajos ejecutados
+    """
+    from models.db import db
+    executed = 0
+    owner = uuid.uuid4().hex
+    while not (should_stop and should_stop()):
+        with app.app_context():
+            try:
+                lease_seconds = import_lease_seconds(app.config)
+                job = ImportJobRepository(db.session).claim_next(owner, lease_seconds)
+                if job is not None:
+                    execute_import_job(db.session, job, app.config['BOOK_IMPORT_DIR'], lease_seconds=lease_seconds)
+                    executed += 1
+                    continue
+            finally:
+                db.session.remove()
+        if once:
+            break
+        time.sleep(poll_seconds)
+    return executed
@@ -1,29 +1,269 @@
 from repositories.book_repository import BookRepository
+from repositories.book_group_commit import book_group_committer
+from repositories.book_stats_repository import BookStatsRepository
 from models.book_model import Book
+from models.book_stats_model import DIMENSION_TOTAL
+from models.change_sequence_model import BOOKS_SEQUENCE
+from services.book_events import book_events
+from services.book_analytics import book_analytics
+from cache.shared import shared_cache
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError
+
+# Libros por ID y resumen de estadísticas en la caché compartida entre workers
+book_cache = shared_cache.namespace('books')
+STATS_CACHE_KEY = 'stats'
+
+# Resultados de cada operación de un lote (execute_batch)
+BATCH_OK = 'ok'
+BATCH_CREATED = 'created'
+BATCH_NOT_FOUND = 'not_found'
+BATCH_CONFLICT = 'conflict'
+BATCH_ROLLED_BACK = 'rolled_back'
+BATCH_OPERATIONS = ('create', 'update', 'delete', 'get')
+
+# Tratamiento de los casi duplicados (mismo título y autor salvo pequeñas diferencias) al crear libros
+DUPLICATES_OFF = 'off'
+DUPLICATES_FLAG = 'flag'
+DUPLICATES_REJECT = 'reject'
+DUPLICATE_MODES = (DUPLICATES_OFF, DUPLICATES_FLAG, DUPLICATES_REJECT)
+# Similitud de Jaccard (trigramas de título y autor) a partir de la que dos libros son casi duplicados
+DEFAULT_DUPLICATE_THRESHOLD = 0.7
 
 class BookService:
 
     # Servicio para manejar la lógica de negocio relacionada con los libros
     def __init__(self, db_session: Session):
-        self.book_repository = BookRepository(db_session)
+        group_committer = book_group_committer if book_group_committer.enabled else None
+        self.book_repository = BookRepository(db_session, group_committer)
+        self.stats_repository = BookStatsRepository(db_session)
 
     # Obtener todos los libros
     def get_all_books(self):
         return self.book_repository.get_all_books()
     
-    # Obtener un libro por su ID
+    # Obtener una página de libros (paginación por cursor)
+    def get_books_page(self, limit: int, after_id: int = None):
+        return self.book_repository.get_books_page(limit, after_id)
+
+    # Recorrer todos los libros por bloques (para exportaciones en streaming)
+    def iter_books(self, batch_size: int = 1000):
+        return self.book_repository.iter_books(batch_size)
+
+    # Obtener el número total de libros: contador mantenido o COUNT(*) exacto
+    def count_books(self, exact: bool = False):
+        if exact:
+            return self.book_repository.count_books()
+        return self.stats_repository.get_total()
+
+    # Cursor actual del feed de cambios
+    def get_change_cursor(self):
+        return self.book_repository.get_change_cursor()
+
+    # Obtener los cambios posteriores a un cursor; reset=True si el cursor es anterior a la última purga de lápidas
+    def get_changes(self, since: int, limit: int):
+        if since < self.book_repository.get_purged_seq():
+            return [], True
+        return self.book_repository.get_changes(since, limit), False
+
+    # Purgar las lápidas de libros eliminados antes de una fecha
+    def purge_tombstones(self, older_than):
+        return self.book_repository.purge_tombstones(older_than)
+
+    # Obtener un libro por su ID (desde la caché compartida si está)
     def get_book_by_id(self, book_id: int):
-        return self.book_repository.get_book_by_id(book_id)
+        def load_book():
+            book = self.book_repository.get_book_by_id(book_id)
+            return book.to_cache_dict() if book else None
+
+        data = book_cache.get_or_load(book_id, load_book)
+        return Book.from_cache_dict(data) if data else None
+
+    # Obtener un libro por ISBN (ya normalizado)
+    def get_book_by_isbn(self, isbn_normalized: str):
+        return self.book_repository.get_book_by_isbn(isbn_normalized)
+
+    # Resolver varios ISBN con una sola consulta: {isbn recibido: libro o None} y lista de ISBN inválidos
+    def lookup_isbns(self, isbns: list):
+        normalized = {isbn: Book.normalize_isbn(isbn) for isbn in isbns}
+        books = {book.isbn_normalized: book for book in self.book_repository.get_books_by_isbns(
+            {value for value in normalized.values() if value}
+        )}
+        results = {isbn: books.get(value) for isbn, value in normalized.items() if value}
+        invalid = [isbn for isbn, value in normalized.items() if value is None]
+        return results, invalid
 
-    # Crear un nuevo libro
-    def create_book(self, book_data: dict):
-        return self.book_repository.create_book(book_data)
+    # Crear un nuevo libro (dict con error si el ISBN ya existe)
+    # Con duplicate_mode 'reject' devuelve un dict con error si hay casi duplicados; con 'flag'
+    # los deja en book.possible_duplicates
+    def create_book(self, book_data: dict, duplicate_mode: str = DUPLICATES_OFF,
+                    threshold: float = DEFAULT_DUPLICATE_THRESHOLD):
+        duplicates = []
+        if duplicate_mode != DUPLICATES_OFF:
+            duplicates = self.find_near_duplicates(book_data.get('title'), book_data.get('author'), threshold)
+            if duplicates and duplicate_mode == DUPLICATES_REJECT:
+                return {'error': 'Posible duplicado', 'duplicates': duplicates}
+        try:
+            book = self.book_repository.create_book(book_data)
+        except IntegrityError:
+            return {'error': 'ISBN duplicado', 'isbn': book_data.get('isbn')}
+        book_cache.invalidate(STATS_CACHE_KEY)
+        self._publish_change(book)
+        book.possible_duplicates = duplicates
+        return book
+
+    # Buscar libros casi duplicados de un título y autor en el índice MinHash (de más a menos parecido)
+    def find_near_duplicates(self, title: str, author: str, threshold: float = DEFAULT_DUPLICATE_THRESHOLD,
+                             exclude_id: int = None):
+        matches = self.book_repository.similarity_repository.find_similar(title, author, threshold, exclude_id)
+        return [
+            {'id': book_id, 'title': match_title, 'author': match_author, 'similarity': similarity}
+            for book_id, match_title, match_author, similarity in matches
+        ]
+
+    # Obtener los libros parecidos a uno dado (None si no existe)
+    def get_similar_books(self, book_id: int, min_similarity: float, limit: int):
+        book = self.get_book_by_id(book_id)
+        if book is None:
+            return None
+        return self.find_near_duplicates(book.title, book.author, min_similarity, exclude_id=book_id)[:limit]
     
-    # Actualizar un libro existente
+    # Actualizar un libro existente (dict con error si el nuevo ISBN ya existe)
     def update_book(self, book_id: int, book_data: dict):
-        return self.book_repository.update_book(book_id, book_data)
+        try:
+            book = self.book_repository.update_book(book_id, book_data)
+        except IntegrityError:
+            return {'error': 'ISBN duplicado', 'isbn': book_data.get('isbn')}
+        self._invalidate(book_id)
+        self._publish_change(book)
+        return book
     
     # Eliminar un libro
     def delete_book(self, book_id: int):
-        return self.book_repository.delete_book(book_id)
\ No newline at end of file
+        book = self.book_repository.delete_book(book_id)
+        self._invalidate(book_id)
+        self._publish_change(book)
+        return book
+
+    # Ejecutar una lista ordenada de operaciones ({'op', 'id', 'data'}) con un único COMMIT
+    # Sin atomic, cada escritura va en su propio savepoint y un error solo afecta a su operación;
+    # con atomic, la primera operación fallida revierte el lote y las demás quedan como rolled_back
+    # Devuelve ([(resultado, libro o dict de error)] en el orden recibido, si se confirmó el lote)
+    # Las altas aplican duplicate_mode como create_book
+    def execute_batch(self, operations: list, atomic: bool = False, duplicate_mode: str = DUPLICATES_OFF,
+                      threshold: float = DEFAULT_DUPLICATE_THRESHOLD):
+        session = self.book_repository.db_session
+        sequences = self.book_repository.sequence_repository
+        stats = self.book_repository.stats_repository
+        results, changed = [], []
+        # Como en el group commit: una sola reserva de la secuencia y un solo UPSERT de estadísticas
+        writes = sum(1 for operation in operations if operation['op'] != 'get')
+        if writes:
+            sequences.reserve(BOOKS_SEQUENCE, writes)
+        stats.defer()
+        try:
+            for operation in operations:
+                savepoint = session.begin_nested() if not atomic and operation['op'] != 'get' else None
+                # Los deltas diferidos no están en la BD: se revierten con el savepoint
+                checkpoint = stats.checkpoint() if savepoint is not None else None
+                try:
+                    # Tras una escritura del lote, las lecturas van a la BD (la caché no ve la transacción)
+                    outcome, value = self._execute_operation(operation, bool(changed), duplicate_mode, threshold)
+                except IntegrityError:
+                    if savepoint is not None:
+                        savepoint.rollback()
+                        stats.restore(checkpoint)
+                    outcome, value = BATCH_CONFLICT, {'error': 'ISBN duplicado', 'isbn': operation['data'].get('isbn')}
+                else:
+                    if savepoint is not None:
+                        savepoint.commit()
+                results.append((outcome, value))
+                if outcome not in (BATCH_OK, BATCH_CREATED):
+                    if atomic:
+                        session.rollback()
+                        results[:-1] = [(BATCH_ROLLED_BACK, None)] * (len(results) - 1)
+                        results += [(BATCH_ROLLED_BACK, None)] * (len(operations) - len(results))
+                        return results, False
+                elif operation['op'] != 'get':
+                    changed.append(value)
+            stats.flush()
+            session.commit()
+        except Exception:
+            session.rollback()
+            raise
+        finally:
+            sequences.release(BOOKS_SEQUENCE)
+
+        # Efectos posteriores al COMMIT, como en las escrituras individuales
+        for book in changed:
+            book_cache.invalidate(book.id)
+            self._publish_change(book)
+        if changed:
+            book_cache.invalidate(STATS_CACHE_KEY)
+        return results, True
+
+    def _execute_operation(self, operation: dict, read_own_writes: bool, duplicate_mode: str, threshold: float):
+        op, book_id, data = operation['op'], operation.get('id'), operation.get('data')
+        if op == 'create':
+            # La búsqueda ve también las altas anteriores del lote (misma transacción)
+            duplicates = []
+            if duplicate_mode != DUPLICATES_OFF:
+                duplicates = self.find_near_duplicates(data.get('title'), data.get('author'), threshold)
+                if duplicates and duplicate_mode == DUPLICATES_REJECT:
+                    return BATCH_CONFLICT, {'error': 'Posible duplicado', 'duplicates': duplicates}
+            book = self.book_repository.create_book(data, commit=False)
+            book.possible_duplicates = duplicates
+            return BATCH_CREATED, book
+        if op == 'update':
+            book = self.book_repository.update_book(book_id, data, commit=False)
+        elif op == 'delete':
+            book = self.book_repository.delete_book(book_id, commit=False)
+        elif read_own_writes:
+            book = self.book_repository.get_book_by_id(book_id)
+            if book is not None:
+                # Fuera del mapa de identidad: los UPDATE posteriores del lote no lo sincronizan
+                self.book_repository.db_session.expunge(book)
+        else:
+            book = self.get_book_by_id(book_id)
+        if book is None:
+            return BATCH_NOT_FOUND, {'error': 'Libro no encontrado', 'id': book_id}
+        return BATCH_OK, book
+
+    # Invalidar (en todos los workers) la copia cacheada de un libro y las estadísticas
+    def _invalidate(self, book_id: int):
+        book_cache.invalidate(book_id)
+        book_cache.invalidate(STATS_CACHE_KEY)
+
+    # Notificar el cambio (ya confirmado) a las conexiones SSE abiertas y a la instantánea de analítica
+    def _publish_change(self, book):
+        if book is not None:
+            book_analytics.apply(book)
+            change = book.to_change_dict()
+            book_events.publish(change['change_seq'], change['op'], change)
+
+    # Obtener las estadísticas del catálogo desde la caché o la tabla de resumen
+    def get_stats(self):
+        return book_cache.get_or_load(STATS_CACHE_KEY, self._load_stats)
+
+    def _load_stats(self):
+        stats = {'total_books': 0, 'total_pages': 0, 'by_genre': [], 'by_language': [], 'by_decade': []}
+        for stat in self.stats_repository.get_stats():
+            if stat.dimension == DIMENSION_TOTAL:
+                stats['total_books'] = stat.book_count
+                stats['total_pages'] = stat.total_pages
+            else:
+                stats[f'by_{stat.dimension}'].append(stat.to_dict())
+        return stats
+
+    # Consultar la instantánea columnar de analítica, al día con el feed de cambios (None si está desactivada)
+    def get_analytics(self, filters: dict, group_by: str = None, histogram: str = None, bins: int = 20):
+        if not book_analytics.enabled:
+            return None
+        book_analytics.refresh(self.book_repository)
+        return book_analytics.query(filters, group_by, histogram, bins)
+
+    # Reconstruir la tabla de resumen de estadísticas desde la tabla books
+    def rebuild_stats(self):
+        result = self.stats_repository.rebuild()
+        book_cache.invalidate(STATS_CACHE_KEY)
+        return result
@@ -0,0 +1,40 @@
+"""
+Caché de perfiles de usuario sobre la caché compartida.
+Guarda el perfil público (id, username, email) de los usuarios consultados
+recientemente y registra cuándo se modificó o eliminó cada usuario, para
+saber si los claims de un JWT emitido antes de ese momento siguen siendo
+válidos. Con un backend compartido (file o redis) la invalidación hecha en
+un worker se ve en todos.
+"""
+
+from cache.shared import shared_cache
+import time
+
+PROFILE_TTL = 300
+# Las marcas de invalidación deben durar más que cualquier token emitido antes
+INVALIDATION_TTL = 24 * 3600
+
+
+class UserProfileCache:
+    """Perfiles de usuario e invalidaciones recientes"""
+
+    def __init__(self, cache=shared_cache):
+        self.cache = cache
+        self.profiles = cache.namespace('users:profile', PROFILE_TTL)
+
+    def get_or_load(self, user_id: int, loader):
+        """Perfil cacheado o el devuelto por loader() (que se cachea si no es None)"""
+        return self.profiles.get_or_load(user_id, loader)
+
+    def invalidate(self, user_id: int):
+        """Invalida el perfil y marca como obsoletos los claims emitidos hasta ahora"""
+        self.cache.set(f'users:invalidated:{user_id}', time.time(), INVALIDATION_TTL)
+        self.profiles.invalidate(user_id)
+
+    def claims_valid(self, user_id: int, issued_at) -> bool:
+        """Indica si un token emitido en `issued_at` es posterior a la última invalidación del usuario"""
+        invalidated_at = self.cache.get(f'users:invalidated:{user_id}')
+        return invalidated_at is None or (issued_at is not None and issued_at >= invalidated_at)
+
+
+user_profile_cache = UserProfileCache()
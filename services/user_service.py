@@ -5,6 +5,7 @@ registro, autenticación y hash de contraseñas.
 """
 
 from repositories.user_repository import UserRepository
+from services.user_cache import user_profile_cache
 from werkzeug.security import generate_password_hash, check_password_hash
 from sqlalchemy.orm import Session
 import logging
@@ -92,6 +93,30 @@ class UserService:
         logger.info(f'Obteniendo usuario por ID en servicio: {user_id}')
         return self.user_repository.get_by_id(user_id)
 
+    def get_profile(self, user_id: int, claims: dict = None):
+        """
+        Obtiene el perfil público de un usuario sin consultar la base de datos
+        cuando es posible: primero la caché compartida, después los claims del
+        JWT (si el token es posterior a la última modificación del usuario) y,
+        como último recurso, la base de datos
+        
+        Args:
+            user_id (int): ID del usuario
+            claims (dict): Claims del JWT del usuario autenticado (opcional)
+            
+        Returns:
+            dict: Perfil del usuario (id, username, email) o None si no existe
+        """
+        def load_profile():
+            if claims and claims.get('username') and claims.get('email') \
+                    and user_profile_cache.claims_valid(user_id, claims.get('iat')):
+                return {'id': user_id, 'username': claims['username'], 'email': claims['email']}
+            logger.info(f'Perfil de usuario {user_id} no cacheado, consultando base de datos')
+            user = self.user_repository.get_by_id(user_id)
+            return user.to_dict() if user else None
+
+        return user_profile_cache.get_or_load(user_id, load_profile)
+
     def get_user_by_username(self, username: str):
         """
         Obtiene un usuario por su nombre de usuario
@@ -117,6 +142,48 @@ class UserService:
         logger.info(f'{len(users)} usuarios obtenidos en servicio')
         return users
 
+    def get_users_page(self, limit: int, after_id: int = None):
+        """
+        Obtiene una página de usuarios ordenada por ID
+        
+        Args:
+            limit (int): Tamaño de la página
+            after_id (int): Cursor (ID del último usuario de la página anterior)
+            
+        Returns:
+            List[User]: Usuarios de la página
+        """
+        logger.debug(f'Obteniendo página de usuarios en servicio (after={after_id}, limit={limit})')
+        return self.user_repository.get_page(limit, after_id)
+
+    def count_users(self, prefix: str = None):
+        """
+        Cuenta los usuarios, o los que coinciden con un prefijo de búsqueda
+        
+        Args:
+            prefix (str): Prefijo de username o email (opcional)
+            
+        Returns:
+            int: Número de usuarios
+        """
+        if prefix:
+            return self.user_repository.count_by_prefix(prefix)
+        return self.user_repository.count()
+
+    def search_users(self, prefix: str, limit: int):
+        """
+        Busca usuarios por prefijo de username o email (autocompletado)
+        
+        Args:
+            prefix (str): Prefijo a buscar
+            limit (int): Máximo de resultados
+            
+        Returns:
+            List[User]: Usuarios encontrados, ordenados por username
+        """
+        logger.debug(f'Buscando usuarios por prefijo en servicio: {prefix}')
+        return self.user_repository.search_by_prefix(prefix, limit)
+
     def update_user(self, user_id: int, user_data: dict):
         """
         Actualiza un usuario existente
@@ -135,7 +202,9 @@ class UserService:
             user_data['password'] = generate_password_hash(user_data['password'])
             logger.info(f'Contraseña hasheada para actualización de usuario: {user_id}')
         
-        return self.user_repository.update_user(user_id, user_data)
+        user = self.user_repository.update_user(user_id, user_data)
+        user_profile_cache.invalidate(user_id)
+        return user
 
     def delete_user(self, user_id: int):
         """
@@ -148,4 +217,6 @@ class UserService:
             User: Usuario eliminado o None si no existía
         """
         logger.info(f'Eliminando usuario en servicio: {user_id}')
-        return self.user_repository.delete_user(user_id)
\ No newline at end of file
+        user = self.user_repository.delete_user(user_id)
+        user_profile_cache.invalidate(user_id)
+        return user
\ No newline at end of file
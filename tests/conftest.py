@@ -0,0 +1,70 @@
+"""
+Fixtures comunes: cada test crea la aplicación con main.create_app sobre
+una base de datos SQLite propia (en tmp_path), caché en memoria y, salvo
+que el test los active, sin limitación de peticiones ni descarte de carga.
+"""
+
+import pytest
+
+from main import create_app
+from models.db import db
+from services.book_events import book_events
+
+
+BASE_CONFIG = {
+    'TESTING': True,
+    'CACHE_BACKEND': 'memory',
+    'RATELIMIT_ENABLED': False,
+    'LOADSHED_ENABLED': False,
+    'BOOK_IMPORT_RUNNER': 'worker',
+    'BOOK_ANALYTICS': False,
+    'JWT_SECRET_KEY': 'clave-de-pruebas-suficientemente-larga-para-hs256',
+}
+
+
+@pytest.fixture
+def make_app(tmp_path):
+    """Factoría: make_app(**config) crea una aplicación con su propia base de datos"""
+    apps = []
+
+    def factory(**config):
+        settings = dict(BASE_CONFIG)
+        settings['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{tmp_path / f'test-{len(apps)}.db'}"
+        settings['BOOK_IMPORT_DIR'] = str(tmp_path / 'imports')
+        settings.update(config)
+        # El búfer de eventos es del proceso: no mezclar los change_seq de bases de datos distintas
+        book_events._buffer.clear()
+        app = create_app(settings)
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        with app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+
+
+@pytest.fixture
+def app(make_app):
+    return make_app()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def register_and_login(client, username='tester', password='secret1', **environ):
+    """Registra un usuario y devuelve las cabeceras con su token"""
+    environ_base = environ or {}
+    client.post('/auth/register', json={'username': username, 'email': f'{username}@example.com',
+                                        'password': password}, environ_base=environ_base)
+    response = client.post('/auth/login', json={'login': username, 'password': password},
+                           environ_base=environ_base)
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+
+@pytest.fixture
+def auth_headers(client):
+    return register_and_login(client)
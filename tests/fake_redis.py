@@ -0,0 +1,136 @@
+"""
+Servidor RESP2 mínimo en un hilo para probar cache/redis_client.py sin
+Redis: guarda claves en memoria, exige AUTH si se le da contraseña, anota
+los comandos de cada conexión y reparte PUBLISH a las conexiones suscritas.
+"""
+
+import hashlib
+import socketserver
+import threading
+
+from cache.redis_client import read_reply
+
+
+class FakeRedisServer:
+    """Uso: with FakeRedisServer(password='secreto') as server: RedisClient(server.url(...))"""
+
+    def __init__(self, password: str = None):
+        self.password = password
+        self.data = {}
+        self.ttls = {}
+        self.scripts = set()
+        self.commands = []
+        self.subscribers = {}
+        self.lock = threading.Lock()
+        fake = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                session = {'authenticated': fake.password is None, 'db': 0}
+                while True:
+                    try:
+                        args = read_reply(self.rfile)
+                    except ConnectionError:
+                        break
+                    command = [arg.decode('utf-8') for arg in args]
+                    with fake.lock:
+                        fake.commands.append(command)
+                    reply = fake.dispatch(self, session, command)
+                    if reply is not None:
+                        self.wfile.write(reply)
+                        self.wfile.flush()
+                with fake.lock:
+                    for subscribers in fake.subscribers.values():
+                        subscribers.discard(self)
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.port = self._server.server_address[1]
+
+    def url(self, db: int = 0, password: str = None):
+        auth = f':{password}@' if password else ''
+        return f'redis://{auth}127.0.0.1:{self.port}/{db}'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def names(self):
+        """Nombres de los comandos recibidos, en orden"""
+        with self.lock:
+            return [command[0].upper() for command in self.commands]
+
+    def dispatch(self, handler, session, command):
+        name, args = command[0].upper(), command[1:]
+        if name == 'AUTH':
+            if args[-1] != self.password:
+                return b'-WRONGPASS invalid username-password pair\r\n'
+            session['authenticated'] = True
+            return b'+OK\r\n'
+        if not session['authenticated']:
+            return b'-NOAUTH Authentication required.\r\n'
+        if name == 'SELECT':
+            session['db'] = int(args[0])
+            return b'+OK\r\n'
+        if name == 'PING':
+            return b'+PONG\r\n'
+        if name == 'SUBSCRIBE':
+            replies = []
+            with self.lock:
+                for index, channel in enumerate(args, 1):
+                    self.subscribers.setdefault(channel, set()).add(handler)
+                    replies.append(_array([b'subscribe', channel.encode(), index]))
+            return b''.join(replies)
+        if name == 'PUBLISH':
+            with self.lock:
+                receivers = list(self.subscribers.get(args[0], ()))
+            for receiver in receivers:
+                receiver.wfile.write(_array([b'message', args[0].encode(), args[1].encode()]))
+                receiver.wfile.flush()
+            return b':%d\r\n' % len(receivers)
+        if name in ('EVALSHA', 'EVAL'):
+            if name == 'EVALSHA' and args[0] not in self.scripts:
+                return b'-NOSCRIPT No matching script. Please use EVAL.\r\n'
+            if name == 'EVAL':
+                self.scripts.add(hashlib.sha1(args[0].encode()).hexdigest())
+            return _bulk(b'0')
+        key = (session['db'], args[0]) if args else None
+        with self.lock:
+            if name == 'GET':
+                value = self.data.get(key)
+                return _bulk(value.encode() if value is not None else None)
+            if name == 'SET':
+                options = [arg.upper() for arg in args[2:]]
+                if 'NX' in options and key in self.data:
+                    return _bulk(None)
+                self.data[key] = args[1]
+                if 'EX' in options:
+                    self.ttls[key] = int(args[2 + options.index('EX') + 1])
+                return b'+OK\r\n'
+            if name == 'DEL':
+                removed = sum(1 for name_ in args if self.data.pop((session['db'], name_), None) is not None)
+                return b':%d\r\n' % removed
+            if name == 'INCR':
+                self.data[key] = str(int(self.data.get(key, 0)) + 1)
+                return b':%s\r\n' % self.data[key].encode()
+            if name == 'EXPIRE':
+                self.ttls[key] = int(args[1])
+                return b':1\r\n'
+        return b'-ERR unknown command\r\n'
+
+
+def _bulk(value):
+    if value is None:
+        return b'$-1\r\n'
+    return b'$%d\r\n%s\r\n' % (len(value), value)
+
+
+def _array(items):
+    parts = [b'*%d\r\n' % len(items)]
+    for item in items:
+        parts.append(b':%d\r\n' % item if isinstance(item, int) else _bulk(item))
+    return b''.join(parts)
@@ -0,0 +1,28 @@
+"""Analítica en memoria con numpy: agregados, grupos y puesta al día con el feed de cambios"""
+
+from tests.conftest import register_and_login
+
+
+def _create(client, headers, title, genre, pages, year):
+    response = client.post('/app/books?duplicates=off', headers=headers, json={
+        'title': title, 'author': 'Autor', 'genre': genre, 'pages': pages, 'published_year': year})
+    assert response.status_code == 201
+
+
+def test_analytics_groups_and_follows_later_writes(make_app):
+    app = make_app(BOOK_ANALYTICS=True)
+    client = app.test_client()
+    headers = register_and_login(client)
+    _create(client, headers, 'Uno', 'Novela', 100, 1995)
+    _create(client, headers, 'Dos', 'Novela', 300, 2001)
+
+    first = client.get('/app/books/analytics?group_by=genre', headers=headers).get_json()
+    assert first['count'] == 2
+    assert first['avg_pages'] == 200
+    assert first['groups'] == [{'value': 'Novela', 'count': 2, 'pages': 400}]
+
+    # La instantánea ya está cargada: la nueva alta llega por el feed de cambios
+    _create(client, headers, 'Tres', 'Ensayo', 50, 2003)
+    second = client.get('/app/books/analytics?group_by=decade&genre=Novela,Ensayo', headers=headers).get_json()
+    assert second['count'] == 3
+    assert sorted((group['value'], group['count']) for group in second['groups']) == [('1990', 1), ('2000', 2)]
@@ -0,0 +1,124 @@
+"""Stream SSE: tickets de conexión, caducidad, reanudación con Last-Event-ID y comprobación del canal"""
+
+from datetime import timedelta
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from services.book_events import (
+    EventBroker, BookEvent, LocalEventChannel, event_channel_problem, issue_stream_ticket, read_stream_ticket
+)
+
+
+@pytest.fixture
+def sse_app(make_app):
+    return make_app(BOOK_EVENTS_SSE='on')
+
+
+def _short_token(app, seconds=1):
+    with app.app_context():
+        return create_access_token(identity='1', expires_delta=timedelta(seconds=seconds))
+
+
+def _create_books(client, headers, count):
+    for i in range(count):
+        response = client.post('/app/books', headers=headers, json={
+            'title': f'Libro {i}', 'author': f'Autor {i}', 'isbn': f'978100000{i:04d}'
+        })
+        assert response.status_code == 201
+
+
+def _read_stream(response):
+    # El stream termina solo al caducar el token de corta duración
+    return ''.join(chunk.decode() for chunk in response.response)
+
+
+def _event_ids(body):
+    return [int(line[4:]) for line in body.splitlines() if line.startswith('id: ')]
+
+
+def test_stream_closes_when_the_token_expires(sse_app):
+    client = sse_app.test_client()
+    token = _short_token(sse_app)
+    response = client.get('/app/books/events', headers={'Authorization': f'Bearer {token}'})
+    assert response.status_code == 200
+    body = _read_stream(response)
+    assert body.startswith('retry: 3000')
+    assert body.endswith('event: expired\ndata: {}\n\n')
+
+
+def test_ticket_opens_the_stream_and_jwt_in_query_is_rejected(sse_app):
+    client = sse_app.test_client()
+    token = _short_token(sse_app)
+    ticket = client.post('/app/books/events/ticket', headers={'Authorization': f'Bearer {token}'}).get_json()
+    assert ticket['expires_in'] == 30
+
+    response = client.get(f"/app/books/events?ticket={ticket['ticket']}")
+    assert response.status_code == 200
+    assert 'event: expired' in _read_stream(response)
+
+    assert client.get(f'/app/books/events?jwt={token}').status_code == 401
+    assert client.get('/app/books/events?ticket=falso').status_code == 401
+
+
+def test_ticket_expires_and_is_bound_to_the_secret():
+    ticket = issue_stream_ticket('secreto', '7', 1234)
+    assert read_stream_ticket('secreto', ticket, max_age=30) == ('7', 1234)
+    assert read_stream_ticket('otro-secreto', ticket, max_age=30) is None
+    assert read_stream_ticket('secreto', ticket, max_age=-1) is None
+
+
+def test_reconnect_replays_missed_events_from_the_buffer(sse_app):
+    client = sse_app.test_client()
+    headers = {'Authorization': f'Bearer {_short_token(sse_app, seconds=60)}'}
+    _create_books(client, headers, 3)
+
+    token = _short_token(sse_app)
+    response = client.get('/app/books/events', headers={'Authorization': f'Bearer {token}', 'Last-Event-ID': '1'})
+    assert _event_ids(_read_stream(response)) == [2, 3]
+
+
+def test_reconnect_falls_back_to_the_change_feed_when_the_buffer_has_a_gap(sse_app):
+    from services.book_events import book_events
+    client = sse_app.test_client()
+    headers = {'Authorization': f'Bearer {_short_token(sse_app, seconds=60)}'}
+    _create_books(client, headers, 4)
+    # Simular un worker que no recibió el evento 2 (p. ej. reconexión del canal)
+    with book_events._lock:
+        kept = [event for event in book_events._buffer if event.id != 2]
+        book_events._buffer.clear()
+        book_events._buffer.extend(kept)
+
+    token = _short_token(sse_app)
+    response = client.get('/app/books/events', headers={'Authorization': f'Bearer {token}', 'Last-Event-ID': '1'})
+    assert _event_ids(_read_stream(response)) == [2, 3, 4]
+
+
+def test_replay_detects_gaps_and_batch_ranges():
+    broker = EventBroker()
+    broker.configure(LocalEventChannel())
+    broker.publish(1, 'upsert', {})
+    broker.publish(2, 'upsert', {})
+    broker.publish(5, 'import', {'first_seq': 3})
+    assert [event.id for event in broker.replay(1)] == [2, 5]
+    assert broker.replay(5) == []
+
+    broker.publish(7, 'upsert', {})
+    assert broker.replay(1) is None
+
+
+def test_local_channel_with_several_workers_is_refused():
+    config = {'BOOK_EVENTS_SSE': 'on', 'BOOK_EVENTS_CHANNEL': 'local'}
+    assert event_channel_problem(config, workers=4) is not None
+    assert event_channel_problem(config, workers=1) is None
+    assert event_channel_problem({**config, 'BOOK_EVENTS_CHANNEL': 'redis'}, workers=4) is None
+    assert event_channel_problem({**config, 'BOOK_EVENTS_SSE': 'off'}, workers=4) is None
+
+
+def test_stream_is_unavailable_without_sse(client, auth_headers):
+    assert client.get('/app/books/events', headers=auth_headers).status_code == 503
+
+
+def test_book_event_serializes_as_sse():
+    event = BookEvent(3, 'upsert', {'id': 1, 'title': 'Ñandú'})
+    assert event.to_sse() == 'id: 3\nevent: upsert\ndata: {"id": 1, "title": "Ñandú"}\n\n'
@@ -0,0 +1,180 @@
+"""Importación masiva: ejecución por import-worker, concesión, reanudación tras caída y relevo de ejecutor"""
+
+import io
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy.orm import Session
+
+from models.book_import_job_model import ImportJob, STATUS_COMPLETED, STATUS_PENDING, STATUS_RUNNING
+from models.book_model import Book
+from models.db import db
+from repositories.book_import_job_repository import ImportJobRepository
+from services.book_import_service import BookImportService, execute_import_job, run_import_worker
+
+
+def _csv(count, start=0):
+    lines = ['title,author,isbn,pages']
+    lines += [f'Libro {i},Autor {i},978200000{i:04d},{100 + i}' for i in range(start, start + count)]
+    return ('\n'.join(lines) + '\n').encode()
+
+
+class Crash(BaseException):
+    """Caída del proceso a mitad de importación (no la captura el servicio)"""
+
+
+class CrashingStream(io.BytesIO):
+    def __init__(self, data, crash_after_bytes):
+        super().__init__(data)
+        self.crash_after_bytes = crash_after_bytes
+
+    def read(self, size=-1):
+        if self.tell() >= self.crash_after_bytes:
+            raise Crash()
+        return super().read(min(size, 256) if size and size > 0 else 256)
+
+
+def _create_job(app, path, batch_size=10):
+    with app.app_context():
+        job = ImportJobRepository(db.session).create(ImportJob('libros.csv', 'csv', batch_size, 'off', 0.7, path=path))
+        return job.id
+
+
+def _job(app, job_id):
+    with app.app_context():
+        return db.session.get(ImportJob, job_id).to_dict()
+
+
+def _book_count(app):
+    with app.app_context():
+        return db.session.query(Book).count()
+
+
+def test_upload_is_executed_by_the_import_worker(app, client, auth_headers):
+    response = client.post('/app/books/import?batch_size=7', data=_csv(20),
+                           headers={**auth_headers, 'Content-Type': 'text/csv'})
+    assert response.status_code == 202
+    job_id = response.get_json()['job']['job_id']
+    assert response.get_json()['job']['status'] == STATUS_PENDING
+
+    assert run_import_worker(app, once=True) == 1
+    job = client.get(f'/app/books/import/{job_id}', headers=auth_headers).get_json()['job']
+    assert job['status'] == STATUS_COMPLETED
+    assert (job['processed'], job['imported'], job['batches']) == (20, 20, 3)
+    assert run_import_worker(app, once=True) == 0
+
+
+def test_crashed_import_resumes_after_the_last_committed_batch(app, tmp_path):
+    path = tmp_path / 'libros.csv'
+    data = _csv(50)
+    path.write_bytes(data)
+    job_id = _create_job(app, str(path))
+
+    with app.app_context():
+        job = ImportJobRepository(db.session).claim(job_id, 'caido', lease_seconds=300)
+        try:
+            BookImportService(db.session).run(job, CrashingStream(data, crash_after_bytes=len(data) // 2))
+        except Crash:
+            db.session.rollback()
+        finally:
+            db.session.remove()
+
+    crashed = _job(app, job_id)
+    assert crashed['status'] == STATUS_RUNNING
+    assert crashed['processed'] % 10 == 0 and 0 < crashed['processed'] < 50
+    assert _book_count(app) == crashed['imported']
+
+    # Mientras la concesión está vigente nadie más lo reserva
+    assert run_import_worker(app, once=True) == 0
+    with app.app_context():
+        db.session.query(ImportJob).filter_by(id=job_id).update(
+            {'heartbeat_at': datetime.utcnow() - timedelta(seconds=301)})
+        db.session.commit()
+
+    assert run_import_worker(app, once=True) == 1
+    job = _job(app, job_id)
+    assert job['status'] == STATUS_COMPLETED
+    assert (job['processed'], job['imported'], job['duplicates']) == (50, 50, 0)
+    assert _book_count(app) == 50
+
+
+def test_executor_that_lost_its_lease_stops_committing(app, tmp_path):
+    path = tmp_path / 'libros.csv'
+    path.write_bytes(_csv(30))
+    job_id = _create_job(app, str(path))
+
+    calls = []
+
+    def take_over(job):
+        # Otro ejecutor reserva el trabajo (concesión caducada) tras el primer lote confirmado,
+        # antes de que el ejecutor vuelva a leer el trabajo de la BD
+        calls.append(1)
+        if len(calls) == 1:
+            with Session(bind=db.engine) as other:
+                other.get(ImportJob, job_id).owner = 'nuevo'
+                other.commit()
+
+    with app.app_context():
+        job = ImportJobRepository(db.session).claim(job_id, 'lento', lease_seconds=300)
+        with open(path, 'rb') as stream:
+            BookImportService(db.session).run(job, stream, progress=take_over)
+        db.session.remove()
+
+    job = _job(app, job_id)
+    assert (job['status'], job['processed'], job['imported']) == (STATUS_RUNNING, 10, 10)
+    assert _book_count(app) == 10
+
+
+def test_heartbeat_renews_the_lease_without_committing_progress(app, tmp_path):
+    job_id = _create_job(app, str(tmp_path / 'libros.csv'))
+    with app.app_context():
+        repository = ImportJobRepository(db.session)
+        job = repository.claim(job_id, 'ejecutor', lease_seconds=300)
+        claimed_at = job.heartbeat_at
+        job.processed = 7
+        assert repository.heartbeat(job, 'ejecutor')
+
+        with Session(bind=db.engine) as other:
+            stored = other.get(ImportJob, job_id)
+            assert stored.processed == 0
+            assert stored.heartbeat_at >= claimed_at
+
+        assert not repository.heartbeat(job, 'otro')
+        db.session.rollback()
+        db.session.remove()
+
+
+def test_long_batches_renew_the_lease_between_commits(app, tmp_path, monkeypatch):
+    path = tmp_path / 'libros.csv'
+    path.write_bytes(_csv(40))
+    job_id = _create_job(app, str(path), batch_size=1000)
+    heartbeats = []
+    original = ImportJobRepository.heartbeat
+
+    def counting(self, job, owner):
+        heartbeats.append(job.processed)
+        return original(self, job, owner)
+
+    monkeypatch.setattr(ImportJobRepository, 'heartbeat', counting)
+    with app.app_context():
+        job = ImportJobRepository(db.session).claim(job_id, 'ejecutor', lease_seconds=300)
+        # Concesión diminuta: se renueva en cada fila aunque el único lote se confirme al final
+        execute_import_job(db.session, job, str(tmp_path / 'imports'), lease_seconds=0.000001)
+        db.session.remove()
+
+    assert len(heartbeats) >= 40
+    assert _job(app, job_id)['status'] == STATUS_COMPLETED
+
+
+def test_status_query_does_not_start_work(make_app, tmp_path):
+    app = make_app(BOOK_IMPORT_RUNNER='thread')
+    client = app.test_client()
+    from tests.conftest import register_and_login
+    headers = register_and_login(client)
+    path = tmp_path / 'libros.csv'
+    path.write_bytes(_csv(5))
+    job_id = _create_job(app, str(path))
+
+    assert client.get(f'/app/books/import/{job_id}', headers=headers).get_json()['job']['status'] == STATUS_PENDING
+    assert not [thread for thread in threading.enumerate() if thread.name.startswith('book-import-')]
+    assert _job(app, job_id)['status'] == STATUS_PENDING
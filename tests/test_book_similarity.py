@@ -0,0 +1,48 @@
+"""Índice MinHash de casi duplicados (user-043)"""
+
+from repositories.book_similarity_repository import normalize_text, trigrams, jaccard, band_buckets
+
+
+def test_normalize_text_keeps_letters_of_any_script():
+    assert normalize_text('Война и мир') == 'воина и мир'
+    assert normalize_text('Ἰλιάς') == 'ιλιας'
+    assert normalize_text('戦争と平和') == '戦争と平和'
+    assert normalize_text('Cien años_de   soledad!') == 'cien anos de soledad'
+
+
+def test_title_without_letters_has_no_signature():
+    assert trigrams('¡¡¡!!!', 'Leo Tolstoy') == set()
+    assert band_buckets(trigrams('', 'Leo Tolstoy')) == []
+
+
+def test_different_cyrillic_titles_by_same_author_are_not_similar():
+    similarity = jaccard(trigrams('Анна Каренина', 'Leo Tolstoy'), trigrams('Война и мир', 'Leo Tolstoy'))
+    assert similarity < 0.7
+
+
+def test_spelling_variants_are_similar():
+    assert jaccard(trigrams('Cien años de soledad', 'Gabriel García Márquez'),
+                   trigrams('Cien Anos de Soledad.', 'Gabriel Garcia Marquez')) == 1.0
+
+
+def test_reject_mode_with_non_latin_titles(client, auth_headers):
+    create = lambda title: client.post('/app/books?duplicates=reject', headers=auth_headers,
+                                       json={'title': title, 'author': 'Leo Tolstoy'})
+    assert create('Война и мир').status_code == 201
+    assert create('Анна Каренина').status_code == 201
+    assert create('Воскресение').status_code == 201
+    response = create('Война и мир')
+    assert response.status_code == 409
+    assert response.get_json()['duplicates'][0]['title'] == 'Война и мир'
+
+
+def test_flag_mode_reports_similar_books(client, auth_headers):
+    first = client.post('/app/books', headers=auth_headers,
+                        json={'title': 'Cien años de soledad', 'author': 'Gabriel García Márquez'}).get_json()['book']
+    response = client.post('/app/books?duplicates=flag', headers=auth_headers,
+                           json={'title': 'Cien Años de Soledad', 'author': 'Gabriel Garcia Marquez'})
+    assert response.status_code == 201
+    duplicates = response.get_json()['possible_duplicates']
+    assert [match['id'] for match in duplicates] == [first['id']]
+    similar = client.get(f"/app/books/{first['id']}/similar", headers=auth_headers).get_json()
+    assert similar
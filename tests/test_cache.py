@@ -0,0 +1,136 @@
+"""Caché compartida: cliente RESP, backends y claves de versión"""
+
+import hashlib
+import os
+import stat
+import threading
+
+import pytest
+
+from cache.backends import FileBackend, MemoryBackend, RedisBackend, default_file_path, create_cache_backend
+from cache.redis_client import RedisClient, RedisError
+from cache.shared import SharedCache, VERSION_TTL
+from tests.fake_redis import FakeRedisServer
+
+
+def test_client_authenticates_and_selects_the_database():
+    with FakeRedisServer(password='secreto') as server:
+        client = RedisClient(server.url(db=3, password='secreto'))
+        assert client.ping()
+        assert client.set('clave', 'valor', ttl=60) == 'OK'
+        assert client.get('clave') == b'valor'
+        assert server.names()[:3] == ['AUTH', 'SELECT', 'PING']
+        assert server.data == {(3, 'clave'): 'valor'}
+        assert server.ttls == {(3, 'clave'): 60}
+
+
+def test_client_reports_wrong_password():
+    with FakeRedisServer(password='secreto') as server:
+        with pytest.raises(RedisError, match='WRONGPASS'):
+            RedisClient(server.url(password='otra')).ping()
+
+
+def test_set_nx_incr_with_ttl_and_delete():
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url())
+        assert client.set('k', '1', nx=True) == 'OK'
+        assert client.set('k', '2', nx=True) is None
+        assert client.incr('k', ttl=120) == 2
+        assert server.ttls[(0, 'k')] == 120
+        assert client.delete('k') == 1
+        assert client.get('k') is None
+
+
+def test_evalsha_falls_back_to_eval_once():
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url())
+        sha = hashlib.sha1(b'return 0').hexdigest()
+        assert client.evalsha(sha, 'return 0', ['k'], [1]) == b'0'
+        assert client.evalsha(sha, 'return 0', ['k'], [1]) == b'0'
+        assert server.names() == ['EVALSHA', 'EVAL', 'EVALSHA']
+
+
+def test_client_reconnects_after_the_connection_drops():
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url())
+        client.set('k', 'v')
+        client._local.sock.close()
+        assert client.get('k') == b'v'
+
+
+def test_publish_reaches_subscribers():
+    with FakeRedisServer() as server:
+        client = RedisClient(server.url())
+        subscription = client.subscribe('canal')
+        received = []
+        messages = subscription.messages()
+
+        def listen():
+            for message in messages:
+                received.append(message)
+                subscription.close()
+
+        listener = threading.Thread(target=listen)
+        listener.start()
+        for _ in range(200):
+            if client.publish('canal', 'hola'):
+                break
+            threading.Event().wait(0.01)
+        listener.join(timeout=5)
+        assert received == [('canal', b'hola')]
+
+
+def test_redis_backend_prefixes_keys():
+    with FakeRedisServer() as server:
+        backend = RedisBackend(server.url())
+        assert backend.add('k', 'v', 30)
+        assert not backend.add('k', 'w', 30)
+        assert backend.get('k') == 'v'
+        assert (0, 'cache:k') in server.data
+
+
+def test_file_backend_lives_in_a_private_directory(tmp_path):
+    directory = tmp_path / 'instance'
+    path = default_file_path(str(directory), 'sqlite:///books.db')
+    backend = FileBackend(path)
+    backend.set('k', 'v', 30)
+
+    assert os.path.dirname(path) == str(directory)
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert backend.get('k') == 'v'
+    assert default_file_path(str(directory), 'sqlite:///otra.db') != path
+
+
+def test_cache_dir_setting_is_used(tmp_path):
+    backend = create_cache_backend({'CACHE_BACKEND': 'file', 'CACHE_DIR': str(tmp_path / 'cache')})
+    assert backend.path.startswith(str(tmp_path / 'cache'))
+
+
+@pytest.mark.parametrize('make_backend', [
+    lambda tmp_path: MemoryBackend(),
+    lambda tmp_path: FileBackend(str(tmp_path / 'cache.sqlite3')),
+])
+def test_version_keys_expire_after_their_entries(tmp_path, make_backend):
+    backend = make_backend(tmp_path)
+    cache = SharedCache(backend, default_ttl=60)
+    books = cache.namespace('books')
+    assert books.version_ttl == VERSION_TTL
+
+    assert books.get_or_load(1, lambda: {'title': 'A'}) == {'title': 'A'}
+    books.invalidate(1)
+    assert books.get_or_load(1, lambda: {'title': 'B'}) == {'title': 'B'}
+    assert books.get_or_load(1, lambda: {'title': 'C'}) == {'title': 'B'}
+
+    if isinstance(backend, FileBackend):
+        expires_at = backend._connection().execute(
+            "SELECT expires_at FROM cache_entries WHERE key = 'books:version:1'"
+        ).fetchone()[0]
+        assert expires_at is not None
+    else:
+        assert backend._entries['books:version:1'][1] is not None
+
+
+def test_version_ttl_outlives_long_entry_ttls():
+    cache = SharedCache(MemoryBackend(), default_ttl=60)
+    assert cache.namespace('long', ttl=VERSION_TTL).version_ttl == 2 * VERSION_TTL
@@ -0,0 +1,59 @@
+"""Compresión de respuestas: negociación, streaming con vaciados espaciados y exportaciones"""
+
+import gzip
+import zlib
+
+from flask import Flask
+
+from middleware.compression import Compression
+
+
+def _stream_app(**config):
+    app = Flask(__name__)
+    app.config.update(config)
+    return app, Compression(app)
+
+
+def _lines(count):
+    return [f'{{"id": {i}, "title": "Libro {i}", "author": "Autor {i % 50}", "genre": "Novela"}}\n'
+            for i in range(count)]
+
+
+def test_stream_flushes_every_flush_bytes_not_every_chunk():
+    app, compression = _stream_app(COMPRESS_STREAM_FLUSH_BYTES=64 * 1024)
+    lines = _lines(5000)
+    with app.test_request_context():
+        buffered = b''.join(compression.compress_stream('gzip', lines))
+
+    # Referencia: un vaciado por línea, como hacía la versión anterior
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    per_chunk = b''.join(compressor.compress(line.encode()) + compressor.flush(zlib.Z_SYNC_FLUSH)
+                         for line in lines) + compressor.flush()
+
+    assert gzip.decompress(buffered).decode() == ''.join(lines)
+    assert len(buffered) * 2 < len(per_chunk)
+
+
+def test_stream_emits_data_before_the_end():
+    app, compression = _stream_app(COMPRESS_STREAM_FLUSH_BYTES=1024)
+    with app.test_request_context():
+        parts = list(compression.compress_stream('gzip', _lines(200)))
+    # Varios vaciados intermedios: el cliente no espera al final de la exportación
+    assert len([part for part in parts if part]) > 2
+
+
+def test_small_bodies_are_not_compressed(client):
+    response = client.get('/healthz', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_export_is_compressed_in_blocks(client, auth_headers):
+    for i in range(30):
+        client.post('/app/books', headers=auth_headers, json={
+            'title': f'Libro {i}', 'author': 'Autor', 'isbn': f'978000000{i:04d}', 'pages': 100 + i
+        })
+    response = client.get('/app/books/export', headers={**auth_headers, 'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    lines = gzip.decompress(response.get_data()).decode().splitlines()
+    assert len(lines) == 30
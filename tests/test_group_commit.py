@@ -0,0 +1,119 @@
+"""Group commit de escrituras individuales y savepoints de /batch"""
+
+import threading
+
+from models.book_model import Book
+from models.db import db
+from repositories.book_group_commit import book_group_committer
+from tests.conftest import register_and_login
+
+
+def _book(i, **fields):
+    return dict({'title': f'Libro {i}', 'author': f'Autor {i}', 'genre': 'Novela', 'pages': 100}, **fields)
+
+
+def _isbn(n):
+    """ISBN-13 válido (con dígito de control) distinto para cada n"""
+    digits = f'978000{n:06d}'
+    check = (10 - sum(int(d) * (3 if i % 2 else 1) for i, d in enumerate(digits)) % 10) % 10
+    return f'{digits}{check}'
+
+
+def _count(app):
+    with app.app_context():
+        return db.session.query(Book).count()
+
+
+def test_concurrent_writes_share_a_commit_and_keep_their_own_results(make_app):
+    app = make_app(BOOK_GROUP_COMMIT=True, BOOK_GROUP_COMMIT_MAX_WAIT_MS=50)
+    headers = register_and_login(app.test_client())
+    statuses = {}
+
+    def create(i, isbn):
+        response = app.test_client().post('/app/books?duplicates=off', json=_book(i, isbn=isbn), headers=headers)
+        statuses[i] = response.status_code
+
+    # El libro 0 y el 1 comparten ISBN: solo uno puede entrar y el error llega a un único llamador
+    threads = [threading.Thread(target=create, args=(i, _isbn(max(i, 1))))
+               for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(statuses.values()) == [201] * 7 + [409]
+    assert _count(app) == 7
+    with app.app_context():
+        seqs = [seq for (seq,) in db.session.query(Book.change_seq)]
+    assert len(set(seqs)) == 7
+    stats = app.test_client().get('/app/books/stats', headers=headers).get_json()
+    assert stats['total_books'] == 7
+
+
+def test_queued_write_is_withdrawn_on_timeout_and_running_one_completes(make_app, monkeypatch):
+    app = make_app(BOOK_GROUP_COMMIT=True, BOOK_GROUP_COMMIT_MAX_WAIT_MS=1, BOOK_GROUP_COMMIT_TIMEOUT=0.2)
+    headers = register_and_login(app.test_client())
+    started, release = threading.Event(), threading.Event()
+    execute_group = book_group_committer._execute_group
+
+    def slow_group(*args):
+        started.set()
+        release.wait(5)
+        return execute_group(*args)
+
+    monkeypatch.setattr(book_group_committer, '_execute_group', slow_group)
+    running = {}
+    thread = threading.Thread(target=lambda: running.update(
+        response=app.test_client().post('/app/books?duplicates=off', json=_book(1), headers=headers)))
+    thread.start()
+    assert started.wait(5)
+
+    # El hilo está ocupado con el primer grupo: la segunda alta sigue en cola al vencer el plazo
+    queued = app.test_client().post('/app/books?duplicates=off', json=_book(2), headers=headers)
+    assert queued.status_code == 503
+    assert queued.headers['Retry-After'] == '1'
+
+    # La primera ya estaba en ejecución: supera el plazo pero espera a su COMMIT
+    release.set()
+    thread.join(5)
+    assert running['response'].status_code == 201
+
+    # La cancelada no se ejecuta nunca y el hilo sigue atendiendo la cola
+    after = app.test_client().post('/app/books?duplicates=off', json=_book(3), headers=headers)
+    assert after.status_code == 201
+    with app.app_context():
+        titles = sorted(title for (title,) in db.session.query(Book.title))
+    assert titles == ['Libro 1', 'Libro 3']
+
+
+def test_batch_conflict_only_rolls_back_its_savepoint(client, auth_headers):
+    response = client.post('/app/batch', headers=auth_headers, json={'duplicates': 'off', 'operations': [
+        {'op': 'create', 'data': _book(1, isbn=_isbn(1))},
+        {'op': 'create', 'data': _book(2, isbn=_isbn(1))},
+        {'op': 'create', 'data': _book(3, isbn=_isbn(3), genre='Ensayo')},
+    ]})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['committed'] is True
+    assert [result['status'] for result in body['results']] == [201, 409, 201]
+    stats = client.get('/app/books/stats', headers=auth_headers).get_json()
+    # Los deltas de estadísticas de la operación revertida tampoco se aplican
+    assert stats['total_books'] == 2
+    assert stats['total_pages'] == 200
+    assert sorted((row['value'], row['count']) for row in stats['by_genre']) == [('Ensayo', 1), ('Novela', 1)]
+
+
+def test_atomic_batch_rolls_back_every_operation(app, client, auth_headers):
+    response = client.post('/app/batch', headers=auth_headers, json={'atomic': True, 'duplicates': 'off', 'operations': [
+        {'op': 'create', 'data': _book(1)},
+        {'op': 'update', 'id': 999, 'data': {'pages': 10}},
+        {'op': 'create', 'data': _book(2)},
+    ]})
+
+    body = response.get_json()
+    assert response.status_code == 409
+    assert body['committed'] is False
+    assert [result['status'] for result in body['results']] == [424, 404, 424]
+    assert _count(app) == 0
+    assert client.get('/app/books/stats', headers=auth_headers).get_json()['total_books'] == 0
@@ -0,0 +1,74 @@
+"""Comprobaciones de salud y circuit breaker de la base de datos"""
+
+import time
+
+import pytest
+from sqlalchemy import text
+
+from middleware.db_breaker import database_breaker, STATE_CLOSED, STATE_OPEN
+from models.db import db
+
+
+def test_healthz_and_readyz_when_everything_is_up(client):
+    assert client.get('/healthz').get_json() == {'status': 'ok'}
+    response = client.get('/readyz')
+    body = response.get_json()
+    assert response.status_code == 200
+    assert body['status'] == 'ready'
+    assert body['database']['ok'] is True
+    assert body['database']['state'] == STATE_CLOSED
+    assert body['schema'] == {'ok': True, 'pending': []}
+
+
+def test_open_circuit_rejects_database_routes_without_connecting(make_app):
+    app = make_app(DB_BREAKER_FAILURES=2, DB_BREAKER_RESET_SECONDS=0.3)
+    client = app.test_client()
+    database_breaker.record_failure(RuntimeError('conexión rechazada'))
+    assert database_breaker.state == STATE_CLOSED
+    database_breaker.record_failure(RuntimeError('conexión rechazada'))
+    assert database_breaker.state == STATE_OPEN
+
+    response = client.get('/app/books')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/auth/login', json={}).status_code == 503
+    # Liveness no depende de la BD; readiness informa del circuito sin intentar conectar
+    assert client.get('/healthz').status_code == 200
+    ready = client.get('/readyz')
+    assert ready.status_code == 503
+    database = ready.get_json()['database']
+    assert (database['ok'], database['state'], database['error']) == (False, STATE_OPEN, 'Circuito abierto')
+
+    # Las conexiones nuevas tampoco llegan a intentarse
+    with app.app_context():
+        db.engine.dispose()
+        with pytest.raises(Exception, match='circuito abierto'):
+            db.session.execute(text('SELECT 1'))
+        db.session.remove()
+
+
+def test_half_open_trial_closes_the_circuit(make_app):
+    app = make_app(DB_BREAKER_FAILURES=1, DB_BREAKER_RESET_SECONDS=0.1)
+    client = app.test_client()
+    database_breaker.record_failure(RuntimeError('conexión rechazada'))
+    assert client.get('/readyz').status_code == 503
+
+    time.sleep(0.15)
+    with app.app_context():
+        # El pool ya no tiene conexiones: la siguiente consulta es el intento de prueba
+        db.engine.dispose()
+    assert client.get('/readyz').status_code == 200
+    assert database_breaker.state == STATE_CLOSED
+    assert client.get('/app/books').status_code == 401
+
+
+def test_failed_trial_reopens_the_circuit(make_app):
+    make_app(DB_BREAKER_FAILURES=1, DB_BREAKER_RESET_SECONDS=0.1)
+    database_breaker.record_failure(RuntimeError('conexión rechazada'))
+    time.sleep(0.15)
+    assert database_breaker.allow_connection() is True
+    # Solo un intento a la vez en half-open
+    assert database_breaker.allow_connection() is False
+    database_breaker.record_failure(RuntimeError('sigue caída'))
+    assert database_breaker.state == STATE_OPEN
+    assert database_breaker.retry_after() > 0
@@ -0,0 +1,132 @@
+"""Claves de idempotencia: reserva, reproducción, espera de reintentos concurrentes y ámbitos"""
+
+import threading
+
+from models.book_model import Book
+from models.db import db
+from repositories.idempotency_repository import IdempotencyRepository
+from services.book_service import BookService
+from tests.conftest import register_and_login
+
+BOOK = {'title': 'El Quijote', 'author': 'Miguel de Cervantes', 'pages': 863}
+
+
+def _titles(app):
+    with app.app_context():
+        return [title for (title,) in db.session.query(Book.title)]
+
+
+def _post(client, headers, key, data=BOOK, **kwargs):
+    return client.post('/app/books?duplicates=off', json=data, headers=dict(headers, **{'Idempotency-Key': key}),
+                       **kwargs)
+
+
+def test_retry_replays_the_stored_response(app, client, auth_headers):
+    first = _post(client, auth_headers, 'alta-1')
+    retry = _post(client, auth_headers, 'alta-1')
+
+    assert first.status_code == retry.status_code == 201
+    assert retry.headers['Idempotent-Replayed'] == 'true'
+    assert 'Idempotent-Replayed' not in first.headers
+    assert retry.get_json() == first.get_json()
+    assert _titles(app) == ['El Quijote']
+
+
+def test_key_reused_with_another_request_is_rejected(client, auth_headers):
+    assert _post(client, auth_headers, 'alta-1').status_code == 201
+    assert _post(client, auth_headers, 'alta-1', dict(BOOK, pages=1)).status_code == 422
+    assert client.post('/app/books', json=BOOK, headers=dict(auth_headers, **{'Idempotency-Key': ' '})).status_code == 400
+
+
+def test_keys_are_scoped_per_user(app, client, auth_headers):
+    other = register_and_login(client, 'otra')
+    assert _post(client, auth_headers, 'alta-1').status_code == 201
+    response = _post(client, other, 'alta-1')
+    assert response.status_code == 201
+    assert 'Idempotent-Replayed' not in response.headers
+    assert len(_titles(app)) == 2
+
+
+def test_anonymous_keys_are_scoped_per_ip(client):
+    payload = {'username': 'ana', 'email': 'ana@example.com', 'password': 'secret1'}
+    register = lambda ip: client.post('/auth/register', json=payload, headers={'Idempotency-Key': 'registro'},
+                                      environ_base={'REMOTE_ADDR': ip})
+    first = register('10.0.0.1')
+    assert first.status_code == 201
+    assert register('10.0.0.1').headers.get('Idempotent-Replayed') == 'true'
+    # Otra IP con la misma clave no recibe la respuesta (con los datos del usuario) de la primera
+    other = register('10.0.0.2')
+    assert 'Idempotent-Replayed' not in other.headers
+    assert other.status_code != 201
+
+
+def test_server_errors_are_not_stored(app, client, auth_headers, monkeypatch):
+    def fail(*args, **kwargs):
+        raise RuntimeError('fallo transitorio')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(BookService, 'create_book', fail)
+        assert _post(client, auth_headers, 'alta-1').status_code == 500
+    retry = _post(client, auth_headers, 'alta-1')
+    assert retry.status_code == 201
+    assert 'Idempotent-Replayed' not in retry.headers
+    assert _titles(app) == ['El Quijote']
+
+
+def _block_create_book(monkeypatch):
+    """Retiene las altas hasta que se activa el evento devuelto"""
+    started, release = threading.Event(), threading.Event()
+    create_book = BookService.create_book
+
+    def slow_create(self, *args, **kwargs):
+        started.set()
+        release.wait(5)
+        return create_book(self, *args, **kwargs)
+
+    monkeypatch.setattr(BookService, 'create_book', slow_create)
+    return started, release
+
+
+def test_concurrent_retry_waits_for_the_original(app, auth_headers, monkeypatch):
+    started, release = _block_create_book(monkeypatch)
+    responses = {}
+    original = threading.Thread(target=lambda: responses.update(
+        original=_post(app.test_client(), auth_headers, 'alta-1')))
+    original.start()
+    assert started.wait(5)
+    retry = threading.Thread(target=lambda: responses.update(retry=_post(app.test_client(), auth_headers, 'alta-1')))
+    retry.start()
+    release.set()
+    original.join(5)
+    retry.join(5)
+
+    assert responses['original'].status_code == responses['retry'].status_code == 201
+    assert responses['retry'].headers['Idempotent-Replayed'] == 'true'
+    assert _titles(app) == ['El Quijote']
+
+
+def test_retry_gives_up_while_the_original_is_still_running(make_app, monkeypatch):
+    app = make_app(IDEMPOTENCY_WAIT_SECONDS=0.1)
+    headers = register_and_login(app.test_client())
+    started, release = _block_create_book(monkeypatch)
+    original = threading.Thread(target=lambda: _post(app.test_client(), headers, 'alta-1'))
+    original.start()
+    try:
+        assert started.wait(5)
+        response = _post(app.test_client(), headers, 'alta-1')
+        assert response.status_code == 409
+        assert response.headers['Retry-After'] == '1'
+    finally:
+        release.set()
+        original.join(5)
+    assert _titles(app) == ['El Quijote']
+
+
+def test_abandoned_claim_can_be_taken_over(app):
+    with app.app_context():
+        repository = IdempotencyRepository(db.session)
+        assert repository.claim('user:1', 'k', 'huella', 'caido', lock_seconds=-1) is None
+        # La reserva anterior venció sin respuesta: la nueva petición la obtiene
+        assert repository.claim('user:1', 'k', 'huella', 'nuevo', lock_seconds=60) is None
+        assert repository.complete('user:1', 'k', 'caido', 201, b'{}', 'application/json', 60) is False
+        assert repository.claim('user:1', 'k', 'huella', 'otro', lock_seconds=60).owner == 'nuevo'
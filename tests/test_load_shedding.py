@@ -0,0 +1,58 @@
+"""Descarte de carga: límites por ruta derivados de la concurrencia del worker y plazo de cola"""
+
+import time
+
+from main import load_shedder
+from middleware.load_shedding import default_limits, request_queue_age, worker_concurrency
+
+
+def test_heavy_routes_leave_a_thread_for_light_ones():
+    limits = default_limits({'LOADSHED_WORKER_CONCURRENCY': 4})
+    assert limits['user_bp.login'] == 3
+    assert limits['book_bp.export_books'] == 2
+    assert limits['book_bp.book_events_stream'] is None
+    # Un valor explícito no se recorta
+    assert default_limits({'LOADSHED_WORKER_CONCURRENCY': 4, 'LOADSHED_AUTH_CONCURRENCY': 8})['user_bp.login'] == 8
+
+
+def test_worker_concurrency_follows_gunicorn_settings():
+    assert worker_concurrency({'GUNICORN_WORKER_CLASS': 'sync'}) == 1
+    assert worker_concurrency({'GUNICORN_THREADS': '8'}) == 8
+    assert worker_concurrency({'GUNICORN_WORKER_CLASS': 'gevent'}) == 1000
+
+
+def test_request_queue_age_accepts_seconds_milliseconds_and_microseconds(app):
+    now = 1700000000.0
+    for header in ('t=1699999999.5', '1699999999500', '1699999999500000'):
+        with app.test_request_context(headers={'X-Request-Start': header}):
+            assert abs(request_queue_age(now) - 0.5) < 1e-3
+    with app.test_request_context(headers={'X-Request-Start': 'ayer'}):
+        assert request_queue_age(now) == 0.0
+
+
+def test_full_route_is_shed_fast_and_other_routes_keep_working(make_app):
+    app = make_app(LOADSHED_ENABLED=True, LOADSHED_WORKER_CONCURRENCY=2, LOADSHED_QUEUE_TIMEOUT_MS=50)
+    client = app.test_client()
+    slot = load_shedder.semaphore_for('user_bp.login')
+    assert slot.acquire(blocking=False)
+    try:
+        started = time.monotonic()
+        response = client.post('/auth/login', json={'login': 'nadie', 'password': 'x'})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert time.monotonic() - started < 1
+        # El límite es por endpoint: el registro y la salud no se ven afectados
+        assert client.post('/auth/register', json={}).status_code == 400
+        assert client.get('/healthz').status_code == 200
+    finally:
+        slot.release()
+    assert client.post('/auth/login', json={'login': 'nadie', 'password': 'x'}).status_code == 401
+
+
+def test_request_that_already_waited_in_the_proxy_is_shed(make_app):
+    app = make_app(LOADSHED_ENABLED=True, LOADSHED_QUEUE_TIMEOUT_MS=250)
+    client = app.test_client()
+    stale = {'X-Request-Start': f't={time.time() - 1:.3f}'}
+    assert client.post('/auth/login', json={}, headers=stale).status_code == 503
+    fresh = {'X-Request-Start': f't={time.time():.3f}'}
+    assert client.post('/auth/login', json={}, headers=fresh).status_code == 400
@@ -0,0 +1,75 @@
+"""Migraciones: registro en bases nuevas, idempotencia y bloqueo de rutas con migraciones pendientes"""
+
+import time
+
+from sqlalchemy import text
+
+from main import db_upgrade_command
+from middleware.schema_gate import schema_gate
+from migrations.runner import MigrationRunner
+from migrations.versions import MIGRATIONS
+from models.db import db
+from tests.conftest import register_and_login
+
+
+def _forget_last_migration(app):
+    with app.app_context():
+        db.session.execute(text('DELETE FROM schema_version WHERE version = :v'), {'v': MIGRATIONS[-1].version})
+        db.session.commit()
+
+
+def test_fresh_database_records_every_migration(app):
+    with app.app_context():
+        runner = MigrationRunner(db.session)
+        assert runner.pending() == []
+        assert sorted(runner.applied()) == [migration.version for migration in MIGRATIONS]
+
+
+def test_upgrade_is_idempotent(app):
+    _forget_last_migration(app)
+    with app.app_context():
+        runner = MigrationRunner(db.session)
+        assert [migration.version for migration in runner.upgrade()] == [MIGRATIONS[-1].version]
+        assert runner.upgrade() == []
+
+
+def test_pending_migrations_return_503_until_upgraded(make_app):
+    first = make_app()
+    client = first.test_client()
+    headers = register_and_login(client)
+    _forget_last_migration(first)
+
+    # Mismo archivo de base de datos, nuevo arranque con una migración pendiente
+    app = make_app(SQLALCHEMY_DATABASE_URI=first.config['SQLALCHEMY_DATABASE_URI'], SCHEMA_CHECK_SECONDS=0)
+    client = app.test_client()
+    response = client.get('/app/books', headers=headers)
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Migraciones pendientes'
+    assert response.headers['Retry-After'] == '1'
+    assert client.post('/auth/login', json={'login': 'tester', 'password': 'secret1'}).status_code == 503
+
+    readiness = client.get('/readyz')
+    assert readiness.status_code == 503
+    assert readiness.get_json()['schema'] == {'ok': False, 'pending': [MIGRATIONS[-1].version]}
+    assert client.get('/healthz').status_code == 200
+
+    runner = app.test_cli_runner()
+    result = runner.invoke(db_upgrade_command)
+    assert result.exit_code == 0, result.output
+    assert f'Aplicada {MIGRATIONS[-1].version:04d}' in result.output
+
+    assert client.get('/app/books', headers=headers).status_code == 200
+    assert client.get('/readyz').status_code == 200
+    assert schema_gate.ready
+
+
+def test_schema_is_rechecked_only_every_check_interval(make_app):
+    first = make_app()
+    _forget_last_migration(first)
+    app = make_app(SQLALCHEMY_DATABASE_URI=first.config['SQLALCHEMY_DATABASE_URI'], SCHEMA_CHECK_SECONDS=3600)
+    with app.app_context():
+        MigrationRunner(db.session).upgrade()
+    # Sigue bloqueado hasta la siguiente comprobación
+    assert app.test_client().get('/app/books').status_code == 503
+    schema_gate._checked_at = time.monotonic() - 3600
+    assert app.test_client().get('/app/books').status_code == 401
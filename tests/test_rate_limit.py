@@ -0,0 +1,74 @@
+"""Limitación de peticiones: token buckets, políticas de login y la IP real detrás de un proxy"""
+
+from middleware.rate_limit import MemoryBucketStore, parse_rate
+from tests.conftest import register_and_login
+
+
+def test_parse_rate():
+    assert parse_rate('10/minute') == (10 / 60, 10)
+    assert parse_rate('50/second;burst=100') == (50, 100)
+
+
+def test_bucket_refills_over_time():
+    store = MemoryBucketStore()
+    assert [store.consume('k', rate=1, burst=2, now=0) for _ in range(2)] == [0, 0]
+    assert store.consume('k', rate=1, burst=2, now=0) == 1
+    assert store.consume('k', rate=1, burst=2, now=1) == 0
+
+
+def test_memory_store_is_bounded():
+    store = MemoryBucketStore(max_keys=2)
+    for key in ('a', 'b', 'c'):
+        store.consume(key, rate=1, burst=1, now=0)
+    assert list(store._buckets) == ['b', 'c']
+
+
+def _login(client, login, ip, password='incorrecta'):
+    return client.post('/auth/login', json={'login': login, 'password': password},
+                       environ_base={'REMOTE_ADDR': ip})
+
+
+def test_failed_logins_do_not_lock_out_the_owner_from_another_ip(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_PER_IDENTIFIER='3/minute')
+    client = app.test_client()
+    register_and_login(client, username='victima', REMOTE_ADDR='10.0.0.1')
+
+    statuses = [_login(client, 'victima', '10.0.0.66').status_code for _ in range(4)]
+    assert statuses == [401, 401, 401, 429]
+    assert _login(client, 'victima', '10.0.0.1', password='secret1').status_code == 200
+
+
+def test_login_is_limited_per_ip(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_PER_IP='3/minute')
+    client = app.test_client()
+    statuses = [_login(client, f'usuario{i}', '10.0.0.7').status_code for i in range(4)]
+    assert statuses == [401, 401, 401, 429]
+    response = _login(client, 'usuario9', '10.0.0.7')
+    assert int(response.headers['Retry-After']) >= 1
+
+
+def test_forwarded_for_is_ignored_without_proxy_fix(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_PER_IP='2/minute')
+    client = app.test_client()
+    statuses = [client.post('/auth/login', json={'login': f'u{i}', 'password': 'x'},
+                            headers={'X-Forwarded-For': f'203.0.113.{i}'},
+                            environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code for i in range(3)]
+    assert statuses == [401, 401, 429]
+
+
+def test_proxy_fix_uses_the_forwarded_client_ip(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_LOGIN_PER_IP='2/minute', PROXY_FIX_X_FOR=1)
+    client = app.test_client()
+    statuses = [client.post('/auth/login', json={'login': f'u{i}', 'password': 'x'},
+                            headers={'X-Forwarded-For': f'203.0.113.{i}'},
+                            environ_base={'REMOTE_ADDR': '10.0.0.2'}).status_code for i in range(3)]
+    assert statuses == [401, 401, 401]
+
+
+def test_book_routes_are_limited_per_user(make_app):
+    app = make_app(RATELIMIT_ENABLED=True, RATELIMIT_BOOKS_PER_USER='2/minute')
+    client = app.test_client()
+    alice = register_and_login(client, username='alice')
+    bob = register_and_login(client, username='bob')
+    assert [client.get('/app/books', headers=alice).status_code for _ in range(3)] == [200, 200, 429]
+    assert client.get('/app/books', headers=bob).status_code == 200
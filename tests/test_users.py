@@ -0,0 +1,50 @@
+"""Listado de usuarios: paginación por cursor, búsqueda por prefijo y total opcional"""
+
+from tests.conftest import register_and_login
+
+
+def _register(client, *usernames):
+    for username in usernames:
+        client.post('/auth/register', json={'username': username, 'email': f'{username}@example.com',
+                                            'password': 'secret1'})
+
+
+def test_paginated_listing_follows_the_cursor(client, auth_headers):
+    _register(client, 'alice', 'alberto', 'bruno', 'carla')
+
+    first = client.get('/auth/users?limit=3', headers=auth_headers).get_json()
+    assert first['count'] == 3
+    assert 'total' not in first
+    second = client.get(f"/auth/users?limit=3&after={first['next_cursor']}", headers=auth_headers).get_json()
+    assert second['count'] == 2
+    assert second['next_cursor'] is None
+    ids = [user['id'] for user in first['users'] + second['users']]
+    assert ids == sorted(ids) and len(set(ids)) == 5
+
+
+def test_total_is_opt_in(client, auth_headers):
+    _register(client, 'alice', 'alberto', 'bruno')
+
+    page = client.get('/auth/users?limit=2&total=true', headers=auth_headers).get_json()
+    assert page['total'] == 4
+    assert page['count'] == 2
+
+
+def test_prefix_search_matches_username_and_email(client, auth_headers):
+    _register(client, 'alice', 'alberto', 'bruno')
+
+    found = client.get('/auth/users?q=al&total=true', headers=auth_headers).get_json()
+    assert [user['username'] for user in found['users']] == ['alberto', 'alice']
+    assert found['total'] == 2
+    assert found['next_cursor'] is None
+    assert 'total' not in client.get('/auth/users?q=al', headers=auth_headers).get_json()
+
+
+def test_invalid_limit_is_rejected(client, auth_headers):
+    assert client.get('/auth/users?limit=0', headers=auth_headers).status_code == 400
+    assert client.get('/auth/users?limit=501', headers=auth_headers).status_code == 400
+
+
+def test_listing_requires_a_token(client):
+    register_and_login(client)
+    assert client.get('/auth/users').status_code == 401
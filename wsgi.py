@@ -0,0 +1,10 @@
+"""
+Punto de entrada WSGI para servidores de producción.
+
+    gunicorn                 # usa gunicorn.conf.py (recomendado)
+    gunicorn wsgi:app        # cualquier otro servidor WSGI
+"""
+
+from main import create_app
+
+app = create_app()